@@ -7,7 +7,7 @@ Authentication utilities including password hashing, JWT tokens, and encryption.
 from auth.password import hash_password, verify_password
 from auth.jwt import create_access_token, create_refresh_token, decode_token
 from auth.encryption import encrypt_api_key, decrypt_api_key
-from auth.dependencies import get_current_user, require_api_key
+from auth.dependencies import get_current_user, get_current_user_async, require_api_key
 
 __all__ = [
     "hash_password",
@@ -18,5 +18,6 @@ __all__ = [
     "encrypt_api_key",
     "decrypt_api_key",
     "get_current_user",
+    "get_current_user_async",
     "require_api_key",
 ]
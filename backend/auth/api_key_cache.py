@@ -0,0 +1,45 @@
+"""
+Decrypted API Key Cache
+=======================
+Keeps recently used decrypted OpenRouter keys in memory so chat requests
+skip AES decryption. Entries are keyed by user and tied to the ciphertext
+they were decrypted from, so a replaced key is never served.
+"""
+
+import os
+from typing import Optional
+
+from cache import TTLCache
+
+API_KEY_CACHE_TTL_SECONDS = float(os.getenv("API_KEY_CACHE_TTL_SECONDS", "300"))
+API_KEY_CACHE_MAX_SIZE = int(os.getenv("API_KEY_CACHE_MAX_SIZE", "1024"))
+
+_cache = TTLCache(maxsize=API_KEY_CACHE_MAX_SIZE, ttl=API_KEY_CACHE_TTL_SECONDS, name="api_key")
+
+
+def get_cached_api_key(user_id: int, encrypted_api_key: str) -> Optional[str]:
+    """Return the decrypted key if it was cached for this exact ciphertext."""
+    entry = _cache.get(user_id)
+    if entry is None:
+        return None
+    ciphertext, api_key = entry
+    if ciphertext != encrypted_api_key:
+        # Key was replaced (e.g. by another worker); drop the stale plaintext
+        _cache.invalidate(user_id)
+        return None
+    return api_key
+
+
+def cache_api_key(user_id: int, encrypted_api_key: str, api_key: str) -> None:
+    """Cache a decrypted key alongside the ciphertext it came from."""
+    _cache.set(user_id, (encrypted_api_key, api_key))
+
+
+def invalidate_api_key(user_id: int) -> None:
+    """Drop a user's cached key after it was stored or deleted."""
+    _cache.invalidate(user_id)
+
+
+def clear_api_key_cache() -> None:
+    """Drop every cached key."""
+    _cache.clear()
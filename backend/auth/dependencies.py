@@ -7,23 +7,24 @@ FastAPI dependencies for route protection and free trial management.
 from typing import Optional, Tuple
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from database import get_db
+from database import get_db, get_async_db
 from models.user import User, FREE_MESSAGE_LIMIT
 from models.api_key import UserApiKey
 from auth.jwt import decode_token
 from auth.encryption import decrypt_api_key
+from auth.user_cache import get_cached_user, cache_user
+from auth.api_key_cache import get_cached_api_key, cache_api_key
 
 # Bearer token security scheme
 security = HTTPBearer(auto_error=False)
 
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Dependency to get the current authenticated user from Bearer token."""
+def _access_token_payload(credentials: Optional[HTTPAuthorizationCredentials]) -> dict:
+    """Validate the Bearer credentials and return the access token payload."""
     if not credentials:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -41,19 +42,61 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    user_id = int(payload.get("sub"))
-    user = db.query(User).filter(User.id == user_id).first()
+    return payload
+
+
+def _load_user(db: Session, user_id: int, issued_at: Optional[float]) -> Optional[User]:
+    """Resolve a user from the cache, or load them with their valid API key."""
+    cached = get_cached_user(user_id, issued_at=issued_at)
+
+    if cached:
+        return cached.attach(db) if cached.is_active else None
+
+    # Load the user and their valid API key in a single round trip
+    row = (
+        db.query(User, UserApiKey.encrypted_api_key)
+        .outerjoin(UserApiKey, and_(UserApiKey.user_id == User.id, UserApiKey.is_valid == True))
+        .filter(User.id == user_id)
+        .first()
+    )
+    if not row:
+        return None
+
+    user, encrypted_api_key = row
+    cache_user(user, encrypted_api_key)
+    return user
+
 
+def _require_active(user: Optional[User]) -> User:
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found or inactive",
             headers={"WWW-Authenticate": "Bearer"},
         )
-
     return user
 
 
+def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Session = Depends(get_db)
+) -> User:
+    """Dependency to get the current authenticated user from Bearer token."""
+    payload = _access_token_payload(credentials)
+    user = _load_user(db, int(payload.get("sub")), payload.get("iat"))
+    return _require_active(user)
+
+
+async def get_current_user_async(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """Async variant of get_current_user, bound to the request's AsyncSession."""
+    payload = _access_token_payload(credentials)
+    user = await db.run_sync(_load_user, int(payload.get("sub")), payload.get("iat"))
+    return _require_active(user)
+
+
 def get_optional_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db)
@@ -69,19 +112,46 @@ def get_optional_user(
 
 def get_user_api_key(user: User, db: Session) -> Optional[str]:
     """Get the decrypted API key for a user, or None if not set."""
-    api_key_record = db.query(UserApiKey).filter(
-        UserApiKey.user_id == user.id,
-        UserApiKey.is_valid == True
-    ).first()
-
-    if not api_key_record:
+    cached = get_cached_user(user.id)
+    if cached:
+        encrypted_api_key = cached.encrypted_api_key
+    else:
+        api_key_record = db.query(UserApiKey).filter(
+            UserApiKey.user_id == user.id,
+            UserApiKey.is_valid == True
+        ).first()
+        encrypted_api_key = api_key_record.encrypted_api_key if api_key_record else None
+
+    if not encrypted_api_key:
         return None
 
+    api_key = get_cached_api_key(user.id, encrypted_api_key)
+    if api_key:
+        return api_key
+
     try:
-        return decrypt_api_key(api_key_record.encrypted_api_key)
+        api_key = decrypt_api_key(encrypted_api_key)
     except Exception:
         return None
 
+    cache_api_key(user.id, encrypted_api_key, api_key)
+    return api_key
+
+
+async def user_has_api_key_async(user: User, db: AsyncSession) -> bool:
+    """Check whether a user has a valid API key, using cached state when available."""
+    cached = get_cached_user(user.id)
+    if cached:
+        return cached.has_api_key
+
+    result = await db.execute(
+        select(UserApiKey.id).where(
+            UserApiKey.user_id == user.id,
+            UserApiKey.is_valid == True
+        ).limit(1)
+    )
+    return result.first() is not None
+
 
 def require_api_key_or_free_tier(
     user: User = Depends(get_current_user),
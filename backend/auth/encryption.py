@@ -6,14 +6,18 @@ AES-256 encryption for API keys using pycryptodome.
 
 import os
 import base64
+from typing import Optional
 
 from Crypto.Cipher import AES
 from Crypto.Random import get_random_bytes
 from Crypto.Util.Padding import pad, unpad
 
+# Decoded AES key, loaded once (see load_encryption_key)
+_encryption_key: Optional[bytes] = None
 
-def get_encryption_key() -> bytes:
-    """Get the encryption key from environment (must be 32 bytes for AES-256)."""
+
+def load_encryption_key() -> bytes:
+    """Decode the encryption key from environment (must be 32 bytes for AES-256)."""
     key = os.getenv("ENCRYPTION_KEY")
     if not key:
         raise ValueError("ENCRYPTION_KEY environment variable is required")
@@ -24,6 +28,14 @@ def get_encryption_key() -> bytes:
     return key_bytes
 
 
+def get_encryption_key() -> bytes:
+    """Get the decoded encryption key, loading it on first use."""
+    global _encryption_key
+    if _encryption_key is None:
+        _encryption_key = load_encryption_key()
+    return _encryption_key
+
+
 def encrypt_api_key(api_key: str) -> str:
     """Encrypt an API key using AES-256-CBC."""
     key = get_encryption_key()
@@ -6,6 +6,7 @@ Token creation and validation using python-jose.
 
 import os
 import hashlib
+import secrets
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -46,6 +47,8 @@ def create_refresh_token(user_id: int) -> tuple[str, datetime]:
         "type": "refresh",
         "exp": expires_at,
         "iat": datetime.now(timezone.utc),
+        # Unique ID so tokens issued in the same second don't share a hash
+        "jti": secrets.token_hex(16),
     }
     token = jwt.encode(payload, get_jwt_secret_key(), algorithm=ALGORITHM)
     return token, expires_at
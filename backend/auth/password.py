@@ -4,14 +4,19 @@ Password Utilities
 bcrypt password hashing and verification using bcrypt directly.
 """
 
+import os
+
 import bcrypt
 
+# bcrypt cost factor for new hashes; existing hashes are upgraded on sign-in
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
 
-def hash_password(password: str) -> str:
-    """Hash a password using bcrypt with cost factor 12."""
+def hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
+    """Hash a password using bcrypt with the configured cost factor."""
     # Encode and truncate to 72 bytes (bcrypt limit)
     password_bytes = password.encode('utf-8')[:72]
-    salt = bcrypt.gensalt(rounds=12)
+    salt = bcrypt.gensalt(rounds=rounds)
     hashed = bcrypt.hashpw(password_bytes, salt)
     return hashed.decode('utf-8')
 
@@ -25,3 +30,13 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         return bcrypt.checkpw(password_bytes, hashed_bytes)
     except Exception:
         return False
+
+
+def needs_rehash(hashed_password: str, rounds: int = BCRYPT_ROUNDS) -> bool:
+    """Check whether a stored hash was made with a different cost factor."""
+    # bcrypt hashes look like $2b$12$<salt+hash>
+    parts = hashed_password.split("$")
+    try:
+        return int(parts[2]) != rounds
+    except (IndexError, ValueError):
+        return False
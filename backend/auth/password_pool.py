@@ -0,0 +1,130 @@
+"""
+Password Hashing Pool
+=====================
+Runs bcrypt on a dedicated pool so sign-in/sign-up bursts don't starve the
+threadpool (or the GIL) used by regular API traffic.
+Requests beyond the pending limit are shed with 429 + Retry-After.
+
+PASSWORD_HASH_EXECUTOR picks the pool:
+- process: worker processes, started with forkserver (spawn where that is
+  unavailable) rather than fork, since the app already runs threads by the
+  time the first password is hashed
+- thread: worker threads; bcrypt releases the GIL while hashing. The
+  default on Vercel, where AWS Lambda has no /dev/shm for multiprocessing
+
+A process pool that can't be created or can't start its workers falls
+back to threads, and one whose worker died is replaced.
+"""
+
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from auth.password import hash_password, verify_password
+
+logger = logging.getLogger(__name__)
+
+# process | thread
+PASSWORD_HASH_EXECUTOR = os.getenv(
+    "PASSWORD_HASH_EXECUTOR", "thread" if os.getenv("VERCEL") == "1" else "process"
+).lower()
+PASSWORD_HASH_WORKERS = max(1, int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 4)))
+
+_executor: Optional[Executor] = None
+_use_threads = PASSWORD_HASH_EXECUTOR == "thread"
+_pending = 0
+# Moving average of end-to-end hash/verify latency (queueing included),
+# used as the Retry-After estimate
+_avg_seconds = 0.25
+
+
+def _thread_pool() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+
+def get_password_pool() -> Executor:
+    """Get or create the bcrypt pool."""
+    global _executor, _use_threads
+    if _executor is None:
+        if _use_threads:
+            _executor = _thread_pool()
+        else:
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+            try:
+                _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, mp_context=context)
+            except (OSError, ImportError, NotImplementedError) as e:
+                logger.warning(f"bcrypt process pool unavailable ({e}); hashing on threads instead")
+                _use_threads = True
+                _executor = _thread_pool()
+    return _executor
+
+
+def _replace_pool(error: Exception) -> None:
+    """Drop a process pool that broke; the next call gets a new one (threads if processes can't start)."""
+    global _executor, _use_threads
+    if not isinstance(error, BrokenProcessPool):
+        # Worker processes couldn't be started (OSError), or not from here
+        # (RuntimeError: the main module is still being imported)
+        logger.warning(f"bcrypt worker processes unavailable ({error}); hashing on threads instead")
+        _use_threads = True
+    else:
+        logger.warning(f"bcrypt process pool broke ({error}); starting a new one")
+    shutdown_password_pool()
+
+
+def shutdown_password_pool() -> None:
+    """Stop the bcrypt workers (called on application shutdown)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+async def _run(func, *args):
+    """Submit a bcrypt call to the pool, shedding load when it is saturated."""
+    global _pending, _avg_seconds
+
+    if _pending >= PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many sign-in requests. Please retry shortly.",
+            headers={"Retry-After": str(max(1, math.ceil(_avg_seconds)))},
+        )
+
+    _pending += 1
+    started = time.monotonic()
+    try:
+        loop = asyncio.get_running_loop()
+        pool = get_password_pool()
+        try:
+            return await loop.run_in_executor(pool, func, *args)
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            if not isinstance(pool, ProcessPoolExecutor):
+                raise
+            if pool is _executor:
+                _replace_pool(e)
+            # bcrypt calls are idempotent, so one retry on the new pool is safe
+            return await loop.run_in_executor(get_password_pool(), func, *args)
+    finally:
+        _pending -= 1
+        _avg_seconds = 0.8 * _avg_seconds + 0.2 * (time.monotonic() - started)
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the bcrypt pool."""
+    return await _run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the bcrypt pool."""
+    return await _run(verify_password, plain_password, hashed_password)
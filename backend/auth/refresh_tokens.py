@@ -0,0 +1,111 @@
+"""
+Refresh Token Store
+===================
+Issuing, rotating and purging stored refresh tokens.
+Each user keeps at most MAX_REFRESH_TOKENS_PER_USER active tokens, and
+expired rows are deleted in batches by a background task.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import delete
+from sqlalchemy.orm import Session
+
+from database import run_with_async_session
+from models.refresh_token import RefreshToken
+from auth.jwt import create_refresh_token, hash_token
+
+logger = logging.getLogger(__name__)
+
+MAX_REFRESH_TOKENS_PER_USER = int(os.getenv("MAX_REFRESH_TOKENS_PER_USER", "10"))
+REFRESH_TOKEN_PURGE_INTERVAL_SECONDS = float(os.getenv("REFRESH_TOKEN_PURGE_INTERVAL_SECONDS", "3600"))
+REFRESH_TOKEN_PURGE_BATCH_SIZE = int(os.getenv("REFRESH_TOKEN_PURGE_BATCH_SIZE", "1000"))
+
+
+def issue_refresh_token(db: Session, user_id: int) -> str:
+    """
+    Create and store a refresh token for a user.
+
+    Drops the user's expired tokens and the oldest ones beyond the cap.
+    The caller commits.
+    """
+    token, expires_at = create_refresh_token(user_id)
+
+    db.query(RefreshToken).filter(
+        RefreshToken.user_id == user_id,
+        RefreshToken.expires_at <= datetime.now(timezone.utc),
+    ).delete(synchronize_session=False)
+
+    # Keep room for the new token within the cap
+    stale_ids = [
+        row.id
+        for row in db.query(RefreshToken.id)
+        .filter(RefreshToken.user_id == user_id)
+        .order_by(RefreshToken.created_at.desc(), RefreshToken.id.desc())
+        .offset(max(0, MAX_REFRESH_TOKENS_PER_USER - 1))
+        .all()
+    ]
+    if stale_ids:
+        db.query(RefreshToken).filter(RefreshToken.id.in_(stale_ids)).delete(synchronize_session=False)
+
+    db.add(RefreshToken(
+        user_id=user_id,
+        token_hash=hash_token(token),
+        expires_at=expires_at,
+    ))
+    return token
+
+
+def claim_refresh_token(db: Session, token_hash: str) -> Optional[int]:
+    """
+    Revoke an unexpired refresh token and return its user id.
+
+    A single DELETE ... RETURNING, so of two concurrent refreshes with the
+    same token only one gets the user id; the other gets None, as for an
+    expired or revoked token. The caller commits.
+    """
+    return db.execute(
+        delete(RefreshToken)
+        .where(
+            RefreshToken.token_hash == token_hash,
+            RefreshToken.expires_at > datetime.now(timezone.utc),
+        )
+        .returning(RefreshToken.user_id)
+    ).scalar_one_or_none()
+
+
+def purge_expired_refresh_tokens(db: Session, batch_size: int = REFRESH_TOKEN_PURGE_BATCH_SIZE) -> int:
+    """Delete expired refresh tokens in batches. Returns the number deleted."""
+    total = 0
+    while True:
+        now = datetime.now(timezone.utc)
+        ids = [
+            row.id
+            for row in db.query(RefreshToken.id)
+            .filter(RefreshToken.expires_at <= now)
+            .limit(batch_size)
+            .all()
+        ]
+        if not ids:
+            return total
+        db.query(RefreshToken).filter(RefreshToken.id.in_(ids)).delete(synchronize_session=False)
+        db.commit()
+        total += len(ids)
+        if len(ids) < batch_size:
+            return total
+
+
+async def run_refresh_token_purger() -> None:
+    """Background loop that purges expired refresh tokens periodically."""
+    if REFRESH_TOKEN_PURGE_INTERVAL_SECONDS <= 0:
+        return
+    while True:
+        try:
+            await run_with_async_session(purge_expired_refresh_tokens)
+        except Exception as e:
+            logger.warning(f"Refresh token purge failed: {e}")
+        await asyncio.sleep(REFRESH_TOKEN_PURGE_INTERVAL_SECONDS)
@@ -0,0 +1,97 @@
+"""
+Authenticated User Cache
+========================
+Short-lived cache of user state so authenticated requests can skip the
+users / user_api_keys lookups. Entries are invalidated whenever the user,
+their API key or their message count changes.
+"""
+
+import os
+from dataclasses import dataclass
+from datetime import datetime
+from time import time
+from typing import Optional
+
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from cache import TTLCache
+from models.user import User
+
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_SIZE = int(os.getenv("USER_CACHE_MAX_SIZE", "1024"))
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Snapshot of the columns the API reads from a user and their key."""
+
+    id: int
+    name: str
+    email: str
+    is_active: bool
+    message_count: int
+    created_at: Optional[datetime]
+    # Encrypted key of the user's valid API key record, if any
+    encrypted_api_key: Optional[str]
+    cached_at: float
+
+    @property
+    def has_api_key(self) -> bool:
+        return self.encrypted_api_key is not None
+
+    def attach(self, db: Session) -> User:
+        """Return a session-bound User built from the snapshot without a SELECT."""
+        user = User(
+            id=self.id,
+            name=self.name,
+            email=self.email,
+            is_active=self.is_active,
+            message_count=self.message_count,
+            created_at=self.created_at,
+        )
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
+
+_cache = TTLCache(maxsize=USER_CACHE_MAX_SIZE, ttl=USER_CACHE_TTL_SECONDS, name="user")
+
+
+def get_cached_user(user_id: int, issued_at: Optional[float] = None) -> Optional[CachedUser]:
+    """
+    Return the cached state for a user.
+
+    A snapshot taken before the token was issued is treated as a miss, so a
+    fresh sign-in always re-reads the user.
+    """
+    entry = _cache.get(user_id)
+    if entry is None:
+        return None
+    if issued_at is not None and entry.cached_at < issued_at:
+        return None
+    return entry
+
+
+def cache_user(user: User, encrypted_api_key: Optional[str]) -> CachedUser:
+    """Store a snapshot of a freshly loaded user and their API key."""
+    entry = CachedUser(
+        id=user.id,
+        name=user.name,
+        email=user.email,
+        is_active=user.is_active,
+        message_count=user.message_count or 0,
+        created_at=user.created_at,
+        encrypted_api_key=encrypted_api_key,
+        cached_at=time(),
+    )
+    _cache.set(user.id, entry)
+    return entry
+
+
+def invalidate_user(user_id: int) -> None:
+    """Drop a user's cached state after it changed."""
+    _cache.invalidate(user_id)
+
+
+def clear_user_cache() -> None:
+    """Drop all cached user state."""
+    _cache.clear()
@@ -0,0 +1 @@
+"""Benchmarks package. Run modules from the backend directory, e.g. `python -m benchmarks.startup`."""
@@ -0,0 +1,219 @@
+"""
+Benchmark Harness
+=================
+Shared pieces of the HTTP benchmarks: starting the stub provider and a
+backend server locally, creating synthetic users, and recording latencies
+into per-endpoint throughput / percentile reports.
+"""
+
+import asyncio
+import base64
+import math
+import os
+import secrets
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Keys must look like OpenRouter's; the stub accepts anything
+STUB_API_KEY = "sk-or-benchmark-stub"
+BENCHMARK_PASSWORD = "benchmark-password"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    """Poll url until it answers, failing early if the process exits."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server for {url} exited with code {process.returncode}")
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def _stop(process: subprocess.Popen) -> None:
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+@contextmanager
+def local_servers(
+    stub_args: List[str],
+    database_url: Optional[str] = None,
+    workers: int = 1,
+    extra_env: Optional[Dict[str, str]] = None,
+) -> Iterator[str]:
+    """
+    Start the stub provider and a backend wired to it; yields the backend URL.
+
+    Without database_url the backend uses a fresh SQLite file that is
+    removed afterwards. Server output goes to the benchmark's stderr.
+    """
+    with tempfile.TemporaryDirectory(prefix="cm-bench-") as tmp:
+        stub_port, backend_port = free_port(), free_port()
+        stub = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.stub_openrouter", "--port", str(stub_port), *stub_args],
+            cwd=BACKEND_DIR,
+        )
+        backend = None
+        try:
+            wait_until_ready(f"http://127.0.0.1:{stub_port}/api/v1/models", stub)
+
+            env = dict(os.environ)
+            env.update({
+                "OPENROUTER_BASE_URL": f"http://127.0.0.1:{stub_port}/api/v1",
+                "OPENROUTER_API_KEY": STUB_API_KEY,
+                "DATABASE_URL": database_url or f"sqlite:///{tmp}/benchmark.db",
+                "JWT_SECRET_KEY": secrets.token_hex(32),
+                "ENCRYPTION_KEY": base64.b64encode(secrets.token_bytes(32)).decode(),
+                # Keep ContextMemory's FAISS indexes out of the shared /tmp
+                "BACKEND_HOME": tmp,
+                # A log line per request would swamp the benchmark's output
+                "LOG_REQUESTS": "false",
+            })
+            env.update(extra_env or {})
+            backend = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+                 "--port", str(backend_port), "--workers", str(workers), "--log-level", "warning",
+                 "--no-access-log"],
+                cwd=BACKEND_DIR, env=env, stdout=sys.stderr,
+            )
+            base_url = f"http://127.0.0.1:{backend_port}"
+            wait_until_ready(f"{base_url}/", backend)
+            yield base_url
+        finally:
+            if backend is not None:
+                _stop(backend)
+            _stop(stub)
+
+
+async def request_with_retry(client: httpx.AsyncClient, method: str, url: str, **kwargs) -> httpx.Response:
+    """Send a request, honouring 429 Retry-After (password hashing sheds load)."""
+    for _ in range(20):
+        response = await client.request(method, url, **kwargs)
+        if response.status_code != 429:
+            return response
+        await asyncio.sleep(float(response.headers.get("retry-after", "1")))
+    return response
+
+
+async def create_user(client: httpx.AsyncClient, email: str, name: str = "Benchmark User",
+                      store_api_key: bool = True) -> dict:
+    """
+    Sign up a synthetic user and return their tokens and auth headers.
+
+    Storing an API key lifts the free-tier message limit for long runs.
+    """
+    response = await request_with_retry(
+        client, "POST", "/api/auth/signup",
+        json={"name": name, "email": email, "password": BENCHMARK_PASSWORD},
+    )
+    response.raise_for_status()
+    tokens = response.json()
+    user = {
+        "id": tokens["user"]["id"],
+        "email": email,
+        "access_token": tokens["access_token"],
+        "refresh_token": tokens["refresh_token"],
+        "headers": {"Authorization": f"Bearer {tokens['access_token']}"},
+    }
+    if store_api_key:
+        response = await client.post("/api/api-keys", json={"api_key": STUB_API_KEY}, headers=user["headers"])
+        response.raise_for_status()
+    return user
+
+
+# ═══════════════════════════════════════════════════════
+# LATENCY REPORTS
+# ═══════════════════════════════════════════════════════
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class LatencyRecorder:
+    """Collects request latencies and outcomes per endpoint."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.statuses: Dict[str, Dict[int, int]] = {}
+
+    def record(self, endpoint: str, seconds: float, status: int) -> None:
+        self.samples.setdefault(endpoint, []).append(seconds)
+        counts = self.statuses.setdefault(endpoint, {})
+        counts[status] = counts.get(status, 0) + 1
+        if status == 0 or status >= 400:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    async def timed(self, endpoint: str, request) -> Optional[httpx.Response]:
+        """Await an httpx request coroutine, recording its latency and status."""
+        start = time.perf_counter()
+        try:
+            response = await request
+        except httpx.HTTPError:
+            self.record(endpoint, time.perf_counter() - start, 0)
+            return None
+        self.record(endpoint, time.perf_counter() - start, response.status_code)
+        return response
+
+    def report(self, elapsed: float) -> Dict[str, dict]:
+        """Per-endpoint stats (milliseconds), plus an "all" row."""
+        rows = {}
+        everything: List[float] = []
+        for endpoint, values in sorted(self.samples.items()):
+            everything.extend(values)
+            rows[endpoint] = _summarize(values, self.errors.get(endpoint, 0), elapsed)
+            rows[endpoint]["statuses"] = dict(sorted(self.statuses[endpoint].items()))
+        rows["all"] = _summarize(everything, sum(self.errors.values()), elapsed)
+        return rows
+
+
+def _summarize(values: List[float], errors: int, elapsed: float) -> dict:
+    ordered = sorted(v * 1000 for v in values)
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "throughput_rps": len(ordered) / elapsed if elapsed > 0 else 0.0,
+        "mean_ms": statistics.fmean(ordered) if ordered else 0.0,
+        "p50_ms": percentile(ordered, 50),
+        "p95_ms": percentile(ordered, 95),
+        "p99_ms": percentile(ordered, 99),
+        "max_ms": ordered[-1] if ordered else 0.0,
+    }
+
+
+def print_report(rows: Dict[str, dict]) -> None:
+    print(f"{'endpoint':<28}{'reqs':>7}{'errs':>6}{'rps':>8}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}")
+    for endpoint, row in rows.items():
+        print(
+            f"{endpoint:<28}{row['requests']:>7}{row['errors']:>6}{row['throughput_rps']:>8.1f}"
+            f"{row['mean_ms']:>8.1f}ms{row['p50_ms']:>8.1f}ms{row['p95_ms']:>8.1f}ms"
+            f"{row['p99_ms']:>8.1f}ms{row['max_ms']:>8.1f}ms"
+        )
@@ -0,0 +1,190 @@
+"""
+Load Test
+=========
+End-to-end load test of the backend with concurrent virtual users. Runs
+fully offline: starts the stub OpenRouter server and a backend pointed at
+it (fresh SQLite database unless --database-url is given), signs up one
+user per virtual user, then has every user loop over a weighted mix of
+chat, memory graph, chat history, /auth/me and token refresh requests.
+
+Reports throughput and p50/p95/p99 latency per endpoint.
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test [--users 20] [--duration 30]
+        [--mix chat=1,memories=2,history=2,me=1,refresh=0.2]
+        [--latency-ms 300] [--failure-rate 0] [--workers 1] [--json]
+    python -m benchmarks.load_test --target http://localhost:8000 ...
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.harness import LatencyRecorder, create_user, local_servers, print_report
+from benchmarks.stub_openrouter import add_arguments, stub_arguments
+
+DEFAULT_MIX = "chat=1,memories=2,history=2,me=1,refresh=0.2"
+
+CHAT_MESSAGES = [
+    "I just got back from a hiking trip in the Alps, it was amazing",
+    "My sister is visiting next week, she loves Italian food",
+    "I'm learning to play the piano, practicing every evening",
+    "Work has been stressful, we're shipping a big release on Friday",
+    "I adopted a cat named Miso last month",
+    "Thinking about switching from coffee to green tea",
+    "Do you remember what I told you about my trip?",
+    "I prefer running in the morning before work",
+]
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - set(OPERATIONS)
+    if unknown:
+        raise SystemExit(f"Unknown operations in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+# ═══════════════════════════════════════════════════════
+# OPERATIONS
+# ═══════════════════════════════════════════════════════
+
+
+async def op_chat(client: httpx.AsyncClient, user: dict, recorder: LatencyRecorder) -> None:
+    await recorder.timed("POST /api/chat", client.post(
+        "/api/chat", json={"message": random.choice(CHAT_MESSAGES)}, headers=user["headers"],
+    ))
+
+
+async def op_memories(client: httpx.AsyncClient, user: dict, recorder: LatencyRecorder) -> None:
+    await recorder.timed("GET /api/memories", client.get("/api/memories", headers=user["headers"]))
+
+
+async def op_history(client: httpx.AsyncClient, user: dict, recorder: LatencyRecorder) -> None:
+    await recorder.timed("GET /api/chat/history", client.get("/api/chat/history", headers=user["headers"]))
+
+
+async def op_me(client: httpx.AsyncClient, user: dict, recorder: LatencyRecorder) -> None:
+    await recorder.timed("GET /api/auth/me", client.get("/api/auth/me", headers=user["headers"]))
+
+
+async def op_refresh(client: httpx.AsyncClient, user: dict, recorder: LatencyRecorder) -> None:
+    response = await recorder.timed("POST /api/auth/refresh", client.post(
+        "/api/auth/refresh", json={"refresh_token": user["refresh_token"]},
+    ))
+    if response is not None and response.status_code == 200:
+        tokens = response.json()
+        user["refresh_token"] = tokens["refresh_token"]
+        user["headers"] = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+OPERATIONS = {
+    "chat": op_chat,
+    "memories": op_memories,
+    "history": op_history,
+    "me": op_me,
+    "refresh": op_refresh,
+}
+
+
+# ═══════════════════════════════════════════════════════
+# RUNNER
+# ═══════════════════════════════════════════════════════
+
+
+async def virtual_user(
+    client: httpx.AsyncClient,
+    user: dict,
+    mix: Dict[str, float],
+    deadline: float,
+    think_ms: float,
+    recorder: LatencyRecorder,
+) -> None:
+    names, weights = list(mix), list(mix.values())
+    while time.monotonic() < deadline:
+        name = random.choices(names, weights)[0]
+        await OPERATIONS[name](client, user, recorder)
+        if think_ms:
+            await asyncio.sleep(random.uniform(0, 2 * think_ms) / 1000)
+
+
+async def run_load(base_url: str, users: int, duration: float, mix: Dict[str, float], think_ms: float) -> dict:
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        # Sign-ups are timed separately: bcrypt dominates them
+        setup = LatencyRecorder()
+        run_id = uuid.uuid4().hex[:8]
+        setup_start = time.monotonic()
+        signed_up: List[dict] = await asyncio.gather(*(
+            _timed_signup(client, f"loadtest-{run_id}-{i}@example.com", setup) for i in range(users)
+        ))
+        setup_elapsed = time.monotonic() - setup_start
+
+        recorder = LatencyRecorder()
+        start = time.monotonic()
+        await asyncio.gather(*(
+            virtual_user(client, user, mix, start + duration, think_ms, recorder) for user in signed_up
+        ))
+        elapsed = time.monotonic() - start
+
+    return {
+        "users": users,
+        "duration_s": elapsed,
+        "mix": mix,
+        "setup": setup.report(setup_elapsed),
+        "endpoints": recorder.report(elapsed),
+    }
+
+
+async def _timed_signup(client: httpx.AsyncClient, email: str, recorder: LatencyRecorder) -> dict:
+    start = time.perf_counter()
+    user = await create_user(client, email)
+    recorder.record("signup + store key", time.perf_counter() - start, 200)
+    return user
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end load test for the backend")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load after sign-up")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="weighted operation mix")
+    parser.add_argument("--think-ms", type=float, default=0, help="mean pause between a user's requests")
+    parser.add_argument("--target", help="existing backend URL (skips starting the stub and backend)")
+    parser.add_argument("--database-url", help="database for the local backend (default: fresh SQLite)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the local backend")
+    parser.add_argument("--json", action="store_true", help="print machine-readable output")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+
+    def run(base_url: str) -> dict:
+        return asyncio.run(run_load(base_url, args.users, args.duration, mix, args.think_ms))
+
+    if args.target:
+        report = run(args.target)
+    else:
+        with local_servers(stub_arguments(args), args.database_url, args.workers) as base_url:
+            report = run(base_url)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Setup: {args.users} sign-ups")
+    print_report(report["setup"])
+    print(f"\nLoad: {args.users} users for {report['duration_s']:.1f}s, mix {args.mix}")
+    print_report(report["endpoints"])
+
+
+if __name__ == "__main__":
+    main()
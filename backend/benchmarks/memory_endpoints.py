@@ -0,0 +1,171 @@
+"""
+Memory Endpoint Benchmarks
+==========================
+Micro-benchmarks of the memory graph code paths across corpus sizes.
+Creates one synthetic tenant per size (see benchmarks/synthetic.py) in a
+fresh SQLite database, or in --database-url, then times each case:
+
+    build_id_mapping         global -> local ID mapping over a loaded corpus
+    get_memory_connections   connection parsing for every memory
+    build_memory_graph       query + graph construction behind GET /api/memories
+    load_memory_detail       query + lookup behind GET /api/memory/{id}
+    serialize pydantic       MemoriesResponse validation + stdlib json (the
+                             generic FastAPI response path), for comparison
+    serialize fast           FastJSONResponse, used by the read endpoints
+    GET /api/memories        full request: auth, graph, JSON serialization
+    GET /api/memories compact  the same with ?format=compact
+    GET /api/memory/{id}     full request for a single memory
+
+and reports the median / p95 per size plus a scaling exponent k from
+t ~ n^k between the smallest and largest corpus (1 = linear), and the
+graph payload size in the full and compact formats, with and without gzip.
+
+Usage (from the backend directory):
+    python -m benchmarks.memory_endpoints [--sizes 100,1000,5000]
+        [--repeat 20] [--no-embeddings] [--database-url ...] [--json]
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.harness import percentile
+
+
+def time_case(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """Run func once to warm up, then `repeat` times; stats in milliseconds."""
+    func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {"median_ms": statistics.median(samples), "p95_ms": percentile(samples, 95), "min_ms": samples[0]}
+
+
+def benchmark_tenant(user_id: int, email: str, repeat: int) -> Dict[str, Dict[str, float]]:
+    from fastapi.testclient import TestClient
+
+    import main
+    from auth.jwt import create_access_token
+    from contextmemory.db.models.memory import Memory as MemoryModel
+    from database import SessionLocal
+    from responses import FastJSONResponse
+    from schemas import MemoriesResponse
+    from routes.memories import build_memory_graph, load_memory_detail
+    from utils import build_id_mapping, get_memory_connections
+
+    db = SessionLocal()
+    try:
+        memories = (
+            db.query(MemoryModel)
+            .filter(MemoryModel.conversation_id == user_id, MemoryModel.is_active == True)
+            .order_by(MemoryModel.created_at)
+            .all()
+        )
+        # A memory in the middle of the corpus, addressed by global ID
+        target_id = memories[len(memories) // 2].id
+
+        results = {
+            "build_id_mapping": time_case(lambda: build_id_mapping(memories), repeat),
+            "get_memory_connections": time_case(lambda: [get_memory_connections(m) for m in memories], repeat),
+            "build_memory_graph": time_case(lambda: build_memory_graph(db, user_id), repeat),
+            "load_memory_detail": time_case(lambda: load_memory_detail(db, user_id, target_id), repeat),
+        }
+        graph = build_memory_graph(db, user_id)
+        results["serialize pydantic"] = time_case(
+            lambda: json.dumps(MemoriesResponse.model_validate(graph).model_dump(mode="json")), repeat
+        )
+        results["serialize fast"] = time_case(lambda: FastJSONResponse(graph), repeat)
+    finally:
+        db.close()
+
+    client = TestClient(main.app)
+    headers = {"Authorization": f"Bearer {create_access_token(user_id, email)}"}
+
+    def get(path: str) -> None:
+        client.get(path, headers=headers).raise_for_status()
+
+    # Graph payload sizes in KiB: full / compact, uncompressed and as sent gzipped
+    payload = {}
+    for label, path in (("full", "/api/memories"), ("compact", "/api/memories?format=compact")):
+        for encoding in ("identity", "gzip"):
+            with client.stream("GET", path, headers={**headers, "Accept-Encoding": encoding}) as response:
+                size = sum(len(chunk) for chunk in response.iter_raw())
+            payload[f"{label} {encoding}"] = size / 1024
+
+    results["GET /api/memories"] = time_case(lambda: get("/api/memories"), repeat)
+    results["GET /api/memories compact"] = time_case(lambda: get("/api/memories?format=compact"), repeat)
+    results["GET /api/memory/{id}"] = time_case(lambda: get(f"/api/memory/{target_id}"), repeat)
+    return results, payload
+
+
+def scaling_exponent(sizes: List[int], medians: List[float]) -> float:
+    """k in t ~ n^k between the smallest and largest corpus."""
+    if len(sizes) < 2 or medians[0] <= 0 or sizes[0] == sizes[-1]:
+        return float("nan")
+    return math.log(medians[-1] / medians[0]) / math.log(sizes[-1] / sizes[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory endpoint micro-benchmarks across corpus sizes")
+    parser.add_argument("--sizes", default="100,1000,5000", help="memories per tenant, comma separated")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per case")
+    parser.add_argument("--no-embeddings", action="store_true", help="generate memories without embeddings")
+    parser.add_argument("--database-url", help="database to use (default: fresh SQLite file)")
+    parser.add_argument("--json", action="store_true", help="print machine-readable output")
+    args = parser.parse_args()
+    sizes = sorted(int(size) for size in args.sizes.split(","))
+
+    tmp = tempfile.TemporaryDirectory(prefix="cm-bench-")
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tmp.name}/memory_endpoints.db"
+    os.environ.setdefault("BACKEND_HOME", tmp.name)
+    os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+    # Importing main sets up logging; keep request lines out of the report
+    os.environ.setdefault("LOG_LEVEL", "ERROR")
+
+    from config import ensure_schema
+    from benchmarks.synthetic import generate_tenants
+    ensure_schema()
+
+    report: Dict[str, Dict[int, Dict[str, float]]] = {}
+    payloads: Dict[int, Dict[str, float]] = {}
+    for size in sizes:
+        tenant = generate_tenants(1, size, messages_per_user=0, embeddings=not args.no_embeddings,
+                                  seed=size, email_prefix=f"bench-{size}-{int(time.time())}")[0]
+        results, payloads[size] = benchmark_tenant(tenant["id"], tenant["email"], args.repeat)
+        for case, stats in results.items():
+            report.setdefault(case, {})[size] = stats
+
+    for case, by_size in report.items():
+        medians = [by_size[size]["median_ms"] for size in sizes]
+        by_size["scaling_exponent"] = scaling_exponent(sizes, medians)
+
+    tmp.cleanup()
+
+    if args.json:
+        print(json.dumps({"sizes": sizes, "cases": report, "payload_kib": payloads}, indent=2, default=str))
+        return
+
+    header = f"{'case':<26}" + "".join(f"{f'n={size} p50/p95':>24}" for size in sizes) + f"{'scaling k':>11}"
+    print(header)
+    for case, by_size in report.items():
+        cells = "".join(
+            f"{by_size[size]['median_ms']:.2f}/{by_size[size]['p95_ms']:.2f}ms".rjust(24) for size in sizes
+        )
+        print(f"{case:<26}{cells}{by_size['scaling_exponent']:>11.2f}")
+    print("\nscaling k: t ~ n^k between the smallest and largest corpus (1.0 = linear)")
+
+    print(f"\n{'graph payload (KiB)':<26}" + "".join(f"{f'n={size}':>24}" for size in sizes))
+    for label in payloads[sizes[0]]:
+        print(f"{label:<26}" + "".join(f"{payloads[size][label]:>24.1f}" for size in sizes))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+"""
+Access-Log Replay
+=================
+Replays uvicorn access logs (e.g. backend/backend.log) against a backend,
+so benchmarks follow the traffic shape the frontend really produces:
+bursts of /api/memories and /api/chat/history polling around sign-ins.
+
+Every synthetic user replays the whole log on its own timeline, started
+at a random offset within --stagger seconds. Requests are sent open-loop
+at their logged offsets divided by --speed, so a slow backend shows up as
+latency rather than as a slower replay. Relative timing comes from a
+leading timestamp on each line when the log has one (uvicorn's default
+format has none); otherwise lines are spaced --gap-ms apart. The backend's
+own JSON logs (see logging_config.py) work too: their "request" lines are
+timestamped, so they replay with the real spacing.
+
+Requests are mapped onto the synthetic user: auth headers are theirs,
+sign-in / refresh / logout use their credentials and tokens, chat
+messages are sampled from the load test's, and numeric IDs in paths become
+one of the user's own memory IDs. OPTIONS preflights are skipped, as are
+DELETEs unless --allow-deletes is given.
+
+Without --target, the stub provider and a backend are started locally.
+With --memories N the users are synthetic tenants holding N memories each
+(see benchmarks/synthetic.py) instead of fresh sign-ups.
+
+Usage (from the backend directory):
+    python -m benchmarks.replay [backend.log] [--users 10] [--speed 1]
+        [--gap-ms 100] [--stagger 5] [--memories 0] [--allow-deletes] [--json]
+    python -m benchmarks.replay backend.log --target http://localhost:8000 ...
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.harness import (
+    BACKEND_DIR, BENCHMARK_PASSWORD, STUB_API_KEY, LatencyRecorder, create_user, local_servers,
+    print_report, request_with_retry,
+)
+from benchmarks.load_test import CHAT_MESSAGES
+from benchmarks.stub_openrouter import add_arguments, stub_arguments
+
+DEFAULT_LOG = os.path.join(BACKEND_DIR, "backend.log")
+
+# INFO:     127.0.0.1:65080 - "GET /api/memories HTTP/1.1" 200 OK
+ACCESS_LINE = re.compile(
+    r'(?P<client>[\w.:\[\]-]+) - "(?P<method>[A-Z]+) (?P<target>\S+) HTTP/[\d.]+" (?P<status>\d{3})'
+)
+# Optional timestamp at the start of the line (custom uvicorn log formats)
+TIMESTAMP = re.compile(r"^\[?(?P<ts>\d{4}-\d{2}-\d{2}[ T]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?)")
+NUMERIC_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+@dataclass
+class LogEntry:
+    offset: float  # seconds since the first replayed request
+    client: str
+    method: str
+    path: str  # including the query string
+    status: int
+
+    @property
+    def endpoint(self) -> str:
+        """Report label: method plus path with IDs templated and no query string."""
+        return f"{self.method} {NUMERIC_SEGMENT.sub('/{id}', self.path.split('?', 1)[0])}"
+
+
+def _parse_timestamp(value: str) -> float:
+    return datetime.fromisoformat(value.replace(",", ".").replace(" ", "T").replace("Z", "+00:00")).timestamp()
+
+
+def _parse_json_line(line: str) -> Optional[Tuple[Optional[float], dict]]:
+    """A request from a JSON log line: the backend's "request" lines or a routed uvicorn access line."""
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(record, dict):
+        return None
+    ts = _parse_timestamp(record["ts"]) if record.get("ts") else None
+
+    if record.get("event") == "request":
+        path = record["path"] + (f"?{record['query']}" if record.get("query") else "")
+        return ts, {"client": record.get("client") or "", "method": record["method"],
+                    "path": path, "status": int(record["status"])}
+    match = ACCESS_LINE.search(str(record.get("message", "")))
+    return (ts, _fields(match)) if match else None
+
+
+def _fields(match: re.Match) -> dict:
+    return {"client": match.group("client"), "method": match.group("method"),
+            "path": match.group("target"), "status": int(match.group("status"))}
+
+
+def parse_access_log(path: str, gap_ms: float = 100) -> List[LogEntry]:
+    """Access-log requests in order, with offsets from their timestamps or gap_ms spacing."""
+    parsed: List[Tuple[Optional[float], dict]] = []
+    with open(path, errors="replace") as f:
+        for line in f:
+            if line.startswith("{"):
+                request = _parse_json_line(line)
+                if request:
+                    parsed.append(request)
+                continue
+            match = ACCESS_LINE.search(line)
+            if not match:
+                continue
+            stamp = TIMESTAMP.match(line)
+            parsed.append((_parse_timestamp(stamp.group("ts")) if stamp else None, _fields(match)))
+
+    timed = bool(parsed) and all(ts is not None for ts, _ in parsed)
+    first = parsed[0][0] if timed else 0.0
+    return [
+        LogEntry(offset=(ts - first) if timed else index * gap_ms / 1000, **fields)
+        for index, (ts, fields) in enumerate(parsed)
+    ]
+
+
+# ═══════════════════════════════════════════════════════
+# REPLAY
+# ═══════════════════════════════════════════════════════
+
+
+class ReplayStats:
+    """Counts alongside the latency recorder: skips, status drift, schedule lag."""
+
+    def __init__(self):
+        self.skipped: Dict[str, int] = {}
+        self.status_mismatches = 0
+        self.max_lag = 0.0
+
+    def skip(self, endpoint: str) -> None:
+        self.skipped[endpoint] = self.skipped.get(endpoint, 0) + 1
+
+
+async def sign_in(client: httpx.AsyncClient, email: str, store_api_key: bool = True) -> dict:
+    """Sign in an existing synthetic user (password BENCHMARK_PASSWORD)."""
+    response = await request_with_retry(
+        client, "POST", "/api/auth/signin", json={"email": email, "password": BENCHMARK_PASSWORD},
+    )
+    response.raise_for_status()
+    tokens = response.json()
+    user = {
+        "id": tokens["user"]["id"],
+        "email": email,
+        "access_token": tokens["access_token"],
+        "refresh_token": tokens["refresh_token"],
+        "headers": {"Authorization": f"Bearer {tokens['access_token']}"},
+    }
+    if store_api_key and not tokens["user"]["usage"]["has_api_key"]:
+        response = await client.post("/api/api-keys", json={"api_key": STUB_API_KEY}, headers=user["headers"])
+        response.raise_for_status()
+    return user
+
+
+def _adopt_tokens(user: dict, response: Optional[httpx.Response]) -> None:
+    if response is not None and response.status_code == 200:
+        tokens = response.json()
+        user["refresh_token"] = tokens["refresh_token"]
+        user["headers"] = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+
+async def replay_entry(
+    client: httpx.AsyncClient,
+    user: dict,
+    entry: LogEntry,
+    recorder: LatencyRecorder,
+    stats: ReplayStats,
+) -> None:
+    """Send one logged request as `user`."""
+    endpoint = entry.endpoint
+    path = entry.path
+    if user.get("memories"):
+        path = NUMERIC_SEGMENT.sub(lambda _: f"/{random.randint(1, user['memories'])}", path)
+
+    if endpoint == "POST /api/auth/signin":
+        request = client.post(path, json={"email": user["email"], "password": BENCHMARK_PASSWORD})
+    elif endpoint == "POST /api/auth/refresh":
+        if not user["refresh_token"]:
+            stats.skip(endpoint)
+            return
+        request = client.post(path, json={"refresh_token": user["refresh_token"]})
+    elif endpoint == "POST /api/auth/logout":
+        request = client.post(path, json={"refresh_token": user["refresh_token"]})
+        user["refresh_token"] = None
+    elif endpoint == "POST /api/chat":
+        request = client.post(path, json={"message": random.choice(CHAT_MESSAGES)}, headers=user["headers"])
+    elif entry.method in ("GET", "DELETE"):
+        request = client.request(entry.method, path, headers=user["headers"])
+    else:
+        # Bodies aren't in the access log; only the requests above can be rebuilt
+        stats.skip(endpoint)
+        return
+
+    response = await recorder.timed(endpoint, request)
+    if response is not None and response.status_code != entry.status:
+        stats.status_mismatches += 1
+    if endpoint in ("POST /api/auth/signin", "POST /api/auth/refresh"):
+        _adopt_tokens(user, response)
+
+
+async def replay_user(
+    client: httpx.AsyncClient,
+    user: dict,
+    entries: List[LogEntry],
+    speed: float,
+    delay: float,
+    allow_deletes: bool,
+    recorder: LatencyRecorder,
+    stats: ReplayStats,
+) -> None:
+    """Replay the log open-loop on the user's own timeline."""
+    start = time.monotonic() + delay
+    in_flight = []
+    for entry in entries:
+        if entry.method == "OPTIONS" or (entry.method == "DELETE" and not allow_deletes):
+            stats.skip(entry.endpoint)
+            continue
+        wait = start + entry.offset / speed - time.monotonic()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        else:
+            stats.max_lag = max(stats.max_lag, -wait)
+        in_flight.append(asyncio.create_task(replay_entry(client, user, entry, recorder, stats)))
+    await asyncio.gather(*in_flight)
+
+
+async def run_replay(
+    base_url: str,
+    entries: List[LogEntry],
+    users: int,
+    speed: float,
+    stagger: float,
+    allow_deletes: bool,
+    tenants: Optional[List[dict]] = None,
+) -> dict:
+    limits = httpx.Limits(max_connections=users * 4, max_keepalive_connections=users * 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        if tenants:
+            signed_in = await asyncio.gather(*(sign_in(client, tenant["email"]) for tenant in tenants))
+            for user, tenant in zip(signed_in, tenants):
+                user["memories"] = tenant["memories"]
+        else:
+            run_id = uuid.uuid4().hex[:8]
+            signed_in = await asyncio.gather(*(
+                create_user(client, f"replay-{run_id}-{i}@example.com") for i in range(users)
+            ))
+
+        recorder = LatencyRecorder()
+        stats = ReplayStats()
+        start = time.monotonic()
+        await asyncio.gather(*(
+            replay_user(client, user, entries, speed, random.uniform(0, stagger), allow_deletes, recorder, stats)
+            for user in signed_in
+        ))
+        elapsed = time.monotonic() - start
+
+    return {
+        "users": len(signed_in),
+        "log_requests": len(entries),
+        "log_span_s": entries[-1].offset if entries else 0.0,
+        "speed": speed,
+        "duration_s": elapsed,
+        "max_schedule_lag_ms": stats.max_lag * 1000,
+        "status_mismatches": stats.status_mismatches,
+        "skipped": dict(sorted(stats.skipped.items())),
+        "endpoints": recorder.report(elapsed),
+    }
+
+
+def seed_tenants(users: int, memories: int, database_url: str) -> List[dict]:
+    """Create synthetic tenants in database_url before the backend starts."""
+    os.environ["DATABASE_URL"] = database_url
+    from benchmarks.synthetic import generate_tenants
+    from config import ensure_schema
+    ensure_schema()
+    return generate_tenants(users, memories, email_prefix=f"replay-{uuid.uuid4().hex[:8]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay uvicorn access logs against the backend")
+    parser.add_argument("log", nargs="?", default=DEFAULT_LOG, help="access log to replay")
+    parser.add_argument("--users", type=int, default=10, help="synthetic users, each replaying the log")
+    parser.add_argument("--speed", type=float, default=1.0, help="speed-up factor for the log's timing")
+    parser.add_argument("--gap-ms", type=float, default=100, help="spacing for lines without timestamps")
+    parser.add_argument("--stagger", type=float, default=5.0, help="spread of the users' start times (s)")
+    parser.add_argument("--memories", type=int, default=0,
+                        help="replay as synthetic tenants with this many memories (local backend only)")
+    parser.add_argument("--allow-deletes", action="store_true", help="also replay DELETE requests")
+    parser.add_argument("--target", help="existing backend URL (skips starting the stub and backend)")
+    parser.add_argument("--database-url", help="database for the local backend (default: fresh SQLite)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the local backend")
+    parser.add_argument("--json", action="store_true", help="print machine-readable output")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    if args.speed <= 0:
+        raise SystemExit("--speed must be positive")
+    if args.memories and args.target:
+        raise SystemExit("--memories seeds the local backend's database; it can't be used with --target")
+
+    entries = parse_access_log(args.log, args.gap_ms)
+    if not entries:
+        raise SystemExit(f"No access-log lines found in {args.log}")
+
+    def run(base_url: str, tenants: Optional[List[dict]] = None) -> dict:
+        return asyncio.run(run_replay(base_url, entries, args.users, args.speed, args.stagger,
+                                      args.allow_deletes, tenants))
+
+    if args.target:
+        report = run(args.target)
+    else:
+        with tempfile.TemporaryDirectory(prefix="cm-replay-") as tmp:
+            database_url = args.database_url or f"sqlite:///{tmp}/replay.db"
+            tenants = seed_tenants(args.users, args.memories, database_url) if args.memories else None
+            with local_servers(stub_arguments(args), database_url, args.workers) as base_url:
+                report = run(base_url, tenants)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Replayed {report['log_requests']} logged requests ({report['log_span_s']:.1f}s of log) "
+          f"x {report['users']} users at {args.speed:g}x in {report['duration_s']:.1f}s")
+    print_report(report["endpoints"])
+    print(f"\nstatus differs from log: {report['status_mismatches']}   "
+          f"max schedule lag: {report['max_schedule_lag_ms']:.1f}ms")
+    if report["skipped"]:
+        print("skipped: " + ", ".join(f"{endpoint} x{count}" for endpoint, count in report["skipped"].items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Startup Benchmark
+=================
+Measures serverless-style cold starts of the backend: time to import
+`main`, then the first request that needs no database and the first one
+that does. Each run is a fresh interpreter. Also prints an import-time
+profile (`python -X importtime`) of the slowest modules.
+
+Usage (from the backend directory):
+    python -m benchmarks.startup [--runs 5] [--top 25] [--json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Executed in a fresh interpreter for every run; prints timings as JSON
+_COLD_START_SCRIPT = """
+import json, sys, time
+t0 = time.perf_counter()
+import main
+t1 = time.perf_counter()
+from fastapi.testclient import TestClient
+client = TestClient(main.app)
+client.get("/")
+t2 = time.perf_counter()
+client.post("/api/auth/refresh", json={"refresh_token": "invalid"})
+client.get("/api/auth/me", headers={"Authorization": "Bearer invalid"})
+t3 = time.perf_counter()
+json.dump({"import_ms": (t1 - t0) * 1000, "first_request_ms": (t2 - t1) * 1000,
+           "first_db_request_ms": (t3 - t2) * 1000, "total_ms": (t3 - t0) * 1000}, sys.stdout)
+"""
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:////tmp/context_memory_bench.db")
+    env.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+    return env
+
+
+def measure_cold_starts(runs: int) -> Dict[str, Dict[str, float]]:
+    """Run the cold-start script `runs` times and summarize each phase."""
+    samples: Dict[str, List[float]] = {}
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-c", _COLD_START_SCRIPT],
+            cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True,
+        )
+        # Startup warnings are printed before the JSON line
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        for phase, value in result.items():
+            samples.setdefault(phase, []).append(value)
+
+    return {
+        phase: {
+            "median_ms": statistics.median(values),
+            "min_ms": min(values),
+            "max_ms": max(values),
+        }
+        for phase, values in samples.items()
+    }
+
+
+def profile_imports(top: int) -> List[Dict]:
+    """Return the `top` slowest modules by cumulative import time."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=_env(), capture_output=True, text=True, check=True,
+    )
+    modules = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_ms": int(self_us) / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+        })
+    modules.sort(key=lambda m: m["cumulative_ms"], reverse=True)
+    return modules[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start benchmark for the backend")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters to time")
+    parser.add_argument("--top", type=int, default=25, help="modules to show in the import profile")
+    parser.add_argument("--json", action="store_true", help="print machine-readable output")
+    args = parser.parse_args()
+
+    report = {
+        "cold_start": measure_cold_starts(args.runs),
+        "imports": profile_imports(args.top),
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Cold start ({args.runs} runs)")
+    print(f"{'phase':<22}{'median':>10}{'min':>10}{'max':>10}")
+    for phase, stats in report["cold_start"].items():
+        print(f"{phase:<22}{stats['median_ms']:>9.1f}ms{stats['min_ms']:>8.1f}ms{stats['max_ms']:>8.1f}ms")
+
+    print(f"\nSlowest imports (cumulative)")
+    print(f"{'cumulative':>12}{'self':>10}  module")
+    for mod in report["imports"]:
+        indent = "  " * mod["depth"]
+        print(f"{mod['cumulative_ms']:>10.1f}ms{mod['self_ms']:>8.1f}ms  {indent}{mod['module']}")
+
+
+if __name__ == "__main__":
+    main()
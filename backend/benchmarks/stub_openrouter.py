@@ -0,0 +1,220 @@
+"""
+Stub OpenRouter Server
+======================
+Local OpenAI-compatible server standing in for OpenRouter in benchmarks,
+so they run offline and measure the backend rather than the provider.
+
+Serves chat completions (plain and streamed), embeddings and the model list
+under /api/v1. Replies are shaped like the real ones ContextMemory expects:
+extraction prompts get a JSON list of facts, the memory classifier gets an
+ADD decision, and everything else gets a short canned reply. Embeddings are
+deterministic unit vectors derived from the input text.
+
+Latency, jitter and failure rate are configurable. Point the backend at it
+with OPENROUTER_BASE_URL=http://127.0.0.1:<port>/api/v1.
+
+Usage (from the backend directory):
+    python -m benchmarks.stub_openrouter [--port 8901] [--latency-ms 300]
+        [--embedding-latency-ms 40] [--jitter-ms 0] [--failure-rate 0]
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import time
+from typing import List
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Must match the dimension of ContextMemory's FAISS index
+EMBEDDING_DIM = 1536
+
+
+class StubSettings:
+    latency_ms = 300.0
+    embedding_latency_ms = 40.0
+    jitter_ms = 0.0
+    failure_rate = 0.0
+    stream_chunk_delay_ms = 20.0
+
+
+settings = StubSettings()
+app = FastAPI(title="Stub OpenRouter")
+
+
+async def _simulate(latency_ms: float):
+    """Sleep for the configured latency; returns an error response on simulated failure."""
+    delay = latency_ms + random.uniform(-settings.jitter_ms, settings.jitter_ms)
+    await asyncio.sleep(max(0.0, delay) / 1000)
+    if random.random() < settings.failure_rate:
+        return JSONResponse(
+            status_code=random.choice((429, 500, 502)),
+            content={"error": {"message": "Simulated provider failure", "code": "stub_failure"}},
+        )
+    return None
+
+
+def _token_count(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _reply_for(messages: List[dict]) -> str:
+    """Pick a reply matching the kind of prompt ContextMemory or the chat route sent."""
+    last = str(messages[-1].get("content", "")) if messages else ""
+
+    if "Extract memory facts" in last:
+        # The latest user turn follows "USER: " in the extraction prompt
+        user_text = last.split("USER: ", 1)[-1].split("ASSISTANT: ", 1)[0].strip()
+        topic = " ".join(user_text.split()[:8]) or "something"
+        return json.dumps({
+            "semantic": [f"User mentioned {topic}"],
+            "bubbles": [{"text": f"User talked about {topic}", "importance": 0.6}],
+        })
+
+    if "Decide the action." in last:
+        return json.dumps({"action": "ADD"})
+
+    if "Summarize the following conversation" in last:
+        return "The user and assistant have been chatting about everyday topics."
+
+    return "Thanks for sharing! I'll keep that in mind. " + " ".join(last.split()[:12])
+
+
+def embed(text: str) -> np.ndarray:
+    """Deterministic unit-length embedding for a piece of text."""
+    seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(EMBEDDING_DIM).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+@app.get("/api/v1/models")
+async def models():
+    return {"data": [{"id": "stub/chat", "object": "model"}, {"id": "stub/embedding", "object": "model"}]}
+
+
+@app.post("/api/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    failure = await _simulate(settings.latency_ms)
+    if failure is not None:
+        return failure
+
+    messages = body.get("messages", [])
+    model = body.get("model", "stub/chat")
+    reply = _reply_for(messages)
+    prompt_tokens = sum(_token_count(str(m.get("content", ""))) for m in messages)
+    completion_id = f"chatcmpl-stub-{random.getrandbits(48):x}"
+    created = int(time.time())
+
+    if body.get("stream"):
+        async def events():
+            for word in reply.split(" "):
+                chunk = {
+                    "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(settings.stream_chunk_delay_ms / 1000)
+            done = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            }
+            yield f"data: {json.dumps(done)}\n\ndata: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": created,
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": reply},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": _token_count(reply),
+            "total_tokens": prompt_tokens + _token_count(reply),
+        },
+    }
+
+
+@app.post("/api/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    failure = await _simulate(settings.embedding_latency_ms)
+    if failure is not None:
+        return failure
+
+    inputs = body.get("input", [])
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    tokens = sum(_token_count(text) for text in inputs)
+    # The OpenAI SDK asks for base64-encoded float32 vectors, like the real API
+    if body.get("encoding_format") == "base64":
+        encode = lambda vector: base64.b64encode(vector.tobytes()).decode()
+    else:
+        encode = lambda vector: vector.tolist()
+    # Returned as a JSONResponse to skip FastAPI's (slow) encoding of the float lists
+    return JSONResponse({
+        "object": "list",
+        "model": body.get("model", "stub/embedding"),
+        "data": [
+            {"object": "embedding", "index": i, "embedding": encode(embed(text))}
+            for i, text in enumerate(inputs)
+        ],
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+    })
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Stub knobs, shared with the load test so it can start the stub itself."""
+    parser.add_argument("--latency-ms", type=float, default=StubSettings.latency_ms,
+                        help="chat completion latency")
+    parser.add_argument("--embedding-latency-ms", type=float, default=StubSettings.embedding_latency_ms,
+                        help="embedding latency")
+    parser.add_argument("--jitter-ms", type=float, default=StubSettings.jitter_ms,
+                        help="uniform +/- jitter added to every call")
+    parser.add_argument("--failure-rate", type=float, default=StubSettings.failure_rate,
+                        help="fraction of calls failing with 429/500/502")
+    parser.add_argument("--stream-chunk-delay-ms", type=float, default=StubSettings.stream_chunk_delay_ms,
+                        help="delay between streamed chunks")
+
+
+def stub_arguments(args: argparse.Namespace) -> List[str]:
+    """Command-line flags reproducing the stub knobs in `args`."""
+    return [
+        "--latency-ms", str(args.latency_ms),
+        "--embedding-latency-ms", str(args.embedding_latency_ms),
+        "--jitter-ms", str(args.jitter_ms),
+        "--failure-rate", str(args.failure_rate),
+        "--stream-chunk-delay-ms", str(args.stream_chunk_delay_ms),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenRouter-compatible stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    settings.latency_ms = args.latency_ms
+    settings.embedding_latency_ms = args.embedding_latency_ms
+    settings.jitter_ms = args.jitter_ms
+    settings.failure_rate = args.failure_rate
+    settings.stream_chunk_delay_ms = args.stream_chunk_delay_ms
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
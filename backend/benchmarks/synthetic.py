@@ -0,0 +1,227 @@
+"""
+Synthetic Tenants
+=================
+Bulk-creates users with large memory graphs and chat histories, shaped
+like the demo graph in web/lib/demo-data.ts: semantic facts and episodic
+bubbles (importance 0.6) in the demo's proportions. Each new bubble links
+to up to 5 earlier memories with scores between the library's 0.6
+threshold and ~0.95, stored in both directions exactly as ContextMemory's
+connection finder writes them. Memories get random unit embeddings of the
+real dimension.
+
+Rows are inserted in batches with explicit IDs, so creating tens of
+thousands of memories takes seconds rather than hours of LLM calls.
+Works against SQLite or Postgres (whatever DATABASE_URL points at).
+
+Usage (from the backend directory):
+    python -m benchmarks.synthetic --users 10 --memories 1000
+        [--messages 100] [--database-url sqlite:////tmp/synthetic.db] [--seed 0]
+"""
+
+import argparse
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.harness import BACKEND_DIR, BENCHMARK_PASSWORD
+
+DEMO_DATA_PATH = os.path.join(os.path.dirname(BACKEND_DIR), "web", "lib", "demo-data.ts")
+
+EMBEDDING_DIM = 1536
+MAX_CONNECTIONS = 5
+CONNECTION_SCORE_RANGE = (0.6, 0.95)
+BATCH_SIZE = 500
+
+# Used when the frontend tree isn't next to the backend
+_FALLBACK_TEMPLATES = [
+    ("User lives in India", "semantic"),
+    ("User is actively developing AI skills", "semantic"),
+    ("User is planning to learn classical Kathak dance", "semantic"),
+    ("User is starting Kathak dance classes next week", "bubble"),
+    ("User loves and enjoys dancing", "semantic"),
+    ("User is considering joining the evening batch for dance classes", "bubble"),
+]
+
+
+def load_templates(path: str = DEMO_DATA_PATH) -> List[Tuple[str, str]]:
+    """(text, type) pairs from the demo graph's nodes."""
+    try:
+        with open(path) as f:
+            source = f.read()
+    except OSError:
+        return _FALLBACK_TEMPLATES
+    pairs = re.findall(r'text:\s*"([^"]+)",\s*type:\s*"(semantic|bubble)"', source)
+    return pairs or _FALLBACK_TEMPLATES
+
+
+def random_embedding(rng: np.random.Generator, dim: int = EMBEDDING_DIM) -> List[float]:
+    vector = rng.standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).round(6).tolist()
+
+
+def _memory_rows(
+    conversation_id: int,
+    first_id: int,
+    count: int,
+    templates: List[Tuple[str, str]],
+    rng: random.Random,
+    np_rng: np.random.Generator,
+    embeddings: bool,
+    start: datetime,
+) -> List[dict]:
+    """Memory rows for one tenant, with bidirectional bubble connections."""
+    rows = []
+    connections: Dict[int, Dict] = {}
+
+    for offset in range(count):
+        memory_id = first_id + offset
+        text, template_type = rng.choice(templates)
+        is_bubble = template_type == "bubble"
+        created_at = start + timedelta(minutes=offset * 3, seconds=rng.randint(0, 120))
+        rows.append({
+            "id": memory_id,
+            "conversation_id": conversation_id,
+            "memory_text": f"{text} (#{offset + 1})",
+            "embedding": random_embedding(np_rng) if embeddings else None,
+            "memory_metadata": None,
+            "created_at": created_at,
+            "updated_at": created_at,
+            "is_episodic": is_bubble,
+            "occurred_at": created_at if is_bubble else None,
+            "importance": 0.6 if is_bubble else 0.5,
+            "is_active": True,
+        })
+
+        # New bubbles link back to earlier memories, as the connection finder does
+        if is_bubble and offset:
+            candidates = rng.sample(range(first_id, memory_id), min(offset, rng.randint(0, MAX_CONNECTIONS)))
+            for target in candidates:
+                score = round(rng.uniform(*CONNECTION_SCORE_RANGE), 3)
+                for source, other in ((memory_id, target), (target, memory_id)):
+                    entry = connections.setdefault(source, {"bubble_ids": [], "scores": {}})
+                    if other not in entry["bubble_ids"]:
+                        entry["bubble_ids"].append(other)
+                        entry["scores"][str(other)] = score
+
+    for row in rows:
+        if row["id"] in connections:
+            row["memory_metadata"] = {"connections": connections[row["id"]]}
+    return rows
+
+
+def _message_rows(user_id: int, count: int, rng: random.Random, start: datetime) -> List[dict]:
+    rows = []
+    for i in range(count):
+        role = "user" if i % 2 == 0 else "assistant"
+        rows.append({
+            "user_id": user_id,
+            "role": role,
+            "content": f"Synthetic {role} message {i + 1}: " + " ".join(rng.choices(_WORDS, k=rng.randint(8, 60))),
+            "extracted_memories": None,
+            "created_at": start + timedelta(minutes=i * 2),
+        })
+    return rows
+
+
+_WORDS = "the a dance class week plan travel work music food family weekend learn practice morning".split()
+
+
+def generate_tenants(
+    users: int,
+    memories_per_user: int,
+    messages_per_user: int = 100,
+    embeddings: bool = True,
+    seed: int = 0,
+    email_prefix: Optional[str] = None,
+) -> List[dict]:
+    """
+    Create synthetic users with memory graphs and chat history.
+
+    Returns [{"id", "email", "memories"}] for the created users. Expects the
+    schema to exist (config.ensure_schema()).
+    """
+    from sqlalchemy import func, insert, text
+
+    from auth.password import hash_password
+    from contextmemory.db.models.conversation import Conversation
+    from contextmemory.db.models.memory import Memory as MemoryModel
+    from database import SessionLocal, get_engine
+    from models.chat_message import ChatMessage
+    from models.user import User
+
+    rng = random.Random(seed)
+    np_rng = np.random.default_rng(seed)
+    templates = load_templates()
+    prefix = email_prefix or f"synthetic-{int(time.time())}"
+    # One bcrypt hash shared by every synthetic user
+    hashed_password = hash_password(BENCHMARK_PASSWORD)
+    start = datetime.now(timezone.utc) - timedelta(days=90)
+
+    created = []
+    db = SessionLocal()
+    try:
+        next_memory_id = (db.query(func.max(MemoryModel.id)).scalar() or 0) + 1
+
+        for index in range(users):
+            user = User(name=f"Synthetic User {index + 1}", email=f"{prefix}-{index + 1}@example.com",
+                        hashed_password=hashed_password)
+            db.add(user)
+            db.flush()
+            db.add(Conversation(id=user.id))
+            db.flush()
+
+            rows = _memory_rows(user.id, next_memory_id, memories_per_user, templates, rng, np_rng, embeddings, start)
+            for i in range(0, len(rows), BATCH_SIZE):
+                db.execute(insert(MemoryModel.__table__), rows[i:i + BATCH_SIZE])
+            next_memory_id += memories_per_user
+
+            messages = _message_rows(user.id, messages_per_user, rng, start)
+            for i in range(0, len(messages), BATCH_SIZE):
+                db.execute(insert(ChatMessage.__table__), messages[i:i + BATCH_SIZE])
+
+            db.commit()
+            created.append({"id": user.id, "email": user.email, "memories": memories_per_user})
+
+        if get_engine().dialect.name == "postgresql":
+            # Explicit IDs bypass the sequence; move it past them
+            db.execute(text("SELECT setval(pg_get_serial_sequence('memories', 'id'), (SELECT MAX(id) FROM memories))"))
+            db.commit()
+    finally:
+        db.close()
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-create synthetic users with memory graphs")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--memories", type=int, default=1000, help="memories per user")
+    parser.add_argument("--messages", type=int, default=100, help="chat messages per user")
+    parser.add_argument("--no-embeddings", action="store_true", help="leave the embedding column empty")
+    parser.add_argument("--database-url", help="target database (default: DATABASE_URL)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    from config import ensure_schema
+    ensure_schema()
+
+    started = time.perf_counter()
+    created = generate_tenants(args.users, args.memories, args.messages, not args.no_embeddings, args.seed)
+    elapsed = time.perf_counter() - started
+
+    total = args.users * args.memories
+    print(f"Created {len(created)} users, {total} memories in {elapsed:.1f}s ({total / elapsed:.0f} memories/s)")
+    print(f"Password for every user: {BENCHMARK_PASSWORD}")
+    for user in created:
+        print(f"  {user['id']:>6}  {user['email']}")
+
+
+if __name__ == "__main__":
+    main()
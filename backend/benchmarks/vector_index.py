@@ -0,0 +1,200 @@
+"""
+Vector Index Report
+===================
+Recall vs. speed vs. memory for the vector index settings
+(services/vector_index.py). For each corpus size, every configuration is
+built from the same vectors (as an exact index) and queried with the same
+queries:
+
+    recall@k     share of the exact top k (float32, all dimensions) returned
+    p50 / p95    search latency per query
+    bytes/vec    in-memory index size per vector
+
+Configurations are precision x dimensions, each without rescoring
+(rescore 1) and with it (--rescore, default 4 candidates per result);
+float32 at full width is exact either way and never rescores.
+
+By default the corpus is synthetic: clustered unit vectors, with queries
+drawn near corpus vectors, which behaves like a user's memories in that
+most queries have a few close neighbours. Synthetic vectors spread their
+information evenly over all dimensions, so they understate how well
+truncation works on text-embedding-3 vectors; use --conversation-id to
+measure a real user's stored embeddings instead (from DATABASE_URL).
+
+With --scaling, the report is instead one row per corpus size for the
+configured store (EMBEDDING_INDEX_* and VECTOR_INDEX_* settings): the
+index type it ended up with, how long the background build took, and
+recall and latency, which should stay flat as the corpus grows.
+
+Usage (from the backend directory):
+    python -m benchmarks.vector_index [--sizes 1000,10000] [--queries 200]
+        [--k 10] [--rescore 4] [--configs float32-1536,int8-512,...]
+        [--conversation-id N] [--json]
+    python -m benchmarks.vector_index --scaling [--sizes 10,100,1000,10000,100000]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.harness import percentile
+
+DEFAULT_CONFIGS = "float32-1536,float16-1536,int8-1536,float32-512,float16-512,int8-512,int8-256"
+
+
+def synthetic_vectors(n: int, rng: np.random.Generator, dim: int = 1536) -> np.ndarray:
+    """Unit vectors in clusters of ~20 around random topics."""
+    centers = rng.standard_normal((max(n // 20, 1), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.9 * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def stored_vectors(conversation_id: int) -> np.ndarray:
+    from contextmemory.db.models.memory import Memory as MemoryModel
+    from database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        rows = db.query(MemoryModel.embedding).filter(
+            MemoryModel.conversation_id == conversation_id, MemoryModel.embedding.isnot(None)
+        ).all()
+    finally:
+        db.close()
+    vectors = np.asarray([embedding for (embedding,) in rows], dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def make_queries(corpus: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Perturbed corpus vectors: each query has a true near neighbour, but isn't one."""
+    picks = corpus[rng.integers(0, len(corpus), count)]
+    noise = rng.standard_normal(picks.shape).astype(np.float32) / np.sqrt(corpus.shape[1])
+    queries = picks + 0.8 * noise
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def evaluate(corpus: np.ndarray, queries: np.ndarray, truth: List[set], precision: str, dims: int,
+             rescore: int, k: int, index_dir: str) -> Dict[str, float]:
+    from services.vector_index import CompactVectorStore
+
+    store = CompactVectorStore(corpus.shape[1], precision, dims, rescore, adaptive=False)
+    for memory_id, vector in enumerate(corpus):
+        store.add(memory_id, vector)
+    # Saved and reloaded, so rescoring reads the memory-mapped file as in production
+    path = os.path.join(index_dir, f"bench_{precision}_{dims}_{rescore}")
+    store.save(path)
+    store = CompactVectorStore(corpus.shape[1], precision, dims, rescore, adaptive=False)
+    store.load(path)
+    return measure(store, queries, truth, k)
+
+
+def measure(store, queries: np.ndarray, truth: List[set], k: int) -> Dict[str, float]:
+    hits, samples = 0, []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        results = store.search(query, k)
+        samples.append((time.perf_counter() - started) * 1000)
+        hits += len(expected & {result["memory_id"] for result in results})
+    samples.sort()
+    return {
+        "recall": hits / (k * len(queries)),
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "bytes_per_vector": store.nbytes / max(store.index.ntotal, 1),
+    }
+
+
+def scaling_report(sizes: List[int], queries_per_size: int, k: int, rng: np.random.Generator) -> Dict[int, dict]:
+    """The configured store at each size, after its background build finished."""
+    from services.vector_index import CompactVectorStore
+
+    report = {}
+    for size in sizes:
+        corpus = synthetic_vectors(size, rng)
+        queries = make_queries(corpus, queries_per_size, rng)
+        exact = np.argsort(-(queries @ corpus.T), axis=1)[:, :k]
+        store = CompactVectorStore()
+        started = time.perf_counter()
+        for memory_id, vector in enumerate(corpus):
+            store.add(memory_id, vector)
+        store.wait_for_rebuild()
+        build_seconds = time.perf_counter() - started
+        report[size] = {
+            "index": store.kind,
+            "build_s": build_seconds,
+            **measure(store, queries, [set(row.tolist()) for row in exact], k),
+        }
+        del corpus, store
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs. speed of the compact vector index settings")
+    parser.add_argument("--sizes", default="1000,10000", help="synthetic corpus sizes, comma separated")
+    parser.add_argument("--queries", type=int, default=200, help="queries per configuration")
+    parser.add_argument("--k", type=int, default=10, help="results per query")
+    parser.add_argument("--rescore", type=int, default=4, help="rescore factor for the rescored runs")
+    parser.add_argument("--configs", default=DEFAULT_CONFIGS, help="precision-dimensions pairs, comma separated")
+    parser.add_argument("--conversation-id", type=int, help="use this user's stored embeddings (DATABASE_URL)")
+    parser.add_argument("--scaling", action="store_true", help="latency of the configured store by corpus size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="print machine-readable output")
+    args = parser.parse_args()
+    configs = [(config.split("-")[0], int(config.split("-")[1])) for config in args.configs.split(",")]
+    rng = np.random.default_rng(args.seed)
+
+    if args.scaling:
+        sizes = sorted(int(s) for s in args.sizes.split(","))
+        rows = scaling_report(sizes, args.queries, args.k, rng)
+        if args.json:
+            print(json.dumps({"k": args.k, "sizes": rows}, indent=2))
+            return
+        print(f"{'vectors':>9}{'index':>8}{'add+build':>11}{'recall':>8}{'p50':>10}{'p95':>10}{'bytes/vec':>11}")
+        for size, row in rows.items():
+            print(
+                f"{size:>9}{row['index']:>8}{row['build_s']:>10.1f}s{row['recall']:>8.3f}"
+                f"{row['p50_ms']:>8.2f}ms{row['p95_ms']:>8.2f}ms{row['bytes_per_vector']:>11.0f}"
+            )
+        return
+
+    if args.conversation_id is not None:
+        real = stored_vectors(args.conversation_id)
+        corpora = {len(real): real}
+    else:
+        corpora = {size: synthetic_vectors(size, rng) for size in sorted(int(s) for s in args.sizes.split(","))}
+
+    report: Dict[int, Dict[str, Dict[str, float]]] = {}
+    with tempfile.TemporaryDirectory(prefix="cm-vectors-") as index_dir:
+        for size, corpus in corpora.items():
+            queries = make_queries(corpus, args.queries, rng)
+            exact = np.argsort(-(queries @ corpus.T), axis=1)[:, :args.k]
+            truth = [set(row.tolist()) for row in exact]
+            report[size] = {}
+            for precision, dims in configs:
+                for rescore in sorted({1, args.rescore}):
+                    label = f"{precision}-{dims} rescore {rescore}"
+                    report[size][label] = evaluate(
+                        corpus, queries, truth, precision, dims, rescore, args.k, index_dir
+                    )
+
+    if args.json:
+        print(json.dumps({"k": args.k, "sizes": report}, indent=2))
+        return
+
+    for size, rows in report.items():
+        print(f"\nn={size}, recall@{args.k} against exact float32 search")
+        print(f"{'configuration':<28}{'recall':>8}{'p50':>10}{'p95':>10}{'bytes/vec':>11}{'vs float32':>12}")
+        baseline = rows.get("float32-1536 rescore 1", next(iter(rows.values())))["bytes_per_vector"]
+        for label, row in rows.items():
+            print(
+                f"{label:<28}{row['recall']:>8.3f}{row['p50_ms']:>8.2f}ms{row['p95_ms']:>8.2f}ms"
+                f"{row['bytes_per_vector']:>11.0f}{baseline / row['bytes_per_vector']:>11.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+In-Process Caches
+=================
+Small thread-safe TTL/LRU cache shared by the auth and chat hot paths.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from metrics import CACHE_REQUESTS
+
+
+class TTLCache:
+    """
+    Size-bounded LRU cache whose entries expire after a fixed TTL.
+
+    Safe to use from FastAPI's threadpool (sync routes) and the event loop.
+    `on_evict(key, value)` is called whenever an entry leaves the cache
+    (expiry, LRU eviction, explicit invalidation or clear).
+    Named caches report hits and misses to the cache_requests_total metric.
+    """
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        on_evict: Optional[Callable[[Hashable, Any], None]] = None,
+        name: Optional[str] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._on_evict = on_evict
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._record("miss")
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self._evicted(key, value)
+                self._record("miss")
+                return None
+            self._data.move_to_end(key)
+            self._record("hit")
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entry if full."""
+        if self.maxsize <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None and old[1] is not value:
+                self._evicted(key, old[1])
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            while len(self._data) > self.maxsize:
+                old_key, (_, old_value) = self._data.popitem(last=False)
+                self._evicted(old_key, old_value)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a single entry if present."""
+        with self._lock:
+            item = self._data.pop(key, None)
+            if item is not None:
+                self._evicted(key, item[1])
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            items = list(self._data.items())
+            self._data.clear()
+            for key, (_, value) in items:
+                self._evicted(key, value)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _record(self, result: str) -> None:
+        if self.name is not None:
+            CACHE_REQUESTS.inc(cache=self.name, result=result)
+
+    def _evicted(self, key: Hashable, value: Any) -> None:
+        if self._on_evict is not None:
+            self._on_evict(key, value)
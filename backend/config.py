@@ -4,15 +4,19 @@ Configuration Module
 Handles environment variables, ContextMemory configuration, and API clients.
 """
 
+import hashlib
+import logging
 import os
 from dotenv import load_dotenv
-from openai import OpenAI
 
-from contextmemory import configure, create_table, SessionLocal
+# contextmemory and openai are imported lazily: they dominate import time
+# and cold starts shouldn't pay for them before a request needs them.
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # ═══════════════════════════════════════════════════════
 # ENVIRONMENT VARIABLES
 # ═══════════════════════════════════════════════════════
@@ -22,33 +26,72 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 LLM_MODEL = os.getenv("LLM_MODEL", "openai/gpt-4o-mini")
 EXTRACTION_MODEL = os.getenv("EXTRACTION_MODEL", "anthropic/claude-sonnet-4.5")
 EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "openai/text-embedding-3-small")
+# openrouter (EMBEDDING_MODEL via the provider) | local (on-box, see services/local_embeddings.py)
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openrouter").lower()
+# OpenAI-compatible endpoint for chat, extraction and embeddings; override
+# to route through a gateway or a local stub (see benchmarks/stub_openrouter.py)
+DEFAULT_OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+OPENROUTER_BASE_URL = os.getenv("OPENROUTER_BASE_URL", DEFAULT_OPENROUTER_BASE_URL).rstrip("/")
 
 # Auth configuration
 JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
 ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY")
 
+# Schema management: "auto" creates tables on startup unless the schema
+# marker is current, "skip" leaves it to `python migrate.py`
+SCHEMA_INIT = os.getenv("SCHEMA_INIT", "auto")
+# Bump whenever models or indexes change so existing databases are migrated
+SCHEMA_VERSION = 4
+
+# Connection pooling for the shared engine (see database.py)
+# DB_POOL_MODE: auto | queue | null | pgbouncer
+#   auto picks null on Vercel, pgbouncer for Neon "-pooler" hosts, else queue
+DB_POOL_MODE = os.getenv("DB_POOL_MODE", "auto")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("true", "1", "yes")
+
+# Tuned SQLite profile, applied when DATABASE_URL is SQLite (including the
+# /tmp fallback below). Set SQLITE_TUNED=false for SQLite's stock settings.
+SQLITE_TUNED = os.getenv("SQLITE_TUNED", "true").lower() in ("true", "1", "yes")
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "15000"))
+# Serialize write transactions within the process instead of racing for the lock
+SQLITE_SINGLE_WRITER = os.getenv("SQLITE_SINGLE_WRITER", "true").lower() in ("true", "1", "yes")
+
 # Validate required environment variables
 if not DATABASE_URL:
     # Fallback to ephemeral SQLite in /tmp (writable in Vercel Lambda)
-    print("Warning: DATABASE_URL not set. Using ephemeral SQLite in /tmp.")
+    logger.warning("DATABASE_URL not set. Using ephemeral SQLite in /tmp.")
     DATABASE_URL = "sqlite:////tmp/context_memory.db"
 
 if not JWT_SECRET_KEY:
-    print("Warning: JWT_SECRET_KEY not set. Using unsafe default.")
+    logger.warning("JWT_SECRET_KEY not set. Using unsafe default.")
     JWT_SECRET_KEY = "unsafe-default-secret-key-change-me"
 
 if not ENCRYPTION_KEY:
-    print("Warning: ENCRYPTION_KEY not set. Using unsafe default.")
+    logger.warning("ENCRYPTION_KEY not set. Using unsafe default.")
     ENCRYPTION_KEY = "unsafe-default-encryption-key-change-me"
 
 
+_contextmemory_configured = False
+
+
 def init_contextmemory(api_key: str = None):
-    """Initialize ContextMemory with configuration and create tables."""
+    """Configure ContextMemory (no database round trips)."""
+    global _contextmemory_configured
+    from contextmemory import configure
+
     # Use provided API key or fall back to environment variable
     key = api_key or OPENROUTER_API_KEY
     if not key:
         # Don't raise error here, let the chat endpoint handle it gracefully with 503
-        print("Warning: OpenRouter API key not found during initialization")
+        logger.warning("OpenRouter API key not found during initialization")
         pass
 
     configure(
@@ -58,13 +101,141 @@ def init_contextmemory(api_key: str = None):
         embedding_model=EMBEDDING_MODEL,
         database_url=DATABASE_URL,
     )
-    create_table()
+
+    if key:
+        # Pre-seed ContextMemory's lazily created clients: it hardcodes
+        # openrouter.ai (ignoring OPENROUTER_BASE_URL) and would use the SDK's
+        # 10 minute timeout for embedding and extraction calls
+        from contextmemory.core import openai_client
+        from services.embedding_batcher import EMBEDDING_BATCH_ENABLED, BatchingEmbeddingClient
+        from services.openrouter_client import create_openrouter_client
+        from services.provider_calls import PROVIDER_MEMORY_MAX_RETRIES, PROVIDER_MEMORY_TIMEOUT_SECONDS
+
+        for attr in ("_llm_client", "_embedding_client"):
+            setattr(openai_client, attr, create_openrouter_client(
+                key, timeout=PROVIDER_MEMORY_TIMEOUT_SECONDS, max_retries=PROVIDER_MEMORY_MAX_RETRIES,
+            ))
+        if EMBEDDING_BATCH_ENABLED:
+            # Coalesce embedding calls from concurrent requests into batches
+            openai_client._embedding_client = BatchingEmbeddingClient(openai_client._embedding_client)
+
+    if EMBEDDING_PROVIDER == "local":
+        from contextmemory.core import openai_client
+        from services.local_embeddings import LocalEmbeddingClient
+
+        openai_client._embedding_client = LocalEmbeddingClient()
+
+    from services.vector_index import install_compact_vectors
+
+    install_compact_vectors()
+
+    _contextmemory_configured = True
+
+
+def ensure_contextmemory():
+    """Configure ContextMemory once, before its LLM/embedding helpers are used."""
+    if not _contextmemory_configured:
+        init_contextmemory()
+
+
+def init_memory_tables():
+    """Create ContextMemory's tables on the shared engine."""
+    import contextmemory.db.models  # noqa: F401 - registers the library's models
+    from contextmemory.db.database import Base as MemoryBase
+    from database import get_engine
+
+    MemoryBase.metadata.create_all(bind=get_engine())
 
 
 def init_auth_tables():
     """Create auth-related database tables."""
-    from sqlalchemy import create_engine
+    import models  # noqa: F401 - registers every model on Base
     from models.user import Base
+    from database import get_engine
 
-    engine = create_engine(DATABASE_URL)
+    engine = get_engine()
     Base.metadata.create_all(bind=engine)
+
+    # create_all skips existing tables, so add indexes introduced later
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+# ═══════════════════════════════════════════════════════
+# SCHEMA MANAGEMENT
+# ═══════════════════════════════════════════════════════
+
+def _schema_marker_path() -> str:
+    """Per-database marker file so warm instances skip even the version query."""
+    digest = hashlib.sha256(f"{DATABASE_URL}:{SCHEMA_VERSION}".encode()).hexdigest()[:16]
+    return f"/tmp/.context_memory_schema_{digest}"
+
+
+def get_applied_schema_version():
+    """Read the applied schema version, or None if the marker table is missing."""
+    from sqlalchemy import text
+    from sqlalchemy.exc import SQLAlchemyError
+    from database import get_engine
+
+    try:
+        with get_engine().connect() as conn:
+            return conn.execute(text("SELECT MAX(version) FROM schema_marker")).scalar()
+    except SQLAlchemyError:
+        return None
+
+
+def run_migrations():
+    """Create all tables and indexes, then record the schema version."""
+    from datetime import datetime, timezone
+    from sqlalchemy.dialects import postgresql, sqlite
+    from models.schema_marker import SchemaMarker
+    from database import SessionLocal
+
+    init_auth_tables()
+    init_memory_tables()
+
+    db = SessionLocal()
+    try:
+        # An upsert, so workers migrating at the same time don't collide on id 1
+        insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        values = {"version": SCHEMA_VERSION, "applied_at": datetime.now(timezone.utc)}
+        db.execute(
+            insert(SchemaMarker)
+            .values(id=1, **values)
+            .on_conflict_do_update(index_elements=[SchemaMarker.id], set_=values)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+    _write_schema_marker_file()
+
+
+def ensure_schema():
+    """
+    Make sure the schema is current with as few round trips as possible.
+
+    Checks the local marker file, then the schema_marker table (one query),
+    and only runs the full table/index creation when the version is behind.
+    """
+    if SCHEMA_INIT == "skip":
+        return
+    # SQLite files are local (and easily deleted), so always ask the database
+    if not DATABASE_URL.startswith("sqlite") and os.path.exists(_schema_marker_path()):
+        return
+
+    applied = get_applied_schema_version()
+    if applied is not None and applied >= SCHEMA_VERSION:
+        _write_schema_marker_file()
+        return
+
+    run_migrations()
+
+
+def _write_schema_marker_file():
+    try:
+        with open(_schema_marker_path(), "w") as f:
+            f.write(str(SCHEMA_VERSION))
+    except OSError:
+        pass
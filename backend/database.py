@@ -1,12 +1,359 @@
 """
 Database Module
 ===============
-Database session dependency for FastAPI.
+The single SQLAlchemy engine shared by the auth models and ContextMemory,
+its asyncio counterpart (asyncpg / aiosqlite) for non-blocking routes,
+the session dependencies for FastAPI, and helpers for standalone sessions.
+
+Sync sessions remain for ContextMemory, which only speaks sync SQLAlchemy.
+
+SQLite databases get a tuned profile (WAL, relaxed fsync, mmap, page cache,
+busy timeout) and, for sync sessions, a single-writer queue so concurrent
+chat turns wait their turn instead of failing with "database is locked".
+Writes on the asyncio engine (auth, bootstrap) don't go through the queue;
+they rely on the busy timeout alone. Memory extraction commits at every
+flush on SQLite (short_write_transactions), so neither the queue slot nor
+SQLite's write lock is held across its provider calls.
 """
 
-from typing import Generator
-from sqlalchemy.orm import Session
-from contextmemory import SessionLocal
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import AsyncGenerator, Callable, Generator, Iterator, Optional, TypeVar
+from urllib.parse import urlparse
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import NullPool
+
+from config import (
+    DATABASE_URL,
+    DB_POOL_MODE,
+    DB_POOL_SIZE,
+    DB_MAX_OVERFLOW,
+    DB_POOL_TIMEOUT,
+    DB_POOL_RECYCLE,
+    DB_POOL_PRE_PING,
+    SQLITE_TUNED,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_SIZE_KB,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_SINGLE_WRITER,
+)
+from logging_config import add_request_timing
+from metrics import DB_QUERY_DURATION, statement_operation
+
+logger = logging.getLogger(__name__)
+
+# Global instances (lazy initialized)
+_engine: Optional[Engine] = None
+_session_factory: Optional[sessionmaker] = None
+_async_engine: Optional[AsyncEngine] = None
+_async_session_factory: Optional[async_sessionmaker] = None
+
+
+def resolve_pool_mode(database_url: str = DATABASE_URL) -> str:
+    """Pick the pool mode, resolving "auto" from the environment and URL."""
+    if DB_POOL_MODE != "auto":
+        return DB_POOL_MODE
+    if database_url.startswith("sqlite"):
+        return "queue"
+    if os.getenv("VERCEL") == "1":
+        # Serverless instances are frozen between requests; pooled
+        # connections would just go stale
+        return "null"
+    if "-pooler" in (urlparse(database_url).hostname or ""):
+        return "pgbouncer"
+    return "queue"
+
+
+def _pool_kwargs(mode: str) -> dict:
+    """Engine keyword arguments for a pool mode (shared by sync and async engines)."""
+    kwargs = {"pool_pre_ping": DB_POOL_PRE_PING}
+
+    if mode == "null":
+        kwargs["poolclass"] = NullPool
+    elif mode == "pgbouncer":
+        # The pooler (e.g. Neon's) drops idle clients, so always ping and
+        # recycle client connections well before its idle timeout
+        kwargs.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=min(DB_POOL_RECYCLE, 300),
+            pool_pre_ping=True,
+        )
+    else:
+        kwargs.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    return kwargs
+
+
+def create_db_engine(database_url: str = DATABASE_URL) -> Engine:
+    """Create an engine with the configured pooling."""
+    connect_args = {}
+    if database_url.startswith("sqlite"):
+        # Sessions are used from FastAPI's threadpool
+        connect_args["check_same_thread"] = False
+
+    engine = create_engine(database_url, connect_args=connect_args, **_pool_kwargs(resolve_pool_mode(database_url)))
+    _install_query_metrics(engine)
+    if _use_sqlite_tuning(database_url):
+        _install_sqlite_pragmas(engine)
+    return engine
+
+
+def to_async_url(database_url: str = DATABASE_URL) -> str:
+    """Translate a sync database URL to its asyncio driver (asyncpg / aiosqlite)."""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+
+    if backend == "sqlite":
+        return url.set(drivername="sqlite+aiosqlite").render_as_string(hide_password=False)
+
+    if backend == "postgresql":
+        # asyncpg spells libpq's sslmode as ssl and has no channel_binding
+        query = dict(url.query)
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        query.pop("channel_binding", None)
+        return url.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+
+    return database_url
+
+
+def create_async_db_engine(database_url: str = DATABASE_URL) -> AsyncEngine:
+    """Create the asyncio engine with the same pooling as the sync one."""
+    mode = resolve_pool_mode(database_url)
+    async_url = to_async_url(database_url)
+
+    connect_args = {}
+    if mode == "pgbouncer" and async_url.startswith("postgresql+asyncpg"):
+        # Transaction-mode poolers can't keep server-side prepared statements
+        connect_args["statement_cache_size"] = 0
+        async_url = make_url(async_url).update_query_dict(
+            {"prepared_statement_cache_size": "0"}
+        ).render_as_string(hide_password=False)
+
+    engine = create_async_engine(async_url, connect_args=connect_args, **_pool_kwargs(mode))
+    _install_query_metrics(engine.sync_engine)
+    if _use_sqlite_tuning(database_url):
+        _install_sqlite_pragmas(engine.sync_engine)
+    return engine
+
+
+def get_engine() -> Engine:
+    """Get or create the shared engine."""
+    global _engine
+    if _engine is None:
+        _engine = create_db_engine()
+    return _engine
+
+
+def SessionLocal() -> Session:
+    """Create a new session on the shared engine."""
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(autoflush=False, autocommit=False, bind=get_engine())
+        if SQLITE_SINGLE_WRITER and _use_sqlite_tuning(DATABASE_URL):
+            _install_sqlite_writer_queue(_session_factory)
+    return _session_factory()
+
+
+def get_async_engine() -> AsyncEngine:
+    """Get or create the shared asyncio engine."""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_db_engine()
+    return _async_engine
+
+
+def AsyncSessionLocal() -> AsyncSession:
+    """Create a new asyncio session on the shared async engine."""
+    global _async_session_factory
+    if _async_session_factory is None:
+        # Objects stay usable after commit: lazy loads aren't possible in async code
+        _async_session_factory = async_sessionmaker(
+            bind=get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _async_session_factory()
+
+
+def _install_query_metrics(engine: Engine) -> None:
+    """Time every statement into db_query_duration_seconds and the request log."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _stop(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started_at"].pop()
+        DB_QUERY_DURATION.observe(elapsed, operation=statement_operation(statement))
+        add_request_timing("db", elapsed, count_name="db_queries")
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(exception_context):
+        # after_cursor_execute doesn't run for failed statements
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_started_at"):
+            conn.info["query_started_at"].pop()
+
+
+# ═══════════════════════════════════════════════════════
+# SQLITE PROFILE
+# ═══════════════════════════════════════════════════════
+
+_sqlite_write_lock = threading.Lock()
+_WRITE_SLOT_KEY = "sqlite_write_slot"
+
+
+def _use_sqlite_tuning(database_url: str) -> bool:
+    # In-memory databases have no journal or file to map
+    return SQLITE_TUNED and database_url.startswith("sqlite") and ":memory:" not in database_url
+
+
+def sqlite_pragmas() -> list:
+    """PRAGMA statements run on every new SQLite connection."""
+    return [
+        f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        # Negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def _install_sqlite_pragmas(engine: Engine) -> None:
+    @event.listens_for(engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in sqlite_pragmas():
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def _acquire_write_slot(session: Session) -> None:
+    if session.info.get(_WRITE_SLOT_KEY):
+        return
+    # Fall back to SQLite's own busy handling rather than waiting forever
+    if _sqlite_write_lock.acquire(timeout=SQLITE_BUSY_TIMEOUT_MS / 1000):
+        session.info[_WRITE_SLOT_KEY] = True
+    else:
+        logger.warning("timed out waiting for the SQLite writer queue")
+
+
+def _install_sqlite_writer_queue(factory: sessionmaker) -> None:
+    """
+    Let one sync session at a time hold a write transaction.
+
+    The slot is taken on the first flush or bulk INSERT/UPDATE/DELETE and
+    released when the session's outermost transaction ends. Asyncio
+    sessions aren't covered.
+    """
+
+    @event.listens_for(factory, "before_flush")
+    def _before_flush(session, flush_context, instances):
+        _acquire_write_slot(session)
+
+    @event.listens_for(factory, "do_orm_execute")
+    def _before_bulk_write(orm_execute_state):
+        if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+            _acquire_write_slot(orm_execute_state.session)
+
+    @event.listens_for(factory, "after_transaction_end")
+    def _release(session, transaction):
+        if transaction.parent is None and session.info.pop(_WRITE_SLOT_KEY, False):
+            _sqlite_write_lock.release()
+
+
+@contextmanager
+def short_write_transactions(db: Session) -> Iterator[None]:
+    """
+    On SQLite, commit at every flush inside the block.
+
+    ContextMemory's update and bubble phases flush each new memory (for its
+    id) and commit only after the embedding and LLM calls for the remaining
+    ones, and SQLite holds its write lock from the first flush to the
+    commit: one user's extraction would block every other writer for the
+    length of those calls. Committing per flush keeps each write short. A
+    failed extraction keeps the memories committed before the failure,
+    which also keeps the database in step with the vector index they were
+    already added to.
+    """
+    if not DATABASE_URL.startswith("sqlite"):
+        yield
+        return
+
+    flush = db.flush
+    committing = False
+
+    def flush_and_commit(objects=None) -> None:
+        nonlocal committing
+        flush(objects)
+        # commit() flushes again; don't recurse
+        if not committing:
+            committing = True
+            try:
+                db.commit()
+            finally:
+                committing = False
+
+    db.flush = flush_and_commit
+    try:
+        yield
+    finally:
+        del db.flush
+
+
+def get_pool_stats() -> dict:
+    """Current connection pool usage of the shared engine."""
+    pool = get_engine().pool
+    stats = {
+        "mode": resolve_pool_mode(),
+        "pool_class": type(pool).__name__,
+    }
+    stats.update(_pool_usage(pool))
+    if _async_engine is not None:
+        stats["async"] = {"pool_class": type(_async_engine.pool).__name__, **_pool_usage(_async_engine.pool)}
+    return stats
+
+
+def _pool_usage(pool) -> dict:
+    # NullPool/StaticPool don't track connections
+    usage = {}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            usage[name] = method()
+    return usage
+
+
+async def dispose_engine() -> None:
+    """Close all pooled connections (called on application shutdown)."""
+    global _engine, _session_factory, _async_engine, _async_session_factory
+    if _engine is not None:
+        _engine.dispose()
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    _engine = None
+    _session_factory = None
+    _async_engine = None
+    _async_session_factory = None
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -16,3 +363,23 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependency that creates a fresh asyncio session per request."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+T = TypeVar("T")
+
+
+async def run_with_async_session(func: Callable[..., T], *args) -> T:
+    """
+    Call a sync-style func(db, *args) on its own asyncio session.
+
+    The function runs through AsyncSession.run_sync, so its queries go
+    through the async driver without blocking the event loop.
+    """
+    async with AsyncSessionLocal() as db:
+        return await db.run_sync(func, *args)
@@ -0,0 +1,203 @@
+"""
+Extraction Gate
+===============
+Cheap local check that decides whether a chat turn can contain anything
+worth remembering, so "thanks", "ok" and general questions don't cost an
+extraction call with EXTRACTION_MODEL.
+
+Only the user's message is looked at: extraction only ever keeps what the
+user says. The decision is made by rules first (empty, stock phrases,
+explicit "remember ..." requests) and otherwise by a small hand-weighted
+logistic score over features such as first-person statements, personal
+topics, time expressions, proper nouns and length. Turns scoring below
+EXTRACTION_GATE_THRESHOLD skip extraction; they are still written to
+ContextMemory's message log so later extractions and summaries see them.
+The rules and features are English: messages with letters outside ASCII
+(other scripts, accented Latin) always go to extraction.
+
+Each decision is logged (event "extraction_gate") with its score and
+reason, and counted in extraction_gate_decisions_total, so the threshold
+can be tuned against what extraction actually returned. Set
+EXTRACTION_GATE_LOG_TEXT=true to include the message text in the log.
+"""
+
+import logging
+import math
+import os
+import re
+from dataclasses import dataclass
+from typing import List
+
+from sqlalchemy.orm import Session
+
+from metrics import EXTRACTION_GATE_DECISIONS
+
+logger = logging.getLogger(__name__)
+
+EXTRACTION_GATE_ENABLED = os.getenv("EXTRACTION_GATE_ENABLED", "true").lower() in ("true", "1", "yes")
+# Probability (0-1) below which extraction is skipped; lower extracts more
+EXTRACTION_GATE_THRESHOLD = float(os.getenv("EXTRACTION_GATE_THRESHOLD", "0.3"))
+EXTRACTION_GATE_LOG = os.getenv("EXTRACTION_GATE_LOG", "true").lower() in ("true", "1", "yes")
+EXTRACTION_GATE_LOG_TEXT = os.getenv("EXTRACTION_GATE_LOG_TEXT", "false").lower() in ("true", "1", "yes")
+
+# Whole messages (after normalizing) that never carry a fact or event
+TRIVIAL_PHRASES = frozenset(phrase.strip() for phrase in """
+hi, hello, hey, hiya, yo, sup, heya, howdy, greetings, hi there, hello there, hey there,
+good morning, good afternoon, good evening, good night, gn, gm,
+how are you, how are you doing, hows it going, how's it going, whats up, what's up, how r u,
+thanks, thank you, thanks a lot, thank you so much, thx, ty, tysm, cheers, much appreciated, appreciate it,
+ok, okay, k, kk, okk, okie, alright, all right, sure, fine, cool, nice, great, awesome, perfect, good,
+ok thanks, okay thanks, great thanks, cool thanks, thanks again, perfect thanks,
+got it, gotcha, i see, understood, makes sense, sounds good, noted, right, true, indeed, exactly,
+yes, yeah, yep, yup, no, nope, nah, maybe, idk, i dont know, i don't know, not sure,
+lol, lmao, haha, hahaha, hehe, wow, omg, oh, ah, hmm, hm, uh, um,
+bye, goodbye, good bye, see you, see ya, later, cya, ttyl, take care,
+continue, go on, more, next, please, again, retry, try again
+""".replace("\n", " ").split(",")) - {""}
+
+# "Remember that ...", "don't forget ...": always extract
+EXPLICIT_REQUEST = re.compile(r"\b(remember|don'?t forget|do not forget|note that|keep in mind|make a note)\b")
+
+FIRST_PERSON = re.compile(r"\b(i|i'm|im|i've|ive|i'll|i'd|my|me|mine|myself|we|we're|our|ours|us)\b")
+# Statements about the user: identity, preferences, situation, plans
+SELF_DISCLOSURE = re.compile(
+    r"\b(i am|i'm|im|i was|i've been|i have|i've got|i had|i work|i worked|i live|i lived|i like|i love|"
+    r"i hate|i prefer|i enjoy|i dislike|i can't stand|i need|i want|i plan|i'm planning|i'm going|i decided|"
+    r"i started|i just|i got|i'm moving|i moved|i use|i'm using|i'm working|i'm learning|i study|i'm studying|"
+    r"my name|call me|i'm from|i was born|we're|we are|we have|our)\b"
+)
+PERSONAL_TOPICS = re.compile(
+    r"\b(name|age|birthday|born|wife|husband|partner|girlfriend|boyfriend|son|daughter|kids?|children|mom|"
+    r"mother|dad|father|sister|brother|family|friend|dog|cat|pet|job|work|boss|team|company|career|"
+    r"promot\w*|hired|fired|interview|school|university|college|degree|exam|project|startup|deadline|"
+    r"allergic|allergy|vegan|vegetarian|diet|health|doctor|hospital|moving|apartment|house|city|"
+    r"country|trip|flight|travel\w*|vacation|wedding|married|hobby|favorite|favourite|goal|bug|error|"
+    r"stuck|blocked|launch\w*|release)\b"
+)
+TIME_EXPRESSION = re.compile(
+    r"\b(today|tonight|tomorrow|yesterday|this (morning|week|weekend|month|year)|next (week|month|year|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday)|last (week|month|year|night)|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|january|february|march|april|june|"
+    r"july|august|september|october|november|december|\d{1,2}(st|nd|rd|th)|\d{4}|\d{1,2}[:/.-]\d{1,2})\b"
+)
+QUESTION_START = re.compile(
+    r"^(what|who|where|when|why|how|which|can you|could you|would you|will you|is|are|does|do|did|"
+    r"explain|tell me|write|give me|show me|list|summarize|translate|define)\b"
+)
+# \w is Unicode-aware, so other scripts survive normalizing
+WORD = re.compile(r"\w+(?:'\w+)?")
+# Capitalized word that isn't the first word of a sentence
+PROPER_NOUN = re.compile(r"(?<![.!?]\s)(?<!^)\b[A-Z][a-z]{2,}")
+
+# Logistic weights, hand-tuned on sample turns; bias keeps short chatter below the threshold
+WEIGHTS = {
+    "bias": -2.2,
+    "first_person": 1.2,
+    "self_disclosure": 1.4,
+    "personal_topic": 0.9,
+    "time_expression": 0.7,
+    "proper_noun": 0.5,
+    "length": 1.0,        # scaled 0..1 over the first 30 words
+    "question": -1.0,     # asking something, without saying anything about themselves
+}
+
+
+@dataclass
+class GateDecision:
+    extract: bool
+    score: float
+    reason: str
+
+
+def _normalize(text: str) -> str:
+    return " ".join(WORD.findall(text.lower().replace("’", "'")))
+
+
+def score_message(text: str) -> GateDecision:
+    """Decide whether a user message may contain new facts or events."""
+    normalized = _normalize(text)
+    if not normalized:
+        return GateDecision(False, 0.0, "empty")
+    if normalized in TRIVIAL_PHRASES:
+        return GateDecision(False, 0.0, "trivial_phrase")
+    if EXPLICIT_REQUEST.search(normalized):
+        return GateDecision(True, 1.0, "explicit_request")
+    if not normalized.isascii():
+        # Not something the English rules below can judge
+        return GateDecision(True, 1.0, "non_english")
+
+    words = normalized.split()
+    self_disclosure = bool(SELF_DISCLOSURE.search(normalized))
+    features = {
+        "first_person": bool(FIRST_PERSON.search(normalized)),
+        "self_disclosure": self_disclosure,
+        "personal_topic": bool(PERSONAL_TOPICS.search(normalized)),
+        "time_expression": bool(TIME_EXPRESSION.search(normalized)),
+        "proper_noun": bool(PROPER_NOUN.search(text.strip())),
+        "length": min(len(words), 30) / 30,
+        "question": not self_disclosure and (text.rstrip().endswith("?") or bool(QUESTION_START.match(normalized))),
+    }
+    logit = WEIGHTS["bias"] + sum(WEIGHTS[name] * float(value) for name, value in features.items())
+    score = 1 / (1 + math.exp(-logit))
+    extract = score >= EXTRACTION_GATE_THRESHOLD
+    strongest = max(
+        (name for name, value in features.items() if value and WEIGHTS[name] > 0),
+        key=lambda name: WEIGHTS[name] * float(features[name]),
+        default="no_signal",
+    )
+    return GateDecision(extract, round(score, 3), strongest if extract else "low_score")
+
+
+def should_extract(user_message: str) -> GateDecision:
+    """Gate decision for a turn, logged and counted."""
+    if not EXTRACTION_GATE_ENABLED:
+        return GateDecision(True, 1.0, "gate_disabled")
+
+    decision = score_message(user_message)
+    EXTRACTION_GATE_DECISIONS.inc(decision="extract" if decision.extract else "skip", reason=decision.reason)
+    if EXTRACTION_GATE_LOG:
+        extra = {
+            "event": "extraction_gate",
+            "extract": decision.extract,
+            "score": decision.score,
+            "reason": decision.reason,
+            "words": len(user_message.split()),
+        }
+        if EXTRACTION_GATE_LOG_TEXT:
+            extra["text"] = user_message
+        logger.info("Extraction gate decision", extra=extra)
+    return decision
+
+
+def record_turn_without_extraction(db: Session, conversation_id: int, messages: List[dict]) -> None:
+    """
+    What memory.add does besides extraction: append the turn to ContextMemory's
+    message log (the context for later extractions) and refresh the
+    conversation summary when it is due.
+
+    Only the summary makes a provider call, so only it goes through the
+    memory_add circuit breaker; while that is open the summary is skipped
+    until its next trigger instead of failing the turn.
+    """
+    from contextmemory.db.models.message import Message, SenderEnum
+    from contextmemory.summary.summary_generator import SUMMARY_TRIGGER_COUNT, generate_conversation_summary
+    from services.provider_calls import ProviderUnavailable, provider_guard
+
+    db.add_all([
+        Message(
+            conversation_id=conversation_id,
+            sender=SenderEnum.USER if message["role"] == "user" else SenderEnum.ASSISTANT,
+            message_text=message["content"],
+        )
+        for message in messages
+    ])
+    db.commit()
+
+    count = db.query(Message).filter(Message.conversation_id == conversation_id).count()
+    if count % SUMMARY_TRIGGER_COUNT != 0:
+        return
+    try:
+        with provider_guard("memory_add"):
+            generate_conversation_summary(db, conversation_id)
+    except ProviderUnavailable as e:
+        logger.warning(f"Conversation summary skipped: {e}")
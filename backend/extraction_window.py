@@ -0,0 +1,258 @@
+"""
+Extraction Windows
+==================
+Windowed memory extraction: instead of one extraction call per exchange,
+turns are buffered per user and extracted together once
+EXTRACTION_WINDOW_TURNS of them have piled up, or once the user has been
+idle for EXTRACTION_WINDOW_IDLE_SECONDS. A fact spread over several
+messages then costs one extraction call and comes out as one memory.
+
+Buffered turns live in the pending_turns table, so they survive restarts
+and any worker can flush them. Each turn is appended to ContextMemory's
+message log straight away (it is context for the extraction prompt);
+only the extraction itself is deferred. Windows are also flushed when
+the user logs out and when the server shuts down.
+
+The extraction gate (extraction_gate.py) is applied to the window as a
+whole rather than to each turn.
+
+EXTRACTION_WINDOW_TURNS=1 (the default) keeps per-turn extraction.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, func
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, short_write_transactions
+from extraction_gate import record_turn_without_extraction, should_extract
+from models.pending_turn import PendingTurn
+from services.provider_calls import ProviderUnavailable, provider_guard
+
+logger = logging.getLogger(__name__)
+
+# Turns per extraction call; 1 extracts after every turn (windowing off)
+EXTRACTION_WINDOW_TURNS = int(os.getenv("EXTRACTION_WINDOW_TURNS", "1"))
+# Flush a window once the user has sent nothing for this long
+EXTRACTION_WINDOW_IDLE_SECONDS = float(os.getenv("EXTRACTION_WINDOW_IDLE_SECONDS", "300"))
+# How often the background sweeper looks for idle windows
+EXTRACTION_WINDOW_SWEEP_SECONDS = float(os.getenv("EXTRACTION_WINDOW_SWEEP_SECONDS", "30"))
+# How long shutdown waits for the final flush
+EXTRACTION_WINDOW_SHUTDOWN_SECONDS = float(os.getenv("EXTRACTION_WINDOW_SHUTDOWN_SECONDS", "20"))
+
+# ContextMemory gives the extractor this many earlier messages as context
+RECENT_MESSAGE_CONTEXT = 10
+
+ExtractionResult = Dict[str, list]
+
+
+def windowing_enabled() -> bool:
+    return EXTRACTION_WINDOW_TURNS > 1
+
+
+# ═══════════════════════════════════════════════════════
+# EXTRACTION
+# ═══════════════════════════════════════════════════════
+
+
+def extract_turns(db: Session, conversation_id: int, turns: List[PendingTurn]) -> ExtractionResult:
+    """
+    memory.add over several turns: one extraction call for all of them, then
+    ContextMemory's usual update and bubble phases. The turns must already
+    be in the message log. Returns the same shape as memory.add.
+
+    Only the provider calls go through the memory_add circuit breaker, so a
+    window the gate drops never takes a half-open circuit's trial call.
+    """
+    from config import ensure_contextmemory
+    from contextmemory.db.models.conversation_summary import ConversationSummary
+    from contextmemory.db.models.message import Message
+    from contextmemory.memory.add.add_updation_phase import update_phase
+    from contextmemory.memory.bubble_creator import create_bubbles
+    from contextmemory.memory.extractor import extract_memories
+
+    if not should_extract("\n".join(turn.user_message for turn in turns)).extract:
+        return {"semantic": [], "bubbles": []}
+
+    ensure_contextmemory()
+    summary_row = (
+        db.query(ConversationSummary)
+        .filter(ConversationSummary.conversation_id == conversation_id)
+        .one_or_none()
+    )
+    # The messages before the window; the window itself is the latest interaction
+    recent_messages = (
+        db.query(Message)
+        .filter(Message.conversation_id == conversation_id)
+        .order_by(Message.timestamp.desc(), Message.id.desc())
+        .offset(2 * len(turns))
+        .limit(RECENT_MESSAGE_CONTEXT)
+        .all()
+    )
+    with provider_guard("memory_add"):
+        extraction = extract_memories(
+            latest_pair=[f"USER: {turn.user_message}\nASSISTANT: {turn.assistant_message}" for turn in turns],
+            summary_text=summary_row.summary_text if summary_row else "",
+            recent_messages=[f"{msg.sender.upper()}: {msg.message_text}" for msg in reversed(recent_messages)],
+        )
+
+        semantic = extraction.get("semantic", [])
+        bubbles = extraction.get("bubbles", [])
+        with short_write_transactions(db):
+            if semantic:
+                update_phase(db=db, candidate_facts=semantic, conversation_id=conversation_id)
+            if bubbles:
+                create_bubbles(db=db, bubbles=bubbles, conversation_id=conversation_id, session_id=None)
+    return {"semantic": semantic, "bubbles": [bubble.get("text", "") for bubble in bubbles]}
+
+
+def _claim(db: Session, turns: List[PendingTurn]) -> List[PendingTurn]:
+    """Delete the turns from the buffer; returns the ones this call got (another worker may race us)."""
+    ids = [turn.id for turn in turns]
+    claimed = set(db.execute(
+        delete(PendingTurn).where(PendingTurn.id.in_(ids)).returning(PendingTurn.id)
+    ).scalars())
+    db.commit()
+    return [turn for turn in turns if turn.id in claimed]
+
+
+def window_will_flush(db: Session, user_id: int) -> bool:
+    """Whether buffering one more turn for the user fills their window."""
+    pending = db.query(func.count(PendingTurn.id)).filter(PendingTurn.user_id == user_id).scalar()
+    return pending + 1 >= EXTRACTION_WINDOW_TURNS
+
+
+def flush_window(db: Session, user_id: int, force: bool = False) -> Optional[ExtractionResult]:
+    """
+    Extract the user's buffered turns if the window is full (or force is set).
+
+    Returns the extraction result, or None when there was nothing to flush.
+    If extraction fails, the turns go back into the buffer for a later flush.
+    """
+    turns = (
+        db.query(PendingTurn)
+        .filter(PendingTurn.user_id == user_id)
+        .order_by(PendingTurn.id)
+        .all()
+    )
+    if not turns or (not force and len(turns) < EXTRACTION_WINDOW_TURNS):
+        return None
+    # Detach the rows so they stay readable after the claim deletes them
+    for turn in turns:
+        db.expunge(turn)
+    turns = _claim(db, turns)
+    if not turns:
+        return None
+
+    started = time.perf_counter()
+    try:
+        result = extract_turns(db, user_id, turns)
+    except Exception:
+        db.rollback()
+        db.add_all([
+            PendingTurn(
+                user_id=turn.user_id,
+                user_message=turn.user_message,
+                assistant_message=turn.assistant_message,
+                created_at=turn.created_at,
+            )
+            for turn in turns
+        ])
+        db.commit()
+        raise
+    logger.info(
+        "Extraction window flushed",
+        extra={
+            "event": "extraction_window",
+            "user_id": user_id,
+            "turns": len(turns),
+            "semantic": len(result["semantic"]),
+            "bubbles": len(result["bubbles"]),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        },
+    )
+    return result
+
+
+def buffer_turn(db: Session, user_id: int, messages: List[dict]) -> Optional[ExtractionResult]:
+    """
+    Record a chat turn and add it to the user's window, flushing the window
+    when it is full. Returns the extraction result of a flush, else None.
+
+    The turn is kept even when the flush can't run because the memory_add
+    circuit is open; the window is extracted by a later flush.
+    """
+    user_message = next(message["content"] for message in messages if message["role"] == "user")
+    assistant_message = next(message["content"] for message in messages if message["role"] == "assistant")
+    db.add(PendingTurn(user_id=user_id, user_message=user_message, assistant_message=assistant_message))
+    record_turn_without_extraction(db, user_id, messages)
+    try:
+        return flush_window(db, user_id)
+    except ProviderUnavailable as e:
+        logger.warning(f"Extraction window flush deferred for user {user_id}: {e}")
+        return None
+
+
+# ═══════════════════════════════════════════════════════
+# BACKGROUND FLUSHES
+# ═══════════════════════════════════════════════════════
+
+
+def flush_user_window(user_id: int) -> None:
+    """Flush whatever the user has buffered (logout); errors are logged, not raised."""
+    db = SessionLocal()
+    try:
+        flush_window(db, user_id, force=True)
+    except Exception as e:
+        logger.warning(f"Extraction window flush failed for user {user_id}: {e}")
+    finally:
+        db.close()
+
+
+def flush_windows(idle_seconds: Optional[float] = None) -> int:
+    """
+    Flush the windows of users idle for at least idle_seconds (all users when
+    None). Returns the number of windows flushed.
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(PendingTurn.user_id).group_by(PendingTurn.user_id)
+        if idle_seconds is not None:
+            cutoff = datetime.now(timezone.utc) - timedelta(seconds=idle_seconds)
+            query = query.having(func.max(PendingTurn.created_at) <= cutoff)
+        user_ids = [user_id for (user_id,) in query.all()]
+    finally:
+        db.close()
+
+    for user_id in user_ids:
+        flush_user_window(user_id)
+    return len(user_ids)
+
+
+async def run_extraction_window_sweeper() -> None:
+    """Background loop that flushes the windows of idle users."""
+    if not windowing_enabled():
+        return
+    while True:
+        await asyncio.sleep(EXTRACTION_WINDOW_SWEEP_SECONDS)
+        try:
+            await asyncio.to_thread(flush_windows, EXTRACTION_WINDOW_IDLE_SECONDS)
+        except Exception as e:
+            logger.warning(f"Extraction window sweep failed: {e}")
+
+
+async def flush_windows_on_shutdown() -> None:
+    """Flush every buffered window, waiting at most EXTRACTION_WINDOW_SHUTDOWN_SECONDS."""
+    if not windowing_enabled():
+        return
+    try:
+        flushed = await asyncio.wait_for(asyncio.to_thread(flush_windows), EXTRACTION_WINDOW_SHUTDOWN_SECONDS)
+        logger.info(f"Flushed {flushed} extraction windows on shutdown")
+    except Exception as e:
+        # Whatever is left stays in pending_turns for the next start
+        logger.warning(f"Extraction window flush on shutdown failed: {e}")
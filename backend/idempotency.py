@@ -0,0 +1,210 @@
+"""
+Idempotency Keys
+================
+Idempotency-Key support for POST /api/chat, so a client retrying after a
+timeout doesn't pay for (and store) the turn twice.
+
+The first request with a key claims it in the idempotency_keys table and
+runs; its successful response is stored with the key. A duplicate that
+arrives while the first is running waits for it (woken in-process, or by
+polling the table when the first request is on another worker) and gets
+the same response. Later duplicates get the stored response straight
+away, marked with "Idempotent-Replayed: true".
+
+Failed requests release their claim, so retrying them runs them again.
+A key reused with a different request body is rejected with 422. Claims
+held by a request that died are taken over after IDEMPOTENCY_LOCK_SECONDS.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from pydantic import BaseModel
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, run_with_async_session
+from models.idempotency_key import IdempotencyKey
+from responses import FastJSONResponse
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_REPLAYED_HEADER = "Idempotent-Replayed"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# How long stored responses are replayed
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+# How long a duplicate waits for the in-flight request before giving up with 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "120"))
+# After this long an unfinished claim is presumed dead and can be taken over
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "300"))
+IDEMPOTENCY_POLL_SECONDS = float(os.getenv("IDEMPOTENCY_POLL_SECONDS", "0.25"))
+IDEMPOTENCY_PURGE_INTERVAL_SECONDS = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL_SECONDS", "3600"))
+
+# Requests in flight in this process, so duplicates wake as soon as they finish
+_in_flight: Dict[Tuple[int, str], threading.Event] = {}
+_in_flight_lock = threading.Lock()
+
+StoredResponse = Tuple[int, dict]
+
+
+def request_fingerprint(request: BaseModel) -> str:
+    """Hash of a request body, to tell a retry from a different request with the same key."""
+    return hashlib.sha256(request.model_dump_json().encode()).hexdigest()
+
+
+# ═══════════════════════════════════════════════════════
+# CLAIMS
+# ═══════════════════════════════════════════════════════
+
+
+def _try_claim(db: Session, user_id: int, key: str, request_hash: str) -> Tuple[bool, Optional[IdempotencyKey]]:
+    """
+    Claim the key, or return the existing row.
+
+    Returns (True, None) when claimed, (False, row) when another request
+    holds it or has finished it.
+    """
+    now = datetime.now(timezone.utc)
+    # Expired responses and abandoned claims no longer count
+    db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key,
+        (IdempotencyKey.expires_at <= now)
+        | (IdempotencyKey.status_code.is_(None) & (IdempotencyKey.locked_until <= now)),
+    ).delete(synchronize_session=False)
+
+    db.add(IdempotencyKey(
+        user_id=user_id,
+        key=key,
+        request_hash=request_hash,
+        locked_until=now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS),
+        expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL_SECONDS),
+    ))
+    try:
+        db.commit()
+        return True, None
+    except IntegrityError:
+        db.rollback()
+
+    row = db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key,
+    ).first()
+    return False, row
+
+
+def _claim_or_wait(user_id: int, key: str, request_hash: str) -> Optional[StoredResponse]:
+    """Claim the key (returns None) or wait for and return the stored response."""
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        db = SessionLocal()
+        try:
+            claimed, row = _try_claim(db, user_id, key, request_hash)
+            if claimed:
+                with _in_flight_lock:
+                    _in_flight[(user_id, key)] = threading.Event()
+                return None
+            if row is not None and row.request_hash != request_hash:
+                raise HTTPException(
+                    status_code=422,
+                    detail=f"{IDEMPOTENCY_KEY_HEADER} was already used for a different request",
+                )
+            if row is not None and row.status_code is not None:
+                return row.status_code, row.response_body
+        finally:
+            db.close()
+
+        # Still running (or released and about to be reclaimed): wait and look again
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"A request with this {IDEMPOTENCY_KEY_HEADER} is still in progress",
+            )
+        with _in_flight_lock:
+            event = _in_flight.get((user_id, key))
+        timeout = min(IDEMPOTENCY_POLL_SECONDS, remaining)
+        if event is not None:
+            event.wait(timeout)
+        else:
+            time.sleep(timeout)
+
+
+def _finish(user_id: int, key: str, response: Optional[StoredResponse]) -> None:
+    """Store the response for the key, or release the claim when there is none."""
+    db = SessionLocal()
+    try:
+        query = db.query(IdempotencyKey).filter(
+            IdempotencyKey.user_id == user_id,
+            IdempotencyKey.key == key,
+            IdempotencyKey.status_code.is_(None),
+        )
+        if response is None:
+            query.delete(synchronize_session=False)
+        else:
+            query.update({"status_code": response[0], "response_body": response[1]}, synchronize_session=False)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"Failed to finish idempotency key: {e}")
+    finally:
+        db.close()
+        with _in_flight_lock:
+            event = _in_flight.pop((user_id, key), None)
+        if event is not None:
+            event.set()
+
+
+def run_idempotent(user_id: int, key: str, request_hash: str, handler: Callable[[], BaseModel]):
+    """
+    Run handler() at most once per (user, key) and return its result.
+
+    Duplicates get the stored response (a FastJSONResponse) instead. Only
+    successful results are stored; if handler raises, the claim is released.
+    """
+    stored = _claim_or_wait(user_id, key, request_hash)
+    if stored is not None:
+        status_code, body = stored
+        return FastJSONResponse(body, status_code=status_code, headers={IDEMPOTENCY_REPLAYED_HEADER: "true"})
+
+    result = None
+    try:
+        result = handler()
+        return result
+    finally:
+        _finish(user_id, key, (200, result.model_dump(mode="json")) if result is not None else None)
+
+
+# ═══════════════════════════════════════════════════════
+# EXPIRY
+# ═══════════════════════════════════════════════════════
+
+
+def purge_expired_idempotency_keys(db: Session) -> int:
+    """Delete expired keys and their stored responses. Returns the number deleted."""
+    deleted = db.query(IdempotencyKey).filter(
+        IdempotencyKey.expires_at <= datetime.now(timezone.utc),
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+
+async def run_idempotency_key_purger() -> None:
+    """Background loop that purges expired idempotency keys periodically."""
+    if IDEMPOTENCY_PURGE_INTERVAL_SECONDS <= 0:
+        return
+    while True:
+        try:
+            await run_with_async_session(purge_expired_idempotency_keys)
+        except Exception as e:
+            logger.warning(f"Idempotency key purge failed: {e}")
+        await asyncio.sleep(IDEMPOTENCY_PURGE_INTERVAL_SECONDS)
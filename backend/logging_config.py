@@ -0,0 +1,162 @@
+"""
+Logging
+=======
+Structured logging for the backend. Records are handed to a queue in the
+calling thread and formatted and written to stdout by a listener thread,
+so a slow or blocked stdout never stalls the event loop or a request.
+
+Every record carries the current request ID (taken from X-Request-ID or
+generated per request). When LOG_REQUESTS is on, one "request" line per
+request replaces uvicorn's access log, with the total duration, time spent
+in the database and, for chat, the time per stage.
+
+LOG_FORMAT=json (default) writes one JSON object per line; LOG_FORMAT=text
+is friendlier for local development.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_REQUESTS = os.getenv("LOG_REQUESTS", "true").lower() in ("true", "1", "yes")
+REQUEST_ID_HEADER = "X-Request-ID"
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+# Per-request timing totals in milliseconds, filled in by the DB and chat hooks
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+# LogRecord attributes that aren't user-supplied `extra` fields
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {
+    "message", "asctime", "request_id",
+    "color_message",  # uvicorn's ANSI-colored duplicate of the message
+}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+# ═══════════════════════════════════════════════════════
+# REQUEST CONTEXT
+# ═══════════════════════════════════════════════════════
+
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    """Use the caller's request ID when it looks sane, otherwise make one."""
+    if incoming and len(incoming) <= 128 and incoming.isprintable():
+        return incoming
+    return uuid.uuid4().hex
+
+
+def add_request_timing(name: str, seconds: float, count_name: Optional[str] = None) -> None:
+    """Add seconds to the current request's `<name>_ms` total (no-op outside requests)."""
+    timings = request_timings.get()
+    if timings is None:
+        return
+    key = f"{name}_ms"
+    timings[key] = timings.get(key, 0.0) + seconds * 1000
+    if count_name:
+        timings[count_name] = timings.get(count_name, 0) + 1
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the request ID while still in the request's context."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "request_id"):
+            record.request_id = request_id.get()
+        return True
+
+
+# ═══════════════════════════════════════════════════════
+# FORMATTING
+# ═══════════════════════════════════════════════════════
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: ts, level, logger, message, request_id and extra fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        extra = {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS and not k.startswith("_")}
+        return f"{line} {json.dumps(extra, default=str)}" if extra else line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Queue records with message and traceback rendered, but fields kept structured."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+# ═══════════════════════════════════════════════════════
+# SETUP
+# ═══════════════════════════════════════════════════════
+
+
+def setup_logging() -> None:
+    """Route the root logger (and uvicorn's) through the queue; safe to call twice."""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+    _listener = logging.handlers.QueueListener(queue.SimpleQueue(), output)
+
+    handler = _QueueHandler(_listener.queue)
+    handler.addFilter(RequestContextFilter())
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    # uvicorn installs its own stream handlers; send its records through ours
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = []
+        uvicorn_logger.propagate = True
+    # The per-request line supersedes the access log
+    logging.getLogger("uvicorn.access").disabled = LOG_REQUESTS
+    # httpx (under the OpenAI SDK; httpx2 in newer releases) logs every provider call at INFO
+    for name in ("httpx", "httpx2"):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+    _listener.start()
+    atexit.register(_listener.stop)
@@ -9,12 +9,19 @@ import os
 
 # CRITICAL: Fix for Read-only file system on Vercel
 # Force libraries to use /tmp for caching/config
-os.environ['HOME'] = '/tmp'
+# (BACKEND_HOME overrides it, e.g. to give benchmarks their own FAISS indexes)
+os.environ['HOME'] = os.getenv('BACKEND_HOME', '/tmp')
 os.environ['HF_HOME'] = '/tmp/hf_home'
 os.environ['TIKTOKEN_CACHE_DIR'] = '/tmp/tiktoken'
 os.environ['XDG_CACHE_HOME'] = '/tmp/cache'
 os.environ['NLTK_DATA'] = '/tmp/nltk_data'
 
+# Structured, queue-backed logging before anything else logs
+import logging
+from logging_config import setup_logging
+setup_logging()
+logger = logging.getLogger(__name__)
+
 # Ensure these directories exist
 try:
     os.makedirs('/tmp/hf_home', exist_ok=True)
@@ -22,36 +29,86 @@ try:
     os.makedirs('/tmp/cache', exist_ok=True)
     os.makedirs('/tmp/nltk_data', exist_ok=True)
 except Exception as e:
-    print(f"Warning: Failed to create temp dirs: {e}")
+    logger.warning(f"Failed to create temp dirs: {e}")
+
+import asyncio
+import secrets
+import time
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import PlainTextResponse
+
+# Create or migrate tables only when the schema marker is behind
+# (ContextMemory itself is configured lazily on first chat request)
+from config import ensure_schema, OPENROUTER_API_KEY
+ensure_schema()
 
-# Initialize auth tables first
-from config import init_auth_tables, init_contextmemory, OPENROUTER_API_KEY
-init_auth_tables()
+if not OPENROUTER_API_KEY:
+    logger.warning("OPENROUTER_API_KEY not set - ContextMemory features will require user API keys")
 
-# Initialize ContextMemory with API key for embeddings
-if OPENROUTER_API_KEY:
-    init_contextmemory(OPENROUTER_API_KEY)
-else:
-    print("Warning: OPENROUTER_API_KEY not set - ContextMemory features will require user API keys")
+# Decode the API-key encryption material once instead of per encrypt/decrypt
+from auth.encryption import get_encryption_key
+try:
+    get_encryption_key()
+except ValueError as e:
+    logger.warning(f"{e} - storing API keys will fail")
 
 # Import route modules
 from routes.chat import router as chat_router
 from routes.memories import router as memories_router
 from routes.auth import router as auth_router
 from routes.api_keys import router as api_keys_router
+from routes.bootstrap import router as bootstrap_router
+from auth.password_pool import shutdown_password_pool
+from auth.refresh_tokens import run_refresh_token_purger
+from idempotency import run_idempotency_key_purger
+from extraction_window import flush_windows_on_shutdown, run_extraction_window_sweeper
+from database import dispose_engine, get_pool_stats
+from profiling import install_profiling
+from logging_config import (
+    LOG_REQUESTS,
+    REQUEST_ID_HEADER,
+    new_request_id,
+    request_id,
+    request_timings,
+)
+from metrics import (
+    METRICS_ENABLED,
+    METRICS_TOKEN,
+    HTTP_REQUEST_DURATION,
+    render_metrics,
+    request_started_at,
+)
 
 
 # ═══════════════════════════════════════════════════════
 # FASTAPI APP
 # ═══════════════════════════════════════════════════════
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    purgers = [
+        asyncio.create_task(run_refresh_token_purger()),
+        asyncio.create_task(run_idempotency_key_purger()),
+        asyncio.create_task(run_extraction_window_sweeper()),
+    ]
+    yield
+    # Stop background workers on shutdown
+    for purger in purgers:
+        purger.cancel()
+    await flush_windows_on_shutdown()
+    shutdown_password_pool()
+    await dispose_engine()
+
+
 app = FastAPI(
     title="ContextMemory API",
     description="API for ContextMemory chatbot with bubble visualization",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS for Next.js frontend
@@ -76,19 +133,74 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses (memory graphs, chat history) for clients that
+# accept gzip; level 6 trades a little size for much less CPU than 9
+GZIP_ENABLED = os.getenv("GZIP_ENABLED", "true").lower() in ("true", "1", "yes")
+GZIP_MIN_SIZE = int(os.getenv("GZIP_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+if GZIP_ENABLED:
+    app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=GZIP_LEVEL)
+
 @app.middleware("http")
 async def catch_exceptions_middleware(request: Request, call_next):
     try:
         return await call_next(request)
-    except Exception as exc:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"GLOBAL SERVER ERROR: {error_details}")
+    except Exception:
+        # The traceback goes to the log only; the request id ties the two together
+        logger.exception("Unhandled server error")
         from fastapi.responses import JSONResponse
         return JSONResponse(
             status_code=500,
-            content={"detail": f"Internal Server Error: {str(exc)}", "trace": error_details}
+            content={"detail": "Internal Server Error", "request_id": request_id.get()}
+        )
+
+
+# Only installed when PROFILE_SAMPLE_RATE or PROFILE_TOKEN is set
+install_profiling(app)
+
+
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    started = time.perf_counter()
+    request_started_at.set(started)
+    response = await call_next(request)
+    # Label by route template so IDs in paths don't explode the series count
+    route = request.scope.get("route")
+    HTTP_REQUEST_DURATION.observe(
+        time.perf_counter() - started,
+        method=request.method,
+        route=getattr(route, "path", "unmatched"),
+        status=str(response.status_code),
+    )
+    return response
+
+
+@app.middleware("http")
+async def request_context_middleware(request: Request, call_next):
+    # Outermost: the request ID and timings cover every other middleware
+    started = time.perf_counter()
+    request_id.set(new_request_id(request.headers.get(REQUEST_ID_HEADER)))
+    timings = {}
+    request_timings.set(timings)
+    response = await call_next(request)
+    response.headers[REQUEST_ID_HEADER] = request_id.get()
+    if LOG_REQUESTS:
+        client = request.client
+        logger.info(
+            f'{request.method} {request.url.path} {response.status_code}',
+            extra={
+                "event": "request",
+                "method": request.method,
+                "path": request.url.path,
+                "query": request.url.query or None,
+                "route": getattr(request.scope.get("route"), "path", None),
+                "status": response.status_code,
+                "client": f"{client.host}:{client.port}" if client else None,
+                "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                **{key: round(value, 2) for key, value in timings.items()},
+            },
         )
+    return response
 
 
 # ═══════════════════════════════════════════════════════
@@ -101,11 +213,30 @@ async def root():
     return {"message": "ContextMemory API", "status": "running"}
 
 
+@app.get("/api/health")
+async def health():
+    """Health check with database connection pool stats."""
+    return {"status": "running", "db_pool": get_pool_stats()}
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus metrics in the text exposition format."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if METRICS_TOKEN and not secrets.compare_digest(
+        request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"
+    ):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 # Register route modules
 app.include_router(auth_router)
 app.include_router(api_keys_router)
 app.include_router(chat_router)
 app.include_router(memories_router)
+app.include_router(bootstrap_router)
 
 
 # ═══════════════════════════════════════════════════════
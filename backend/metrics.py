@@ -0,0 +1,220 @@
+"""
+Metrics
+=======
+Minimal Prometheus-compatible counters and histograms, rendered in the text
+exposition format by GET /metrics.
+
+Kept in-process and dependency-free so instrumenting the hot paths costs a
+lock and a few additions. With several worker processes each one reports
+its own series; scrape them individually or run a single worker.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from logging_config import add_request_timing
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("true", "1", "yes")
+# When set, GET /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+# Latency buckets in seconds, from cache hits up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_registry: List["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _format_labels(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing count, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{self._format_labels(key)} {value}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (usually durations in seconds)."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [per-bucket counts..., +Inf count], sum
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], float]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        if not METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        """Observe the duration of the with-block, including when it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                lines.append(f"{self.name}_bucket{self._format_labels(key, ('le', le))} {cumulative}")
+            labels = self._format_labels(key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ═══════════════════════════════════════════════════════
+# APPLICATION METRICS
+# ═══════════════════════════════════════════════════════
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ("method", "route", "status"),
+)
+
+CHAT_STAGE_DURATION = Histogram(
+    "chat_stage_duration_seconds",
+    "Latency of each stage of POST /api/chat.",
+    ("stage",),
+)
+
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Database statement latency by statement type.",
+    ("operation",),
+)
+
+PROVIDER_CALL_DURATION = Histogram(
+    "provider_call_duration_seconds",
+    "Latency of calls to the LLM provider, retries and hedges included.",
+    ("provider", "operation", "outcome"),
+)
+
+PROVIDER_CALL_EVENTS = Counter(
+    "provider_call_events_total",
+    "Retries, hedges and circuit breaker activity for LLM provider calls.",
+    ("provider", "operation", "event"),
+)
+
+EMBEDDING_BATCH_SIZE = Histogram(
+    "embedding_batch_size",
+    "Embedding requests coalesced into each batched provider call.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens reported by the LLM provider.",
+    ("model", "kind"),
+)
+
+EXTRACTION_GATE_DECISIONS = Counter(
+    "extraction_gate_decisions_total",
+    "Chat turns sent to or kept from memory extraction by the local gate.",
+    ("decision", "reason"),
+)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "In-process cache lookups by outcome.",
+    ("cache", "result"),
+)
+
+# Set by the request middleware so handlers can attribute time spent in
+# dependencies (auth, API key lookup) before they start running
+request_started_at: ContextVar[Optional[float]] = ContextVar("request_started_at", default=None)
+
+
+def observe_chat_stage(stage: str, started_at: float) -> float:
+    """Record a chat stage that began at started_at; returns the current time."""
+    now = time.perf_counter()
+    CHAT_STAGE_DURATION.observe(now - started_at, stage=stage)
+    add_request_timing(f"chat_{stage}", now - started_at)
+    return now
+
+
+def statement_operation(statement: str) -> str:
+    """The SQL verb of a statement (select, insert, ...), for metric labels."""
+    verb = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else ""
+    return verb if verb in ("select", "insert", "update", "delete", "create", "pragma") else "other"
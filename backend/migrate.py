@@ -0,0 +1,17 @@
+"""
+Schema Migration
+================
+Explicit schema step for deployments that run with SCHEMA_INIT=skip.
+Creates auth and ContextMemory tables, adds missing indexes and records
+the schema version.
+
+Usage:
+    python migrate.py
+"""
+
+from config import run_migrations, SCHEMA_VERSION
+
+
+if __name__ == "__main__":
+    run_migrations()
+    print(f"Schema is at version {SCHEMA_VERSION}")
@@ -8,5 +8,8 @@ from models.user import User, Base
 from models.api_key import UserApiKey
 from models.refresh_token import RefreshToken
 from models.chat_message import ChatMessage
+from models.idempotency_key import IdempotencyKey
+from models.pending_turn import PendingTurn
+from models.schema_marker import SchemaMarker
 
-__all__ = ["User", "UserApiKey", "RefreshToken", "ChatMessage", "Base"]
+__all__ = ["User", "UserApiKey", "RefreshToken", "ChatMessage", "IdempotencyKey", "PendingTurn", "SchemaMarker", "Base"]
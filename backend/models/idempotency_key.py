@@ -0,0 +1,31 @@
+"""
+Idempotency Key Model
+=====================
+SQLAlchemy model for Idempotency-Key claims and the responses stored for
+them (see idempotency.py).
+"""
+
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, UniqueConstraint
+
+from models.user import Base
+
+
+class IdempotencyKey(Base):
+    """A client-supplied idempotency key, in progress or with its stored response."""
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("user_id", "key", name="uq_idempotency_keys_user_key"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    key = Column(String(255), nullable=False)
+    # SHA-256 of the request body; reusing a key for a different request is an error
+    request_hash = Column(String(64), nullable=False)
+    # NULL while the first request is still running
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(JSON, nullable=True)
+    # A claim whose request died (crashed worker) can be taken over after this
+    locked_until = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # Used by the expiry purge
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,23 @@
+"""
+Pending Turn Model
+==================
+SQLAlchemy model for chat turns buffered for windowed memory extraction
+(see extraction_window.py).
+"""
+
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey
+
+from models.user import Base
+
+
+class PendingTurn(Base):
+    """A chat exchange whose memory extraction is deferred to the user's next window."""
+
+    __tablename__ = "pending_turns"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    user_message = Column(Text, nullable=False)
+    assistant_message = Column(Text, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc), index=True)
@@ -0,0 +1,21 @@
+"""
+Schema Marker Model
+===================
+Single-row table recording which schema version has been applied, so
+startup can skip DDL round trips when the database is already current.
+"""
+
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, DateTime
+
+from models.user import Base
+
+
+class SchemaMarker(Base):
+    """Applied schema version."""
+
+    __tablename__ = "schema_marker"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False)
+    applied_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
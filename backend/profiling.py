@@ -0,0 +1,151 @@
+"""
+Request Profiling
+=================
+Opt-in statistical profiler for individual requests, built on pyinstrument
+(`pip install pyinstrument`, not installed by default).
+
+A request is profiled when it is picked by PROFILE_SAMPLE_RATE or carries
+`X-Profile: <PROFILE_TOKEN>`. Profiles are written to PROFILE_OUTPUT_DIR as
+speedscope JSON (open at https://www.speedscope.app) or pyinstrument HTML;
+a request that also sends `X-Profile-Return: true` gets the profile back
+instead of its normal response.
+
+When neither a sample rate nor a token is configured the middleware is not
+installed at all, so there is no per-request cost.
+
+pyinstrument samples a single thread. Async routes are profiled on the
+event loop thread. Sync routes (chat among them) run in FastAPI's
+threadpool, where the event loop only sees them as an await; decorating
+one with @profile_in_worker profiles its endpoint on the worker thread
+instead, and that profile is the one saved. Sync dependencies run in
+separate threadpool calls and are not covered.
+"""
+
+import contextvars
+import functools
+import logging
+import os
+import random
+import re
+import secrets
+import time
+from typing import Callable, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+logger = logging.getLogger(__name__)
+
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_OUTPUT_DIR = os.getenv("PROFILE_OUTPUT_DIR", "/tmp/profiles")
+# speedscope | html
+PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "speedscope")
+
+PROFILE_HEADER = "x-profile"
+PROFILE_RETURN_HEADER = "x-profile-return"
+
+# Set while a request is profiled; sync endpoints append their worker thread's session
+_worker_sessions: contextvars.ContextVar[Optional[List]] = contextvars.ContextVar("worker_sessions", default=None)
+
+
+def profiling_enabled() -> bool:
+    return PROFILE_SAMPLE_RATE > 0 or bool(PROFILE_TOKEN)
+
+
+def _requested_by_header(request: Request) -> bool:
+    token = request.headers.get(PROFILE_HEADER)
+    return bool(PROFILE_TOKEN and token and secrets.compare_digest(token, PROFILE_TOKEN))
+
+
+def _render(session) -> tuple:
+    """Render a finished profile; returns (body, media type, file extension)."""
+    if PROFILE_FORMAT == "html":
+        from pyinstrument.renderers import HTMLRenderer
+        return HTMLRenderer().render(session), "text/html", "html"
+
+    from pyinstrument.renderers import SpeedscopeRenderer
+    return SpeedscopeRenderer().render(session), "application/json", "speedscope.json"
+
+
+def _save(request: Request, body: str, extension: str, duration_ms: float) -> str:
+    os.makedirs(PROFILE_OUTPUT_DIR, exist_ok=True)
+    path_slug = re.sub(r"[^A-Za-z0-9]+", "_", request.url.path).strip("_") or "root"
+    filename = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{path_slug}-{duration_ms:.0f}ms.{extension}"
+    with open(os.path.join(PROFILE_OUTPUT_DIR, filename), "w") as f:
+        f.write(body)
+    return filename
+
+
+async def profiling_middleware(request: Request, call_next):
+    by_header = _requested_by_header(request)
+    if not by_header and random.random() >= PROFILE_SAMPLE_RATE:
+        return await call_next(request)
+
+    from pyinstrument import Profiler
+
+    profiler = Profiler(interval=PROFILE_INTERVAL_MS / 1000, async_mode="enabled")
+    worker_sessions = []
+    token = _worker_sessions.set(worker_sessions)
+    started = time.perf_counter()
+    profiler.start()
+    try:
+        response = await call_next(request)
+    finally:
+        profiler.stop()
+        _worker_sessions.reset(token)
+    duration_ms = (time.perf_counter() - started) * 1000
+
+    try:
+        body, media_type, extension = _render(worker_sessions[0] if worker_sessions else profiler.last_session)
+        filename = _save(request, body, extension, duration_ms)
+    except Exception as e:
+        logger.warning(f"failed to write request profile: {e}")
+        return response
+
+    if not by_header:
+        return response
+    if request.headers.get(PROFILE_RETURN_HEADER, "").lower() in ("true", "1", "yes"):
+        return Response(content=body, media_type=media_type, headers={"X-Profile-File": filename})
+
+    response.headers["X-Profile-File"] = filename
+    return response
+
+
+def profile_in_worker(call: Callable) -> Callable:
+    """
+    Decorator for sync routes (below the route decorator): a profiled
+    request samples the worker thread the endpoint runs on. Costs one
+    context variable lookup when the request isn't profiled.
+    """
+
+    @functools.wraps(call)
+    def endpoint(*args, **kwargs):
+        sessions = _worker_sessions.get()
+        if sessions is None:
+            return call(*args, **kwargs)
+
+        from pyinstrument import Profiler
+
+        profiler = Profiler(interval=PROFILE_INTERVAL_MS / 1000, async_mode="disabled")
+        profiler.start()
+        try:
+            return call(*args, **kwargs)
+        finally:
+            profiler.stop()
+            sessions.append(profiler.last_session)
+
+    return endpoint
+
+
+def install_profiling(app: FastAPI) -> None:
+    """Add the profiling middleware if profiling is configured and available."""
+    if not profiling_enabled():
+        return
+    try:
+        import pyinstrument  # noqa: F401
+    except ImportError:
+        logger.warning("PROFILE_SAMPLE_RATE/PROFILE_TOKEN set but pyinstrument is not installed - profiling disabled")
+        return
+    app.middleware("http")(profiling_middleware)
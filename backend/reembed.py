@@ -0,0 +1,89 @@
+"""
+Re-embedding Migration
+======================
+Recomputes every memory's embedding with the configured EMBEDDING_PROVIDER
+and rebuilds the FAISS indexes. Run it after switching providers or
+embedding models: vectors from different models can't be compared, so
+search is meaningless until every memory is re-embedded.
+
+Embeds in batches through ContextMemory's embedding client (one provider
+call per batch for remote models), committing after each batch. Resume an
+interrupted run with --start-id. Restart the backend afterwards so workers
+drop the indexes they have cached.
+
+Usage:
+    python reembed.py [--batch-size 128] [--conversation-id N] [--start-id N] [--dry-run]
+"""
+
+import argparse
+import time
+
+from sqlalchemy import select, update
+
+from config import EMBEDDING_MODEL, EMBEDDING_PROVIDER, ensure_contextmemory
+from database import SessionLocal
+
+
+def reembed(batch_size: int = 128, conversation_id: int = None, start_id: int = 0, dry_run: bool = False) -> int:
+    """Re-embed memories (optionally one conversation's) in id order; returns how many."""
+    ensure_contextmemory()
+    from contextmemory.core.openai_client import get_embedding_client
+    from contextmemory.db.models.memory import Memory as MemoryModel
+    from contextmemory.memory.vector_store import rebuild_index_from_db
+    from services.vector_index import compact_embedding
+
+    client = get_embedding_client()
+    # Same model name ContextMemory's embed_text sends
+    model = EMBEDDING_MODEL if EMBEDDING_MODEL.startswith("openai/") else f"openai/{EMBEDDING_MODEL}"
+    db = SessionLocal()
+    done = 0
+    started = time.perf_counter()
+    try:
+        last_id = start_id - 1
+        while True:
+            query = select(MemoryModel.id, MemoryModel.conversation_id, MemoryModel.memory_text).where(
+                MemoryModel.id > last_id
+            )
+            if conversation_id is not None:
+                query = query.where(MemoryModel.conversation_id == conversation_id)
+            rows = db.execute(query.order_by(MemoryModel.id).limit(batch_size)).all()
+            if not rows:
+                break
+
+            if not dry_run:
+                response = client.embeddings.create(model=model, input=[row.memory_text for row in rows])
+                vectors = {item.index: item.embedding for item in response.data}
+                # Bulk UPDATE by primary key: one executemany per batch (bypasses
+                # ORM events, so rows are compacted here)
+                db.execute(update(MemoryModel), [
+                    {"id": row.id, "embedding": compact_embedding(vectors[i])} for i, row in enumerate(rows)
+                ])
+                db.commit()
+
+            done += len(rows)
+            last_id = rows[-1].id
+            print(f"  {done} memories re-embedded (through id {last_id}, {time.perf_counter() - started:.1f}s)")
+
+        if not dry_run:
+            # Indexes hold the old vectors; rebuild them from the new ones
+            query = select(MemoryModel.conversation_id).distinct()
+            if conversation_id is not None:
+                query = query.where(MemoryModel.conversation_id == conversation_id)
+            for (conversation,) in db.execute(query).all():
+                rebuild_index_from_db(db, conversation)
+    finally:
+        db.close()
+    return done
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-embed memories with the configured embedding provider")
+    parser.add_argument("--batch-size", type=int, default=128, help="texts per embedding call")
+    parser.add_argument("--conversation-id", type=int, help="only this conversation (user)")
+    parser.add_argument("--start-id", type=int, default=0, help="resume from this memory id")
+    parser.add_argument("--dry-run", action="store_true", help="count memories without changing them")
+    args = parser.parse_args()
+
+    print(f"Re-embedding with provider={EMBEDDING_PROVIDER} model={EMBEDDING_MODEL}")
+    count = reembed(args.batch_size, args.conversation_id, args.start_id, args.dry_run)
+    print(f"{'Would re-embed' if args.dry_run else 'Re-embedded'} {count} memories")
@@ -0,0 +1,140 @@
+"""
+Vector Index Migration
+======================
+Brings stored embeddings and vector indexes in line with the
+EMBEDDING_STORAGE_PRECISION and EMBEDDING_INDEX_* settings (see
+services/vector_index.py). Run it after changing them:
+
+  1. rewrites memories.embedding at EMBEDDING_STORAGE_PRECISION, in id
+     order and committing per batch (skipped for float32: precision that
+     has been dropped can't be restored; resume with --start-id)
+  2. rebuilds every conversation's index in the configured format, and
+     with --remove-stale deletes index files written for other formats
+
+Indexes above VECTOR_INDEX_ANN_THRESHOLD are built before moving on, so
+workers load them ready to use. Restart the backend afterwards so workers
+drop the indexes they have cached.
+
+Usage:
+    python reindex.py [--batch-size 500] [--conversation-id N] [--start-id N]
+        [--remove-stale] [--dry-run]
+"""
+
+import argparse
+import glob
+import os
+import time
+
+from sqlalchemy import select, update
+
+from config import ensure_contextmemory
+from database import SessionLocal
+
+
+def compact_rows(db, batch_size: int, conversation_id: int = None, start_id: int = 0) -> int:
+    """Rewrite stored embeddings at EMBEDDING_STORAGE_PRECISION; returns how many."""
+    from contextmemory.db.models.memory import Memory as MemoryModel
+    from services.vector_index import compact_embedding
+
+    done = 0
+    started = time.perf_counter()
+    last_id = start_id - 1
+    while True:
+        query = select(MemoryModel.id, MemoryModel.embedding).where(
+            MemoryModel.id > last_id, MemoryModel.embedding.isnot(None)
+        )
+        if conversation_id is not None:
+            query = query.where(MemoryModel.conversation_id == conversation_id)
+        rows = db.execute(query.order_by(MemoryModel.id).limit(batch_size)).all()
+        if not rows:
+            return done
+        db.execute(update(MemoryModel), [
+            {"id": row.id, "embedding": compact_embedding(row.embedding)} for row in rows
+        ])
+        db.commit()
+        done += len(rows)
+        last_id = rows[-1].id
+        print(f"  {done} embeddings rewritten (through id {last_id}, {time.perf_counter() - started:.1f}s)")
+
+
+def remove_stale_indexes(conversation_id: int) -> int:
+    """Delete a conversation's index files that the configured store doesn't use; returns how many."""
+    from contextmemory.memory.vector_store import FAISSVectorStore, get_index_path
+
+    path = get_index_path(conversation_id)
+    store = FAISSVectorStore()
+    # Files the configured store reads: CompactVectorStore names them by format
+    current = set(store.index_files(path).values()) if hasattr(store, "index_files") else {
+        f"{path}.faiss", f"{path}.map.json"
+    }
+    removed = 0
+    for stale in glob.glob(f"{glob.escape(path)}.*"):
+        if stale not in current:
+            os.remove(stale)
+            removed += 1
+    return removed
+
+
+def reindex(
+    batch_size: int = 500,
+    conversation_id: int = None,
+    start_id: int = 0,
+    remove_stale: bool = False,
+    dry_run: bool = False,
+) -> int:
+    """Compact stored embeddings and rebuild indexes; returns the number of indexes rebuilt."""
+    ensure_contextmemory()
+    from contextmemory.db.models.memory import Memory as MemoryModel
+    from contextmemory.memory.vector_store import rebuild_index_from_db
+    from services.vector_index import EMBEDDING_STORAGE_PRECISION
+
+    db = SessionLocal()
+    try:
+        query = select(MemoryModel.conversation_id).distinct()
+        if conversation_id is not None:
+            query = query.where(MemoryModel.conversation_id == conversation_id)
+        conversations = [conversation for (conversation,) in db.execute(query).all()]
+        if dry_run:
+            return len(conversations)
+
+        if EMBEDDING_STORAGE_PRECISION != "float32":
+            compact_rows(db, batch_size, conversation_id, start_id)
+
+        started = time.perf_counter()
+        for i, conversation in enumerate(conversations, 1):
+            store = rebuild_index_from_db(db, conversation)
+            if hasattr(store, "wait_for_rebuild"):
+                # Large users get their approximate index now rather than on first load
+                store.wait_for_rebuild()
+            removed = remove_stale_indexes(conversation) if remove_stale else 0
+            print(
+                f"  [{i}/{len(conversations)}] conversation {conversation}: {store.count} vectors"
+                + (f", {removed} stale files removed" if removed else "")
+                + f" ({time.perf_counter() - started:.1f}s)"
+            )
+    finally:
+        db.close()
+    return len(conversations)
+
+
+if __name__ == "__main__":
+    from services.vector_index import (
+        EMBEDDING_INDEX_DIMENSIONS,
+        EMBEDDING_INDEX_PRECISION,
+        EMBEDDING_STORAGE_PRECISION,
+    )
+
+    parser = argparse.ArgumentParser(description="Rewrite stored embeddings and rebuild vector indexes")
+    parser.add_argument("--batch-size", type=int, default=500, help="rows per UPDATE batch")
+    parser.add_argument("--conversation-id", type=int, help="only this conversation (user)")
+    parser.add_argument("--start-id", type=int, default=0, help="resume the row rewrite from this memory id")
+    parser.add_argument("--remove-stale", action="store_true", help="delete index files for other formats")
+    parser.add_argument("--dry-run", action="store_true", help="count conversations without changing anything")
+    args = parser.parse_args()
+
+    print(
+        f"Reindexing: index {EMBEDDING_INDEX_PRECISION} x {EMBEDDING_INDEX_DIMENSIONS or 'all'} dims, "
+        f"stored embeddings {EMBEDDING_STORAGE_PRECISION}"
+    )
+    count = reindex(args.batch_size, args.conversation_id, args.start_id, args.remove_stale, args.dry_run)
+    print(f"{'Would rebuild' if args.dry_run else 'Rebuilt'} {count} indexes")
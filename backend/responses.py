@@ -0,0 +1,31 @@
+"""
+Responses
+=========
+Fast JSON response for the large read endpoints (memory graph, memory
+detail, chat history, bootstrap).
+
+Handlers build plain dicts with timestamps already rendered as ISO strings
+and return FastJSONResponse directly. FastAPI then skips response_model
+validation and its stdlib encoder, so each payload is serialized exactly
+once. The response_model is still declared for the OpenAPI schema.
+
+Uses orjson when installed, otherwise compact stdlib JSON.
+"""
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            # id_mapping is keyed by int; JSON object keys become strings either way
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -9,11 +9,15 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
+from config import OPENROUTER_BASE_URL
 from database import get_db
 from models.user import User
 from models.api_key import UserApiKey
 from auth.dependencies import get_current_user
 from auth.encryption import encrypt_api_key, decrypt_api_key
+from auth.user_cache import invalidate_user
+from auth.api_key_cache import invalidate_api_key
+from profiling import profile_in_worker
 
 router = APIRouter(prefix="/api/api-keys", tags=["api-keys"])
 
@@ -60,7 +64,7 @@ async def validate_api_key(request: ApiKeyRequest, user: User = Depends(get_curr
     try:
         async with httpx.AsyncClient() as client:
             response = await client.get(
-                "https://openrouter.ai/api/v1/models",
+                f"{OPENROUTER_BASE_URL}/models",
                 headers={"Authorization": f"Bearer {api_key}"},
                 timeout=10.0,
             )
@@ -79,6 +83,7 @@ async def validate_api_key(request: ApiKeyRequest, user: User = Depends(get_curr
 
 
 @router.post("", response_model=MessageResponse)
+@profile_in_worker
 def store_api_key(
     request: ApiKeyRequest,
     db: Session = Depends(get_db),
@@ -113,17 +118,25 @@ def store_api_key(
         db.add(key_record)
 
     db.commit()
+    invalidate_user(user.id)
+    invalidate_api_key(user.id)
 
     return {"message": "API key stored successfully"}
 
 
 @router.get("/status", response_model=ApiKeyStatusResponse)
+@profile_in_worker
 def get_api_key_status(
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
     """Check if user has a valid API key stored."""
-    key_record = db.query(UserApiKey).filter(UserApiKey.user_id == user.id).first()
+    return load_api_key_status(db, user.id)
+
+
+def load_api_key_status(db: Session, user_id: int) -> dict:
+    """Look up whether a user has a stored key and whether it is valid."""
+    key_record = db.query(UserApiKey).filter(UserApiKey.user_id == user_id).first()
 
     if not key_record:
         return {"has_key": False, "is_valid": False}
@@ -132,6 +145,7 @@ def get_api_key_status(
 
 
 @router.delete("", response_model=MessageResponse)
+@profile_in_worker
 def delete_api_key(
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
@@ -139,6 +153,8 @@ def delete_api_key(
     """Delete user's API key."""
     deleted = db.query(UserApiKey).filter(UserApiKey.user_id == user.id).delete()
     db.commit()
+    invalidate_user(user.id)
+    invalidate_api_key(user.id)
 
     if deleted:
         return {"message": "API key deleted successfully"}
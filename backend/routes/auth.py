@@ -3,29 +3,30 @@ Auth Routes
 ===========
 Authentication endpoints for signup, signin, logout, and token refresh.
 Uses Bearer token authentication (tokens returned in response body).
+Runs on the asyncio database session so auth traffic never blocks the event loop.
 """
 
 import os
-from datetime import datetime, timezone
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 from pydantic import BaseModel, EmailStr
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from database import get_db
+from database import get_async_db
 from models.user import User, FREE_MESSAGE_LIMIT
 from models.refresh_token import RefreshToken
-from models.api_key import UserApiKey
-from auth.password import hash_password, verify_password
+from auth.password import needs_rehash
+from auth.password_pool import hash_password_async, verify_password_async
 from auth.jwt import (
     create_access_token,
-    create_refresh_token,
     decode_token,
     hash_token,
     ACCESS_TOKEN_EXPIRE_MINUTES,
-    REFRESH_TOKEN_EXPIRE_DAYS,
 )
-from auth.dependencies import get_current_user
+from auth.dependencies import get_current_user_async, user_has_api_key_async
+from auth.refresh_tokens import claim_refresh_token, issue_refresh_token
+from extraction_window import flush_user_window, windowing_enabled
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
@@ -82,8 +83,9 @@ class AuthResponse(BaseModel):
 
 
 class TokenResponse(BaseModel):
-    """Response for token refresh."""
+    """Response for token refresh. The refresh token is rotated on every use."""
     access_token: str
+    refresh_token: str
     token_type: str = "bearer"
     expires_in: int = ACCESS_TOKEN_EXPIRE_MINUTES * 60
 
@@ -92,13 +94,8 @@ class MessageResponse(BaseModel):
     message: str
 
 
-def build_user_info(user: User, db: Session) -> dict:
+def build_user_info(user: User, has_api_key: bool) -> dict:
     """Build user info with usage data."""
-    has_api_key = db.query(UserApiKey).filter(
-        UserApiKey.user_id == user.id,
-        UserApiKey.is_valid == True
-    ).first() is not None
-
     return {
         "id": user.id,
         "name": user.name,
@@ -119,10 +116,10 @@ def build_user_info(user: User, db: Session) -> dict:
 
 
 @router.post("/signup", response_model=AuthResponse)
-def signup(request: SignUpRequest, db: Session = Depends(get_db)):
+async def signup(request: SignUpRequest, db: AsyncSession = Depends(get_async_db)):
     """Create a new user account and return tokens."""
     # Check if email already exists
-    existing_user = db.query(User).filter(User.email == request.email).first()
+    existing_user = (await db.execute(select(User).where(User.email == request.email))).scalars().first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -140,27 +137,19 @@ def signup(request: SignUpRequest, db: Session = Depends(get_db)):
     user = User(
         name=request.name,
         email=request.email,
-        hashed_password=hash_password(request.password),
+        hashed_password=await hash_password_async(request.password),
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
-    # Create tokens
+    # Create tokens (refresh token hash is stored)
     access_token = create_access_token(user.id, user.email)
-    refresh_token, expires_at = create_refresh_token(user.id)
-
-    # Store refresh token hash
-    token_record = RefreshToken(
-        user_id=user.id,
-        token_hash=hash_token(refresh_token),
-        expires_at=expires_at,
-    )
-    db.add(token_record)
-    db.commit()
+    refresh_token = await db.run_sync(issue_refresh_token, user.id)
+    await db.commit()
 
     return {
-        "user": build_user_info(user, db),
+        "user": build_user_info(user, has_api_key=False),
         "access_token": access_token,
         "refresh_token": refresh_token,
         "token_type": "bearer",
@@ -169,11 +158,11 @@ def signup(request: SignUpRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/signin", response_model=AuthResponse)
-def signin(request: SignInRequest, db: Session = Depends(get_db)):
+async def signin(request: SignInRequest, db: AsyncSession = Depends(get_async_db)):
     """Authenticate user and return tokens."""
-    user = db.query(User).filter(User.email == request.email).first()
+    user = (await db.execute(select(User).where(User.email == request.email))).scalars().first()
 
-    if not user or not verify_password(request.password, user.hashed_password):
+    if not user or not await verify_password_async(request.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid email or password",
@@ -185,21 +174,17 @@ def signin(request: SignInRequest, db: Session = Depends(get_db)):
             detail="Account is deactivated",
         )
 
-    # Create tokens
-    access_token = create_access_token(user.id, user.email)
-    refresh_token, expires_at = create_refresh_token(user.id)
+    # Transparently upgrade hashes made with a different bcrypt cost
+    if needs_rehash(user.hashed_password):
+        user.hashed_password = await hash_password_async(request.password)
 
-    # Store refresh token hash
-    token_record = RefreshToken(
-        user_id=user.id,
-        token_hash=hash_token(refresh_token),
-        expires_at=expires_at,
-    )
-    db.add(token_record)
-    db.commit()
+    # Create tokens (refresh token hash is stored)
+    access_token = create_access_token(user.id, user.email)
+    refresh_token = await db.run_sync(issue_refresh_token, user.id)
+    await db.commit()
 
     return {
-        "user": build_user_info(user, db),
+        "user": build_user_info(user, has_api_key=await user_has_api_key_async(user, db)),
         "access_token": access_token,
         "refresh_token": refresh_token,
         "token_type": "bearer",
@@ -208,19 +193,28 @@ def signin(request: SignInRequest, db: Session = Depends(get_db)):
 
 
 @router.post("/logout", response_model=MessageResponse)
-def logout(request: LogoutRequest, db: Session = Depends(get_db)):
+async def logout(
+    request: LogoutRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+):
     """Logout user and invalidate refresh token."""
     if request.refresh_token:
         token_hash = hash_token(request.refresh_token)
-        db.query(RefreshToken).filter(RefreshToken.token_hash == token_hash).delete()
-        db.commit()
+        user_id = (await db.execute(
+            delete(RefreshToken).where(RefreshToken.token_hash == token_hash).returning(RefreshToken.user_id)
+        )).scalar_one_or_none()
+        await db.commit()
+        if user_id is not None and windowing_enabled():
+            # Extract what the session left in its window, after the response
+            background_tasks.add_task(flush_user_window, user_id)
 
     return {"message": "Successfully logged out"}
 
 
 @router.post("/refresh", response_model=TokenResponse)
-def refresh_token(request: RefreshRequest, db: Session = Depends(get_db)):
-    """Issue a new access token using refresh token."""
+async def refresh_token(request: RefreshRequest, db: AsyncSession = Depends(get_async_db)):
+    """Issue a new access token and rotate the refresh token."""
     # Validate refresh token
     payload = decode_token(request.refresh_token)
     if not payload or payload.get("type") != "refresh":
@@ -229,50 +223,46 @@ def refresh_token(request: RefreshRequest, db: Session = Depends(get_db)):
             detail="Invalid refresh token",
         )
 
-    # Check if token exists in database and is not expired
-    token_hash = hash_token(request.refresh_token)
-    token_record = db.query(RefreshToken).filter(
-        RefreshToken.token_hash == token_hash,
-        RefreshToken.expires_at > datetime.now(timezone.utc),
-    ).first()
-
-    if not token_record:
+    # Revoke the token in the same statement that checks it, so a token
+    # can't be rotated twice by concurrent requests
+    user_id = await db.run_sync(claim_refresh_token, hash_token(request.refresh_token))
+    if user_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Refresh token expired or revoked",
         )
 
     # Get user
-    user = db.query(User).filter(User.id == token_record.user_id).first()
+    user = await db.get(User, user_id)
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found or inactive",
         )
 
-    # Issue new access token
+    # Issue new access token and a replacement for the used refresh token
     access_token = create_access_token(user.id, user.email)
+    new_refresh_token = await db.run_sync(issue_refresh_token, user.id)
+    await db.commit()
 
     return {
         "access_token": access_token,
+        "refresh_token": new_refresh_token,
         "token_type": "bearer",
         "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
     }
 
 
 @router.get("/me", response_model=UserInfo)
-def get_me(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_me(user: User = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
     """Get current authenticated user info."""
-    return build_user_info(user, db)
+    return build_user_info(user, has_api_key=await user_has_api_key_async(user, db))
 
 
 @router.get("/usage", response_model=UsageResponse)
-def get_usage(user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def get_usage(user: User = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
     """Get current user's usage info."""
-    has_api_key = db.query(UserApiKey).filter(
-        UserApiKey.user_id == user.id,
-        UserApiKey.is_valid == True
-    ).first() is not None
+    has_api_key = await user_has_api_key_async(user, db)
 
     return {
         "free_messages_remaining": user.free_messages_remaining,
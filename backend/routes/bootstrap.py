@@ -0,0 +1,74 @@
+"""
+Bootstrap Routes
+================
+Single endpoint returning everything the dashboard needs on first load:
+user info and usage, API key status, the first chat history page and the
+memory graph (or just its version). Parts are loaded concurrently, each
+with its own asyncio database session, and serialized once with
+FastJSONResponse.
+"""
+
+import asyncio
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, Query
+from pydantic import BaseModel
+from sqlalchemy.orm import Session
+
+from database import run_with_async_session
+from responses import FastJSONResponse
+from schemas import MemoriesResponse, ChatHistoryResponse
+from auth.dependencies import get_current_user_async
+from models.user import User
+from routes.auth import UserInfo, build_user_info
+from routes.api_keys import ApiKeyStatusResponse, load_api_key_status
+from routes.chat import get_chat_history_page
+from routes.memories import build_memory_graph, get_memory_graph_version
+
+
+router = APIRouter(prefix="/api", tags=["bootstrap"])
+
+
+class BootstrapResponse(BaseModel):
+    user: UserInfo
+    api_key_status: ApiKeyStatusResponse
+    history: ChatHistoryResponse
+    # Omitted when include_memories=false; compare memories_version instead
+    memories: Optional[MemoriesResponse] = None
+    memories_version: str
+
+
+def load_memories(
+    db: Session, conversation_id: int, include_memories: bool
+) -> Tuple[Optional[dict], str]:
+    """Load the memory graph (if requested) and its version."""
+    graph = build_memory_graph(db, conversation_id) if include_memories else None
+    return graph, get_memory_graph_version(db, conversation_id)
+
+
+@router.get("/bootstrap", response_model=BootstrapResponse)
+async def bootstrap(
+    history_limit: int = Query(default=100, le=500),
+    include_memories: bool = Query(default=True),
+    user: User = Depends(get_current_user_async),
+):
+    """
+    Get user info, usage, API key status, chat history and memories in one call.
+    Replaces the /auth/me, /api-keys/status, /chat/history and /memories
+    round trips made on dashboard load.
+    """
+    key_status, history, (graph, version) = await asyncio.gather(
+        run_with_async_session(load_api_key_status, user.id),
+        run_with_async_session(get_chat_history_page, user.id, history_limit, 0),
+        run_with_async_session(load_memories, user.id, include_memories),
+    )
+
+    has_api_key = key_status["has_key"] and key_status["is_valid"]
+
+    return FastJSONResponse({
+        "user": build_user_info(user, has_api_key=has_api_key),
+        "api_key_status": key_status,
+        "history": history,
+        "memories": graph,
+        "memories_version": version,
+    })
@@ -5,33 +5,61 @@ API endpoint for chat functionality with memory integration.
 Returns local_id for per-user sequential memory numbering.
 Supports free trial (10 messages) and API key access.
 Includes chat history persistence.
+ContextMemory is imported inside the chat handler to keep cold starts fast.
 """
 
+import logging
+import time
 from typing import Optional, Tuple, List
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Header, Query
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from contextmemory import Memory
-from contextmemory.db.models.memory import Memory as MemoryModel
-
-from database import get_db
-from config import LLM_MODEL, OPENROUTER_API_KEY
-from schemas import ChatRequest, ChatResponse, ExtractedMemory, UsageInfo, ChatHistoryResponse, ChatMessageSchema
+from database import get_db, get_async_db, short_write_transactions
+from config import LLM_MODEL, OPENROUTER_API_KEY, ensure_contextmemory
+from schemas import ChatRequest, ChatResponse, ExtractedMemory, UsageInfo, ChatHistoryResponse
 from utils import ensure_conversation_exists, build_id_mapping
-from auth.dependencies import get_current_user, require_api_key_or_free_tier
+from auth.dependencies import get_current_user, get_current_user_async, require_api_key_or_free_tier
+from auth.user_cache import invalidate_user
 from models.user import User, FREE_MESSAGE_LIMIT
 from models.chat_message import ChatMessage
 from services.openrouter_client import create_openrouter_client
+from services.provider_calls import (
+    PROVIDER_CHAT_DEADLINE_SECONDS,
+    ProviderDeadlineExceeded,
+    ProviderUnavailable,
+    call_provider,
+    get_breaker,
+    provider_guard,
+)
+from responses import FastJSONResponse
+from extraction_gate import record_turn_without_extraction, should_extract
+from extraction_window import buffer_turn, window_will_flush, windowing_enabled
+from idempotency import (
+    IDEMPOTENCY_KEY_HEADER,
+    IDEMPOTENCY_KEY_MAX_LENGTH,
+    request_fingerprint,
+    run_idempotent,
+)
+from metrics import LLM_TOKENS, observe_chat_stage, request_started_at
+from profiling import profile_in_worker
+
+logger = logging.getLogger(__name__)
 
 
 router = APIRouter(prefix="/api", tags=["chat"])
 
 
 @router.post("/chat", response_model=ChatResponse)
-async def chat(
+@profile_in_worker
+def chat(
     request: ChatRequest,
+    idempotency_key: Optional[str] = Header(
+        default=None, alias=IDEMPOTENCY_KEY_HEADER, max_length=IDEMPOTENCY_KEY_MAX_LENGTH
+    ),
     db: Session = Depends(get_db),
-    auth_result: Tuple[Optional[str], User] = Depends(require_api_key_or_free_tier),
+    user: User = Depends(get_current_user),
 ):
     """
     Send a message, get AI response, and extract memories.
@@ -40,7 +68,37 @@ async def chat(
 
     Free tier: First 10 messages use system API key.
     After free tier: Requires user's OpenRouter API key.
+
+    With an Idempotency-Key header, retries of a turn get the first
+    response instead of running it again (see idempotency.py). The free
+    tier check comes after the replay lookup, so a retry of the last free
+    message still gets its answer.
+
+    A plain def so the blocking LLM, embedding and database work runs in
+    FastAPI's threadpool instead of stalling the event loop.
     """
+    def run_turn() -> ChatResponse:
+        return run_chat_turn(request, db, require_api_key_or_free_tier(user, db))
+
+    if idempotency_key is None:
+        return run_turn()
+    return run_idempotent(user.id, idempotency_key, request_fingerprint(request), run_turn)
+
+
+def run_chat_turn(
+    request: ChatRequest,
+    db: Session,
+    auth_result: Tuple[Optional[str], User],
+) -> ChatResponse:
+    """Run one chat turn: memory search, LLM reply, memory extraction and history."""
+    # Time spent before the handler runs is auth and API key resolution
+    request_start = request_started_at.get()
+    stage_start = observe_chat_stage("auth", request_start) if request_start is not None else time.perf_counter()
+
+    from contextmemory import Memory
+    from contextmemory.db.models.memory import Memory as MemoryModel
+    ensure_contextmemory()
+
     try:
         api_key, user = auth_result
 
@@ -65,20 +123,24 @@ async def chat(
             effective_api_key = OPENROUTER_API_KEY
             is_free_tier = True
 
-        # Create OpenAI client with the appropriate API key
-        chat_client = create_openrouter_client(effective_api_key)
+        # Create OpenAI client with the appropriate API key; call_provider
+        # does the retrying, so the SDK's own retries are off
+        chat_client = create_openrouter_client(effective_api_key, max_retries=0)
 
         # Create memory instance with fresh session
         memory = Memory(db)
+        stage_start = observe_chat_stage("setup", stage_start)
 
         # 1. Search relevant memories
-        search_results = memory.search(
-            query=request.message,
-            conversation_id=conversation_id,
-            limit=5,
-        )
+        with provider_guard("memory_search"):
+            search_results = memory.search(
+                query=request.message,
+                conversation_id=conversation_id,
+                limit=5,
+            )
 
         relevant_memories = search_results.get("results", [])
+        stage_start = observe_chat_stage("memory_search", stage_start)
 
         # Format memories for prompt
         memories_str = ""
@@ -106,27 +168,55 @@ async def chat(
             {"role": "user", "content": request.message},
         ]
 
-        # 3. Call LLM
-        try:
-            response = chat_client.chat.completions.create(
+        # Fail now if extraction's circuit is open, not after the reply has
+        # been generated and counted against the free tier. A windowed turn
+        # only extracts when it fills the window; otherwise it is just buffered
+        windowed = windowing_enabled()
+        if windowed:
+            extract = window_will_flush(db, conversation_id)
+        else:
+            extract = should_extract(request.message).extract
+        if extract:
+            get_breaker("memory_add").check()
+
+        # 3. Call LLM (deadline, retries, hedging and circuit breaker)
+        def complete(timeout: float):
+            return chat_client.chat.completions.create(
                 model=LLM_MODEL,
                 messages=messages,
+                timeout=timeout,
             )
+
+        try:
+            response = call_provider("chat", complete, PROVIDER_CHAT_DEADLINE_SECONDS)
+        except ProviderUnavailable:
+            raise
+        except ProviderDeadlineExceeded as e:
+            from fastapi import HTTPException, status
+            logger.warning(f"LLM error: {e}")
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT, detail=str(e))
         except Exception as e:
             from fastapi import HTTPException, status
-            print(f"LLM Error: {str(e)}")
+            logger.warning(f"LLM error: {e}")
             raise HTTPException(
                 status_code=status.HTTP_502_BAD_GATEWAY,
                 detail=f"Failed to generate response from AI provider: {str(e)}"
             )
 
         assistant_response = response.choices[0].message.content
+        stage_start = observe_chat_stage("llm", stage_start)
+        if response.usage:
+            LLM_TOKENS.inc(response.usage.prompt_tokens or 0, model=LLM_MODEL, kind="prompt")
+            LLM_TOKENS.inc(response.usage.completion_tokens or 0, model=LLM_MODEL, kind="completion")
 
         # 4. Increment message count for free tier users
         if is_free_tier:
-            user.message_count += 1
+            # Increment in SQL so a stale cached count can't be written back
+            user.message_count = User.message_count + 1
             db.commit()
             db.refresh(user)
+            invalidate_user(user.id)
+            stage_start = observe_chat_stage("usage_update", stage_start)
 
         # 5. Store memories
         full_messages = [
@@ -134,10 +224,22 @@ async def chat(
             {"role": "assistant", "content": assistant_response},
         ]
 
-        result = memory.add(
-            messages=full_messages,
-            conversation_id=conversation_id,
-        )
+        if windowed:
+            # Extraction runs once per window of turns; result is None until it flushes
+            result = buffer_turn(db, conversation_id, full_messages)
+            stage_start = observe_chat_stage("memory_add", stage_start)
+        elif extract:
+            with provider_guard("memory_add"), short_write_transactions(db):
+                result = memory.add(
+                    messages=full_messages,
+                    conversation_id=conversation_id,
+                )
+            stage_start = observe_chat_stage("memory_add", stage_start)
+        else:
+            # Nothing worth extracting: skip the extraction call, keep the turn as context
+            record_turn_without_extraction(db, conversation_id, full_messages)
+            result = None
+            stage_start = observe_chat_stage("memory_record", stage_start)
 
         # Get the newly created memory IDs by querying the latest memories
         semantic_texts = result.get("semantic", []) if result else []
@@ -203,6 +305,8 @@ async def chat(
             "bubbles": extracted_bubbles,
         }
 
+        stage_start = observe_chat_stage("memory_lookup", stage_start)
+
         # 6. Save chat messages to database for history
         # Save user message
         user_chat_message = ChatMessage(
@@ -226,6 +330,7 @@ async def chat(
         )
         db.add(assistant_chat_message)
         db.commit()
+        observe_chat_stage("history_write", stage_start)
 
         # Build usage info
         usage = UsageInfo(
@@ -240,16 +345,25 @@ async def chat(
             relevant_memories=relevant_memories,
             usage=usage,
         )
+    except ProviderUnavailable as e:
+        # Circuit open: fail fast without a traceback per request
+        db.rollback()
+        from fastapi import HTTPException, status
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(int(e.retry_after))},
+        )
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        print(f"CHAT ENDPOINT ERROR:\n{error_details}")
-        
-        # Re-raise HTTP exceptions (like 503/502/403)
+        # Drop the half-finished turn now, releasing any SQLite write slot
+        db.rollback()
+
+        # Re-raise HTTP exceptions (like 503/502/403) as they are, without a traceback
         from fastapi import HTTPException
         if isinstance(e, HTTPException):
             raise e
-            
+
+        logger.exception("Chat endpoint error")
         # Wrap unknown errors in 500
         from fastapi import status
         raise HTTPException(
@@ -262,50 +376,55 @@ async def chat(
 async def get_chat_history(
     limit: int = Query(default=100, le=500),
     offset: int = Query(default=0, ge=0),
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_user_async),
 ):
     """
     Get chat history for the authenticated user.
     Returns messages in chronological order (oldest first).
     """
+    return FastJSONResponse(await db.run_sync(get_chat_history_page, user.id, limit, offset))
+
+
+def get_chat_history_page(db: Session, user_id: int, limit: int, offset: int) -> dict:
+    """Load one page of a user's chat history, oldest first (ChatHistoryResponse shape)."""
     # Get total count
-    total = db.query(ChatMessage).filter(ChatMessage.user_id == user.id).count()
+    total = db.query(ChatMessage).filter(ChatMessage.user_id == user_id).count()
 
     # Get messages
     messages = (
         db.query(ChatMessage)
-        .filter(ChatMessage.user_id == user.id)
+        .filter(ChatMessage.user_id == user_id)
         .order_by(ChatMessage.created_at.asc())
         .offset(offset)
         .limit(limit)
         .all()
     )
 
-    return ChatHistoryResponse(
-        messages=[
-            ChatMessageSchema(
-                id=msg.id,
-                role=msg.role,
-                content=msg.content,
-                extracted_memories=msg.extracted_memories,
-                created_at=msg.created_at.isoformat(),
-            )
+    return {
+        "messages": [
+            {
+                "id": msg.id,
+                "role": msg.role,
+                "content": msg.content,
+                "extracted_memories": msg.extracted_memories,
+                "created_at": msg.created_at.isoformat(),
+            }
             for msg in messages
         ],
-        total=total,
-        has_more=offset + limit < total,
-    )
+        "total": total,
+        "has_more": offset + limit < total,
+    }
 
 
 @router.delete("/chat/history")
 async def clear_chat_history(
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_user_async),
 ):
     """
     Clear all chat history for the authenticated user.
     """
-    db.query(ChatMessage).filter(ChatMessage.user_id == user.id).delete()
-    db.commit()
+    await db.execute(delete(ChatMessage).where(ChatMessage.user_id == user.id))
+    await db.commit()
     return {"message": "Chat history cleared"}
@@ -3,38 +3,53 @@ Memory Routes
 =============
 API endpoints for memory CRUD operations and visualization data.
 Uses local_id for per-user sequential memory numbering.
+ContextMemory models are imported inside handlers to keep cold starts fast.
+
+Read endpoints load only the columns they render (never the embeddings),
+build plain dicts and return FastJSONResponse, skipping response_model
+validation and the stdlib encoder (see responses.py).
+
+GET /api/memories can also return a compact columnar graph (see
+compact_memory_graph), requested with ?format=compact or
+"Accept: application/vnd.contextmemory.graph+json".
 """
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from typing import Optional
 
-from contextmemory.db.models.memory import Memory as MemoryModel
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, defer
 
-from database import get_db
-from schemas import MemoriesResponse, MemoryNode
-from utils import ensure_conversation_exists, get_memory_connections, build_id_mapping
-from auth.dependencies import get_current_user
+from database import get_async_db
+from responses import FastJSONResponse
+from schemas import MemoriesResponse
+from utils import get_memory_connections, build_id_mapping
+from auth.dependencies import get_current_user_async
 from models.user import User
 
 
 router = APIRouter(prefix="/api", tags=["memories"])
 
+COMPACT_GRAPH_MEDIA_TYPE = "application/vnd.contextmemory.graph+json"
+COMPACT_GRAPH_FORMAT = "columnar-v1"
+MEMORY_TYPES = ["semantic", "bubble"]
 
-@router.get("/memories", response_model=MemoriesResponse)
-async def get_memories(
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
-):
-    """
-    Get all memories for the authenticated user as nodes and links for visualization.
-    Uses user.id as conversation_id for memory isolation.
-    Returns local_id for per-user sequential numbering (1, 2, 3...).
-    """
-    conversation_id = user.id
-    ensure_conversation_exists(db, conversation_id)
 
-    # Get memories ordered by creation date for consistent local_id assignment
-    all_memories = db.query(MemoryModel).filter(
+def build_memory_graph(db: Session, conversation_id: int) -> dict:
+    """Build the nodes/links visualization graph for a conversation (MemoriesResponse shape)."""
+    from contextmemory.db.models.memory import Memory as MemoryModel
+
+    # Get memories ordered by creation date for consistent local_id assignment;
+    # only the rendered columns, as lightweight rows rather than ORM objects
+    all_memories = db.query(
+        MemoryModel.id,
+        MemoryModel.memory_text,
+        MemoryModel.is_episodic,
+        MemoryModel.importance,
+        MemoryModel.created_at,
+        MemoryModel.memory_metadata,
+    ).filter(
         MemoryModel.conversation_id == conversation_id,
         MemoryModel.is_active == True
     ).order_by(MemoryModel.created_at).all()
@@ -61,16 +76,15 @@ async def get_memories(
                     "score": conn["score"]
                 })
 
-        node = MemoryNode(
-            id=mem.id,  # Keep global ID for internal use
-            local_id=local_id,  # Per-user sequential ID
-            text=mem.memory_text,
-            type="bubble" if mem.is_episodic else "semantic",
-            importance=mem.importance or 0.5,
-            created_at=mem.created_at.isoformat() if mem.created_at else "",
-            connections=local_connections,
-        )
-        nodes.append(node)
+        nodes.append({
+            "id": mem.id,  # Keep global ID for internal use
+            "local_id": local_id,  # Per-user sequential ID
+            "text": mem.memory_text,
+            "type": "bubble" if mem.is_episodic else "semantic",
+            "importance": mem.importance or 0.5,
+            "created_at": mem.created_at.isoformat() if mem.created_at else "",
+            "connections": local_connections,
+        })
 
         # Create links using global IDs (for D3 visualization)
         for conn in connections:
@@ -87,23 +101,78 @@ async def get_memories(
                         "strength": conn["score"],
                     })
 
-    return MemoriesResponse(nodes=nodes, links=links, id_mapping=id_mapping)
+    return {"nodes": nodes, "links": links, "id_mapping": id_mapping}
 
 
-@router.get("/memory/{memory_id}")
-async def get_memory(
-    memory_id: int,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
-):
+def compact_memory_graph(graph: dict) -> dict:
     """
-    Get details for a single memory including connected memories.
-    Accepts either global_id or local_id via query parameter.
+    Columnar encoding of a graph from build_memory_graph.
+
+    Nodes become parallel arrays in local_id order (local_id = index + 1,
+    so id_mapping is implied by nodes.id) with types dictionary-encoded
+    against `types`. Each node's connections become one row of the edge
+    arrays (source/target are local IDs). links aren't sent: they are the
+    edges de-duplicated by unordered pair in order, with the first edge's
+    direction and score.
     """
-    conversation_id = user.id
+    type_codes = {name: code for code, name in enumerate(MEMORY_TYPES)}
+    nodes = graph["nodes"]
+    sources, targets, scores = [], [], []
+    for node in nodes:
+        for conn in node["connections"]:
+            sources.append(node["local_id"])
+            targets.append(conn["target_id"])
+            scores.append(conn["score"])
+
+    return {
+        "format": COMPACT_GRAPH_FORMAT,
+        "types": MEMORY_TYPES,
+        "nodes": {
+            "id": [node["id"] for node in nodes],
+            "text": [node["text"] for node in nodes],
+            "type": [type_codes[node["type"]] for node in nodes],
+            "importance": [node["importance"] for node in nodes],
+            "created_at": [node["created_at"] for node in nodes],
+        },
+        "edges": {"source": sources, "target": targets, "score": scores},
+    }
+
+
+def wants_compact_graph(request: Request, format: Optional[str]) -> bool:
+    """?format wins; otherwise the Accept header decides."""
+    if format is not None:
+        return format == "compact"
+    return COMPACT_GRAPH_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def get_memory_graph_version(db: Session, conversation_id: int) -> str:
+    """
+    Cheap fingerprint of a conversation's graph.
+    Changes whenever a memory is added, updated, deactivated or deleted.
+    """
+    from contextmemory.db.models.memory import Memory as MemoryModel
+
+    count, max_id, last_updated = db.query(
+        func.count(MemoryModel.id),
+        func.max(MemoryModel.id),
+        func.max(MemoryModel.updated_at),
+    ).filter(
+        MemoryModel.conversation_id == conversation_id,
+        MemoryModel.is_active == True
+    ).one()
+    updated = last_updated.isoformat() if last_updated else ""
+    return f"{count}-{max_id or 0}-{updated}"
+
 
-    # Get all user memories to build ID mapping
-    all_memories = db.query(MemoryModel).filter(
+def load_memory_detail(db: Session, conversation_id: int, memory_id: int) -> Optional[dict]:
+    """
+    Load a single memory with its connected memories.
+    Accepts either a global ID or a per-user local ID; returns None if not found.
+    """
+    from contextmemory.db.models.memory import Memory as MemoryModel
+
+    # IDs alone are enough to build the ID mapping
+    all_memories = db.query(MemoryModel.id).filter(
         MemoryModel.conversation_id == conversation_id,
         MemoryModel.is_active == True
     ).order_by(MemoryModel.created_at).all()
@@ -111,33 +180,32 @@ async def get_memory(
     id_mapping = build_id_mapping(all_memories)
     reverse_mapping = {v: k for k, v in id_mapping.items()}
 
+    def get_memories(ids) -> dict:
+        rows = db.query(MemoryModel).options(defer(MemoryModel.embedding)).filter(
+            MemoryModel.id.in_(ids),
+            MemoryModel.conversation_id == conversation_id,
+        ).all()
+        return {row.id: row for row in rows}
+
     # Try to find memory by global ID first
-    mem = db.query(MemoryModel).filter(
-        MemoryModel.id == memory_id,
-        MemoryModel.conversation_id == conversation_id,
-    ).first()
+    mem = get_memories([memory_id]).get(memory_id)
 
     # If not found, try as local_id
     if not mem and memory_id in reverse_mapping:
         global_id = reverse_mapping[memory_id]
-        mem = db.query(MemoryModel).filter(
-            MemoryModel.id == global_id,
-            MemoryModel.conversation_id == conversation_id,
-        ).first()
+        mem = get_memories([global_id]).get(global_id)
 
     if not mem:
-        raise HTTPException(status_code=404, detail="Memory not found")
+        return None
 
     local_id = id_mapping.get(mem.id, 0)
     connections = get_memory_connections(mem)
 
-    # Fetch connected memories with local IDs
+    # Fetch connected memories with local IDs, in one query
+    connected = get_memories([conn["target_id"] for conn in connections]) if connections else {}
     connected_memories = []
     for conn in connections:
-        connected_mem = db.query(MemoryModel).filter(
-            MemoryModel.id == conn["target_id"],
-            MemoryModel.conversation_id == conversation_id,
-        ).first()
+        connected_mem = connected.get(conn["target_id"])
         if connected_mem:
             connected_memories.append({
                 "id": connected_mem.id,
@@ -160,26 +228,68 @@ async def get_memory(
     }
 
 
+@router.get("/memories", response_model=MemoriesResponse)
+async def get_memories(
+    request: Request,
+    format: Optional[str] = Query(default=None, pattern="^(full|compact)$"),
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_user_async),
+):
+    """
+    Get all memories for the authenticated user as nodes and links for visualization.
+    Uses user.id as conversation_id for memory isolation.
+    Returns local_id for per-user sequential numbering (1, 2, 3...).
+    With format=compact (or the compact media type in Accept) returns the
+    columnar encoding from compact_memory_graph instead.
+    """
+    graph = await db.run_sync(build_memory_graph, user.id)
+    # Responses differ by Accept, so shared caches must key on it
+    headers = {"Vary": "Accept"}
+    if wants_compact_graph(request, format):
+        return FastJSONResponse(compact_memory_graph(graph), media_type=COMPACT_GRAPH_MEDIA_TYPE, headers=headers)
+    return FastJSONResponse(graph, headers=headers)
+
+
+@router.get("/memory/{memory_id}")
+async def get_memory(
+    memory_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_user_async),
+):
+    """
+    Get details for a single memory including connected memories.
+    Accepts either global_id or local_id via query parameter.
+    """
+    detail = await db.run_sync(load_memory_detail, user.id, memory_id)
+    if detail is None:
+        raise HTTPException(status_code=404, detail="Memory not found")
+    return FastJSONResponse(detail)
+
+
 @router.delete("/memory/{memory_id}")
 async def delete_memory(
     memory_id: int,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+    user: User = Depends(get_current_user_async),
 ):
     """
     Delete a memory belonging to the authenticated user.
     Accepts global_id.
     """
+    from contextmemory.db.models.memory import Memory as MemoryModel
+
     conversation_id = user.id
 
-    mem = db.query(MemoryModel).filter(
-        MemoryModel.id == memory_id,
-        MemoryModel.conversation_id == conversation_id,
-    ).first()
+    mem = (await db.execute(
+        select(MemoryModel).where(
+            MemoryModel.id == memory_id,
+            MemoryModel.conversation_id == conversation_id,
+        )
+    )).scalars().first()
 
     if not mem:
         raise HTTPException(status_code=404, detail="Memory not found")
 
-    db.delete(mem)
-    db.commit()
+    await db.delete(mem)
+    await db.commit()
     return {"status": "deleted", "id": memory_id}
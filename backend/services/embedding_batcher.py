@@ -0,0 +1,214 @@
+"""
+Embedding Batcher
+=================
+Coalesces single-text embedding calls from concurrent requests into one
+batched provider call.
+
+ContextMemory embeds one text per call (the search query in memory.search,
+each new fact and bubble in memory.add), so under load the provider sees
+many tiny requests, each paying a full round trip. BatchingEmbeddingClient
+stands in for ContextMemory's embedding client: single-text calls are
+queued, and a dispatcher thread sends whatever arrived within
+EMBEDDING_BATCH_WINDOW_MS (up to EMBEDDING_BATCH_MAX_SIZE texts) as one
+`embeddings.create(input=[...])` call and hands each caller its vector.
+Identical texts in a batch are embedded once. If the provider rejects a
+batch as a bad request, its texts are sent one by one, so only the callers
+of the offending text get the error.
+
+A lone request waits the window (a few milliseconds) before it goes out.
+A caller then gives its batch the client's full budget to send and
+answer: PROVIDER_MEMORY_TIMEOUT_SECONDS per attempt, for
+1 + PROVIDER_MEMORY_MAX_RETRIES attempts. A request still queued behind
+other batches after that long is withdrawn, so it is never sent, and the
+caller gets a TimeoutError. Everything else on the client (chat
+completions, list inputs) goes straight to the wrapped client.
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from metrics import EMBEDDING_BATCH_SIZE, PROVIDER_CALL_DURATION
+from services.provider_calls import PROVIDER_MEMORY_MAX_RETRIES, PROVIDER_MEMORY_TIMEOUT_SECONDS
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BATCH_ENABLED = os.getenv("EMBEDDING_BATCH_ENABLED", "true").lower() in ("true", "1", "yes")
+# How long the first text in a batch waits for others to join it
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "64"))
+# Batched calls in flight at once
+EMBEDDING_BATCH_CONCURRENCY = int(os.getenv("EMBEDDING_BATCH_CONCURRENCY", "4"))
+
+
+@dataclass
+class _EmbeddingRequest:
+    model: str
+    text: str
+    future: "Future[List[float]]" = field(default_factory=Future)
+    # time.monotonic() when its batch went to the provider
+    sent_at: float = 0.0
+
+
+def _is_input_error(error: BaseException) -> bool:
+    """A 4xx that is about the request itself, not the key or the rate limit."""
+    status_code = getattr(error, "status_code", None)
+    return status_code is not None and 400 <= status_code < 500 and status_code not in (401, 403, 429)
+
+
+class EmbeddingBatcher:
+    """Queue of single-text embedding requests, sent to the provider in batches."""
+
+    def __init__(
+        self,
+        client: "OpenAI",
+        window_seconds: float = EMBEDDING_BATCH_WINDOW_MS / 1000,
+        max_size: int = EMBEDDING_BATCH_MAX_SIZE,
+        concurrency: int = EMBEDDING_BATCH_CONCURRENCY,
+        timeout_seconds: float = PROVIDER_MEMORY_TIMEOUT_SECONDS,
+        max_retries: int = PROVIDER_MEMORY_MAX_RETRIES,
+    ):
+        self._client = client
+        self._window = window_seconds
+        # What the wrapped client may spend on one call, retries included
+        self._call_seconds = timeout_seconds * (max_retries + 1)
+        self._max_size = max_size
+        self._queue: "queue.SimpleQueue[_EmbeddingRequest]" = queue.SimpleQueue()
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="embedding-batch")
+        self._dispatcher: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def embed(self, model: str, text: str) -> List[float]:
+        """Embed one text, batched with whatever other requests arrive meanwhile."""
+        with self._lock:
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="embedding-batcher", daemon=True)
+                self._dispatcher.start()
+        request = _EmbeddingRequest(model, text)
+        self._queue.put(request)
+        try:
+            return request.future.result(timeout=self._window + self._call_seconds)
+        except FutureTimeoutError:
+            pass
+        # Still queued behind other batches: withdraw it so it is never sent
+        if request.future.cancel():
+            raise TimeoutError(f"Embedding request not sent within {self._window + self._call_seconds:.1f}s")
+        # Sent: the call gets its full budget from when it went out
+        try:
+            return request.future.result(timeout=max(0.0, request.sent_at + self._call_seconds - time.monotonic()))
+        except FutureTimeoutError:
+            # The batch may still complete; its result for this caller is dropped
+            raise TimeoutError(f"Embedding not returned within {self._call_seconds:.1f}s") from None
+
+    def _dispatch(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._window
+            while len(batch) < self._max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            by_model: Dict[str, List[_EmbeddingRequest]] = defaultdict(list)
+            for request in batch:
+                by_model[request.model].append(request)
+            for model, requests in by_model.items():
+                self._executor.submit(self._send, model, requests)
+
+    def _send(self, model: str, requests: List[_EmbeddingRequest]) -> None:
+        sent_at = time.monotonic()
+        for request in requests:
+            request.sent_at = sent_at
+        # Drops the requests whose callers gave up; the rest can no longer be withdrawn
+        requests = [request for request in requests if request.future.set_running_or_notify_cancel()]
+        if not requests:
+            return
+        texts = list(dict.fromkeys(request.text for request in requests))
+        EMBEDDING_BATCH_SIZE.observe(len(requests))
+        try:
+            vectors = self._embed(model, texts)
+        except Exception as e:
+            if len(texts) == 1 or not _is_input_error(e):
+                for request in requests:
+                    request.future.set_exception(e)
+                return
+            logger.warning(f"Embedding batch of {len(texts)} texts rejected ({e}); sending them one by one")
+            vectors, errors = {}, {}
+            for text in texts:
+                try:
+                    vectors.update(self._embed(model, [text]))
+                except Exception as text_error:
+                    errors[text] = text_error
+            for request in requests:
+                if request.text in errors:
+                    request.future.set_exception(errors[request.text])
+                else:
+                    request.future.set_result(vectors[request.text])
+            return
+        for request in requests:
+            request.future.set_result(vectors[request.text])
+
+    def _embed(self, model: str, texts: List[str]) -> Dict[str, List[float]]:
+        """One provider call; returns each text's vector."""
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = self._client.embeddings.create(model=model, input=texts)
+            vectors = {texts[item.index]: item.embedding for item in response.data}
+            if len(vectors) != len(texts):
+                raise ValueError(f"Embedding response has {len(vectors)} vectors for {len(texts)} texts")
+            outcome = "ok"
+            return vectors
+        finally:
+            PROVIDER_CALL_DURATION.observe(
+                time.perf_counter() - started, provider="openrouter", operation="embedding", outcome=outcome
+            )
+
+
+class _BatchingEmbeddings:
+    def __init__(self, embeddings: Any, batcher: EmbeddingBatcher):
+        self._embeddings = embeddings
+        self._batcher = batcher
+
+    def create(self, *, model: str, input: Any, **kwargs: Any):
+        if not isinstance(input, str) or kwargs:
+            return self._embeddings.create(model=model, input=input, **kwargs)
+
+        from openai.types import CreateEmbeddingResponse, Embedding
+        from openai.types.create_embedding_response import Usage
+
+        vector = self._batcher.embed(model, input)
+        # Usage is reported per batch, not per caller
+        return CreateEmbeddingResponse(
+            data=[Embedding(embedding=vector, index=0, object="embedding")],
+            model=model,
+            object="list",
+            usage=Usage(prompt_tokens=0, total_tokens=0),
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._embeddings, name)
+
+
+class BatchingEmbeddingClient:
+    """OpenAI client whose single-text embeddings.create calls go through an EmbeddingBatcher."""
+
+    def __init__(self, client: "OpenAI", batcher: Optional[EmbeddingBatcher] = None):
+        self._client = client
+        self.embeddings = _BatchingEmbeddings(client.embeddings, batcher or EmbeddingBatcher(client))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
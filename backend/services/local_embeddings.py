@@ -0,0 +1,104 @@
+"""
+Local Embeddings
+================
+On-box embedding provider, used instead of the remote EMBEDDING_MODEL when
+EMBEDDING_PROVIDER=local: no network round trip on memory search, and
+memories keep working offline.
+
+HashingEmbedder is a feature-hashing embedder (the "hashing trick"): words,
+word bigrams and character trigrams are hashed into a fixed number of
+signed buckets, weighted by log term frequency and L2-normalized. It needs
+nothing beyond NumPy and embeds a query in well under a millisecond. It
+captures lexical overlap, not meaning, so recall on paraphrases is lower
+than with a neural model.
+
+Vectors are 1536 wide, the size of ContextMemory's FAISS index. Embeddings
+from different providers aren't comparable: after switching
+EMBEDDING_PROVIDER, re-embed existing memories with `python reembed.py`.
+"""
+
+import math
+import re
+import zlib
+from collections import Counter
+from typing import Any, Sequence
+
+import numpy as np
+
+# Must match ContextMemory's FAISS index
+LOCAL_EMBEDDING_DIMENSIONS = 1536
+LOCAL_EMBEDDING_MODEL_NAME = "local/hashing-v2"
+
+# \w is Unicode-aware: any script's letters and digits. Scripts written
+# without spaces (Chinese, Japanese) come out as runs that the character
+# trigrams still match within.
+_TOKEN = re.compile(r"\w+(?:'\w+)?")
+
+
+class HashingEmbedder:
+    """Feature-hashing text embedder; deterministic across processes and restarts."""
+
+    def __init__(self, dimensions: int = LOCAL_EMBEDDING_DIMENSIONS):
+        self.dimensions = dimensions
+
+    def _features(self, text: str) -> Counter:
+        words = _TOKEN.findall(text.lower())
+        features: Counter = Counter(words)
+        features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+        # Character trigrams make inflections and typos land near each other
+        for word in words:
+            padded = f"<{word}>"
+            features.update(f"#{padded[i:i + 3]}" for i in range(len(padded) - 2))
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        """Unit-length float32 vector for one text (all zeros for text without words)."""
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for feature, count in self._features(text).items():
+            # crc32 is stable across runs (unlike hash()) and fast
+            hashed = zlib.crc32(feature.encode())
+            sign = 1.0 if hashed & 0x80000000 else -1.0
+            vector[hashed % self.dimensions] += sign * (1.0 + math.log(count))
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def embed_batch(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), dimensions) matrix of unit-length vectors."""
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            matrix[row] = self.embed(text)
+        return matrix
+
+
+class _LocalEmbeddings:
+    def __init__(self, embedder: HashingEmbedder):
+        self._embedder = embedder
+
+    def create(self, *, input: Any, model: str = LOCAL_EMBEDDING_MODEL_NAME, **kwargs: Any):
+        from openai.types import CreateEmbeddingResponse, Embedding
+        from openai.types.create_embedding_response import Usage
+
+        texts = [input] if isinstance(input, str) else list(input)
+        vectors = self._embedder.embed_batch(texts)
+        # Plain constructors: pydantic-core validates the floats in microseconds,
+        # while the SDK's model_construct walks them in Python (~10 ms)
+        return CreateEmbeddingResponse(
+            data=[
+                Embedding(embedding=vector.tolist(), index=i, object="embedding")
+                for i, vector in enumerate(vectors)
+            ],
+            model=LOCAL_EMBEDDING_MODEL_NAME,
+            object="list",
+            usage=Usage(prompt_tokens=0, total_tokens=0),
+        )
+
+
+class LocalEmbeddingClient:
+    """Stands in for an OpenAI client where only embeddings.create is used (ContextMemory's embedding client)."""
+
+    def __init__(self, embedder: HashingEmbedder = None):
+        self.embedder = embedder or HashingEmbedder()
+        self.embeddings = _LocalEmbeddings(self.embedder)
+
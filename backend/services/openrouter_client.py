@@ -4,12 +4,34 @@ OpenRouter Client Factory
 Creates per-user OpenAI client instances for OpenRouter API.
 """
 
-from openai import OpenAI
+from typing import TYPE_CHECKING, Optional
 
+from config import OPENROUTER_BASE_URL
 
-def create_openrouter_client(api_key: str) -> OpenAI:
-    """Create an OpenAI client configured for OpenRouter with the given API key."""
+if TYPE_CHECKING:
+    from openai import OpenAI
+
+
+def create_openrouter_client(
+    api_key: str,
+    timeout: Optional[float] = None,
+    max_retries: Optional[int] = None,
+) -> "OpenAI":
+    """
+    Create an OpenAI client configured for OpenRouter with the given API key.
+
+    timeout and max_retries override the SDK defaults (10 minutes, 2 retries).
+    """
+    # Imported lazily: openai is one of the slowest imports at cold start
+    from openai import OpenAI
+
+    options = {}
+    if timeout is not None:
+        options["timeout"] = timeout
+    if max_retries is not None:
+        options["max_retries"] = max_retries
     return OpenAI(
         api_key=api_key,
-        base_url="https://openrouter.ai/api/v1",
+        base_url=OPENROUTER_BASE_URL,
+        **options,
     )
@@ -0,0 +1,384 @@
+"""
+Provider Calls
+==============
+Deadlines, retries, hedging and a circuit breaker for calls to the LLM
+provider, so a degraded upstream costs a request a bounded amount of time
+instead of however long the upstream takes.
+
+call_provider(operation, attempt) runs attempt(timeout) under:
+- a deadline for the whole call (per operation, e.g. PROVIDER_CHAT_DEADLINE_SECONDS);
+  every attempt gets the time left as its HTTP timeout
+- bounded retries with full jitter on timeouts, connection errors, 429 and 5xx
+- a hedge: when an attempt runs longer than the operation's recent
+  PROVIDER_HEDGE_PERCENTILE latency, a duplicate is sent and whichever
+  answers first wins
+- a circuit breaker per operation that opens after PROVIDER_BREAKER_FAILURES
+  consecutive upstream failures and rejects calls for
+  PROVIDER_BREAKER_RESET_SECONDS, then lets one trial call through
+
+ContextMemory makes its own embedding and extraction calls; those get an
+HTTP timeout and retry count on the client (see init_contextmemory) and a
+circuit breaker through provider_guard(operation).
+
+Errors that are the caller's fault (401, 403, 400...) are raised straight
+away and don't count against the breaker: one user's bad API key must not
+take chat down for everyone.
+"""
+
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Deque, Dict, Iterator, Optional, TypeVar
+
+from metrics import PROVIDER_CALL_DURATION, PROVIDER_CALL_EVENTS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PROVIDER_NAME = "openrouter"
+
+# Deadline for the whole call, retries and hedges included
+PROVIDER_CHAT_DEADLINE_SECONDS = float(os.getenv("PROVIDER_CHAT_DEADLINE_SECONDS", "60"))
+# HTTP timeout for ContextMemory's embedding and extraction calls
+PROVIDER_MEMORY_TIMEOUT_SECONDS = float(os.getenv("PROVIDER_MEMORY_TIMEOUT_SECONDS", "30"))
+PROVIDER_MEMORY_MAX_RETRIES = int(os.getenv("PROVIDER_MEMORY_MAX_RETRIES", "2"))
+
+PROVIDER_MAX_RETRIES = int(os.getenv("PROVIDER_MAX_RETRIES", "2"))
+PROVIDER_RETRY_BASE_SECONDS = float(os.getenv("PROVIDER_RETRY_BASE_SECONDS", "0.25"))
+PROVIDER_RETRY_MAX_SECONDS = float(os.getenv("PROVIDER_RETRY_MAX_SECONDS", "4"))
+
+PROVIDER_HEDGE_ENABLED = os.getenv("PROVIDER_HEDGE_ENABLED", "true").lower() in ("true", "1", "yes")
+PROVIDER_HEDGE_PERCENTILE = float(os.getenv("PROVIDER_HEDGE_PERCENTILE", "95"))
+# Never hedge sooner than this, and only once there are enough samples
+PROVIDER_HEDGE_MIN_DELAY_SECONDS = float(os.getenv("PROVIDER_HEDGE_MIN_DELAY_SECONDS", "1"))
+PROVIDER_HEDGE_MIN_SAMPLES = int(os.getenv("PROVIDER_HEDGE_MIN_SAMPLES", "20"))
+PROVIDER_LATENCY_WINDOW = int(os.getenv("PROVIDER_LATENCY_WINDOW", "200"))
+
+PROVIDER_BREAKER_FAILURES = int(os.getenv("PROVIDER_BREAKER_FAILURES", "5"))
+PROVIDER_BREAKER_RESET_SECONDS = float(os.getenv("PROVIDER_BREAKER_RESET_SECONDS", "30"))
+
+# Attempts run here so a hedge can race them; abandoned attempts finish
+# (or time out) on their own
+_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("PROVIDER_CALL_WORKERS", "64")),
+    thread_name_prefix="provider-call",
+)
+
+
+class ProviderUnavailable(Exception):
+    """The circuit breaker is open; retry after retry_after seconds."""
+
+    def __init__(self, operation: str, retry_after: float):
+        super().__init__(f"AI provider is unavailable ({operation}); retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class ProviderDeadlineExceeded(Exception):
+    """The call didn't succeed within its deadline."""
+
+
+# ═══════════════════════════════════════════════════════
+# ERROR CLASSIFICATION
+# ═══════════════════════════════════════════════════════
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    return getattr(error, "status_code", None)
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection errors, rate limits and upstream 5xx are worth retrying."""
+    import openai
+
+    if is_timeout(error) or isinstance(error, openai.APIConnectionError):
+        return True
+    code = _status_code(error)
+    return code is not None and (code == 429 or code >= 500)
+
+
+def is_timeout(error: BaseException) -> bool:
+    import openai
+
+    return isinstance(error, (ProviderDeadlineExceeded, openai.APITimeoutError, TimeoutError))
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """Errors that say the provider is unhealthy (counted by the breaker); 429 is per-key."""
+    return is_retryable(error) and _status_code(error) != 429
+
+
+# ═══════════════════════════════════════════════════════
+# LATENCY TRACKING AND CIRCUIT BREAKER
+# ═══════════════════════════════════════════════════════
+
+
+class LatencyTracker:
+    """Recent successful call latencies, for the hedge threshold."""
+
+    def __init__(self, window: int = PROVIDER_LATENCY_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """The pct-th percentile of recent latencies, or None with too few samples."""
+        with self._lock:
+            if len(self._samples) < PROVIDER_HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+
+class CircuitBreaker:
+    """Closed -> open after N consecutive failures -> half-open (one trial) after a cool-down."""
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """Raise ProviderUnavailable unless a call may go ahead."""
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited >= self.reset_seconds and not self._trial_in_flight:
+                # Half-open: let this one call find out whether the provider is back
+                self._trial_in_flight = True
+                return
+            retry_after = max(1.0, self.reset_seconds - waited)
+        PROVIDER_CALL_EVENTS.inc(provider=PROVIDER_NAME, operation=self.name, event="rejected")
+        raise ProviderUnavailable(self.name, retry_after)
+
+    def check(self) -> None:
+        """
+        Raise ProviderUnavailable if a call made now would be rejected, without
+        taking the half-open trial: for failing a request before work that
+        would be wasted if the call came later and was rejected.
+        """
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited >= self.reset_seconds and not self._trial_in_flight:
+                return
+            retry_after = max(1.0, self.reset_seconds - waited)
+        PROVIDER_CALL_EVENTS.inc(provider=PROVIDER_NAME, operation=self.name, event="rejected")
+        raise ProviderUnavailable(self.name, retry_after)
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("Provider circuit closed", extra={"operation": self.name})
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        if self.failure_threshold <= 0:
+            return
+        with self._lock:
+            self._failures += 1
+            was_trial = self._trial_in_flight
+            self._trial_in_flight = False
+            if self._opened_at is None and self._failures < self.failure_threshold:
+                return
+            self._opened_at = time.monotonic()
+        PROVIDER_CALL_EVENTS.inc(provider=PROVIDER_NAME, operation=self.name, event="breaker_open")
+        logger.warning(
+            "Provider circuit opened",
+            extra={"operation": self.name, "failures": self._failures, "after_trial": was_trial},
+        )
+
+    def release_trial(self) -> None:
+        """The trial call ended without telling us anything (e.g. a 4xx); allow another."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+_trackers: Dict[str, LatencyTracker] = {}
+_breakers: Dict[str, CircuitBreaker] = {}
+_registry_lock = threading.Lock()
+
+
+def _tracker(operation: str) -> LatencyTracker:
+    with _registry_lock:
+        if operation not in _trackers:
+            _trackers[operation] = LatencyTracker()
+        return _trackers[operation]
+
+
+def get_breaker(operation: str) -> CircuitBreaker:
+    with _registry_lock:
+        if operation not in _breakers:
+            _breakers[operation] = CircuitBreaker(
+                operation, PROVIDER_BREAKER_FAILURES, PROVIDER_BREAKER_RESET_SECONDS
+            )
+        return _breakers[operation]
+
+
+# ═══════════════════════════════════════════════════════
+# CALLS
+# ═══════════════════════════════════════════════════════
+
+
+def _submit(attempt: Callable[[float], T], timeout: float) -> "Future[T]":
+    # Copy the context so attempts still log with the request ID
+    return _executor.submit(contextvars.copy_context().run, attempt, timeout)
+
+
+def _hedge_delay(operation: str) -> Optional[float]:
+    if not PROVIDER_HEDGE_ENABLED:
+        return None
+    threshold = _tracker(operation).percentile(PROVIDER_HEDGE_PERCENTILE)
+    if threshold is None:
+        return None
+    return max(threshold, PROVIDER_HEDGE_MIN_DELAY_SECONDS)
+
+
+def _run_attempt(operation: str, attempt: Callable[[float], T], deadline: float, hedge: bool) -> T:
+    """One attempt, plus a hedge if it runs long. Raises the last error if both fail."""
+    primary = _submit(attempt, deadline - time.monotonic())
+    pending = {primary}
+    hedge_delay = _hedge_delay(operation) if hedge else None
+    hedged = False
+    error: Optional[BaseException] = None
+
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        wait_for = remaining
+        if hedge_delay is not None and not hedged:
+            wait_for = min(remaining, hedge_delay)
+        done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                error = e
+                continue
+            if hedged:
+                won = "primary_won" if future is primary else "hedge_won"
+                PROVIDER_CALL_EVENTS.inc(provider=PROVIDER_NAME, operation=operation, event=won)
+            return result
+
+        if error is not None and not is_retryable(error):
+            raise error
+        if not done and hedge_delay is not None and not hedged and deadline - time.monotonic() > 0:
+            hedged = True
+            PROVIDER_CALL_EVENTS.inc(provider=PROVIDER_NAME, operation=operation, event="hedge")
+            pending.add(_submit(attempt, deadline - time.monotonic()))
+
+    if error is not None and not pending:
+        raise error
+    raise ProviderDeadlineExceeded(f"AI provider did not respond within the deadline ({operation})")
+
+
+def call_provider(
+    operation: str,
+    attempt: Callable[[float], T],
+    deadline_seconds: float,
+    hedge: bool = True,
+) -> T:
+    """
+    Call the provider through attempt(timeout), which must pass timeout on as
+    its HTTP timeout and must be safe to run twice at once when hedging.
+
+    Raises ProviderUnavailable when the circuit is open, ProviderDeadlineExceeded
+    when the deadline passes, or the provider's own error otherwise.
+    """
+    breaker = get_breaker(operation)
+    started = time.monotonic()
+    deadline = started + deadline_seconds
+    try:
+        breaker.before_call()
+    except ProviderUnavailable:
+        PROVIDER_CALL_DURATION.observe(0.0, provider=PROVIDER_NAME, operation=operation, outcome="rejected")
+        raise
+
+    retries = 0
+    while True:
+        attempt_started = time.monotonic()
+        try:
+            result = _run_attempt(operation, attempt, deadline, hedge)
+        except Exception as e:
+            timed_out = is_timeout(e)
+            if not timed_out and not is_retryable(e):
+                breaker.release_trial()
+                PROVIDER_CALL_DURATION.observe(
+                    time.monotonic() - started, provider=PROVIDER_NAME, operation=operation, outcome="error"
+                )
+                raise
+            # Full jitter: sleep a random time up to the exponential backoff
+            backoff = random.uniform(0, min(PROVIDER_RETRY_MAX_SECONDS, PROVIDER_RETRY_BASE_SECONDS * 2 ** retries))
+            if retries >= PROVIDER_MAX_RETRIES or time.monotonic() + backoff >= deadline:
+                if is_upstream_failure(e):
+                    breaker.record_failure()
+                else:
+                    breaker.release_trial()
+                PROVIDER_CALL_DURATION.observe(
+                    time.monotonic() - started, provider=PROVIDER_NAME, operation=operation,
+                    outcome="timeout" if timed_out else "error",
+                )
+                if timed_out and not isinstance(e, ProviderDeadlineExceeded):
+                    raise ProviderDeadlineExceeded(
+                        f"AI provider did not respond within the deadline ({operation})"
+                    ) from e
+                raise
+            retries += 1
+            PROVIDER_CALL_EVENTS.inc(provider=PROVIDER_NAME, operation=operation, event="retry")
+            logger.info(
+                "Retrying provider call",
+                extra={"operation": operation, "retry": retries, "error": str(e), "backoff_ms": round(backoff * 1000)},
+            )
+            time.sleep(backoff)
+            continue
+
+        _tracker(operation).record(time.monotonic() - attempt_started)
+        breaker.record_success()
+        PROVIDER_CALL_DURATION.observe(
+            time.monotonic() - started, provider=PROVIDER_NAME, operation=operation, outcome="ok"
+        )
+        return result
+
+
+@contextmanager
+def provider_guard(operation: str) -> Iterator[None]:
+    """
+    Circuit breaker only, for provider calls made inside library code
+    (the client does its own timeout and retries). Raises ProviderUnavailable
+    when open.
+    """
+    breaker = get_breaker(operation)
+    breaker.before_call()
+    try:
+        yield
+    except Exception as e:
+        if is_upstream_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.release_trial()
+        raise
+    breaker.record_success()
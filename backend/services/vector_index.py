@@ -0,0 +1,665 @@
+"""
+Compact Vector Index
+====================
+Per-user vector indexes sized to the user: compact vectors, and an index
+type that follows the corpus size.
+
+ContextMemory keeps one FAISS IndexFlatIP per conversation at full float32
+precision: 6 KiB per 1536-wide embedding, held in memory by every worker
+and scanned in full on every search. CompactVectorStore is a drop-in
+replacement (installed over contextmemory.memory.vector_store.FAISSVectorStore).
+
+Index type (VECTOR_INDEX_ADAPTIVE): below VECTOR_INDEX_ANN_THRESHOLD
+vectors a search is an exact scan (a NumPy matrix product for float32),
+which is the fastest there is for small corpora. Once a user crosses the
+threshold, an approximate index (VECTOR_INDEX_ANN: HNSW, or IVF retrained
+each time the corpus grows VECTOR_INDEX_IVF_REBUILD_GROWTH-fold) is built
+on a background thread from the stored vectors, catches up with what was
+added meanwhile and then replaces the exact one; searches keep using the
+old index until then. Search latency stays around a millisecond or two
+from ten to a hundred thousand memories.
+
+Vectors (EMBEDDING_INDEX_*): indexed
+
+    truncated    to their first EMBEDDING_INDEX_DIMENSIONS components and
+                 renormalized (text-embedding-3 models are trained so that
+                 prefixes remain good embeddings), and/or
+    quantized    to float16 or int8 (EMBEDDING_INDEX_PRECISION) with FAISS
+                 scalar quantizers, which score the codes directly.
+
+A compact index only picks candidates: the top k * EMBEDDING_INDEX_RESCORE_FACTOR
+are rescored against the full-width vectors, kept as float16 in a file next
+to the index and memory-mapped, so only the candidates' rows are read.
+int8 at 512 dimensions holds 0.5 KiB per memory in memory (12x less).
+A float32 index at full width already scores exactly: it searches for k
+and keeps no rescore file.
+
+EMBEDDING_STORAGE_PRECISION does the same for the `memories.embedding`
+JSON column (4 significant digits for float16, small integers for int8).
+The column is only read to rebuild indexes, where vectors are normalized
+again, so the scale int8 drops doesn't matter.
+
+Index files are named after the vector format (conv_7.int8-512.index), so
+a changed setting never loads an index built for another one; an index
+saved by ContextMemory itself (conv_7.faiss) is imported on first load.
+Run `python reindex.py` after changing the EMBEDDING_* settings; changed
+VECTOR_INDEX_* settings are applied by background rebuilds. See
+benchmarks/vector_index.py for recall and latency per setting and size.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# float32 | float16 | int8
+EMBEDDING_INDEX_PRECISION = os.getenv("EMBEDDING_INDEX_PRECISION", "float32").lower()
+# Leading dimensions to index; 0 keeps them all
+EMBEDDING_INDEX_DIMENSIONS = int(os.getenv("EMBEDDING_INDEX_DIMENSIONS", "0"))
+# Candidates per requested result rescored at full width, for compact
+# indexes (truncated or quantized); 1 disables rescoring
+EMBEDDING_INDEX_RESCORE_FACTOR = int(os.getenv("EMBEDDING_INDEX_RESCORE_FACTOR", "4"))
+# float32 | float16 | int8, for the memories.embedding column
+EMBEDDING_STORAGE_PRECISION = os.getenv("EMBEDDING_STORAGE_PRECISION", "float32").lower()
+
+# Pick the index type by corpus size; false keeps an exact scan for everyone
+VECTOR_INDEX_ADAPTIVE = os.getenv("VECTOR_INDEX_ADAPTIVE", "true").lower() in ("true", "1", "yes")
+# Vectors at which a user moves from an exact scan to VECTOR_INDEX_ANN
+VECTOR_INDEX_ANN_THRESHOLD = int(os.getenv("VECTOR_INDEX_ANN_THRESHOLD", "2000"))
+# hnsw | ivf
+VECTOR_INDEX_ANN = os.getenv("VECTOR_INDEX_ANN", "hnsw").lower()
+VECTOR_INDEX_HNSW_M = int(os.getenv("VECTOR_INDEX_HNSW_M", "32"))
+VECTOR_INDEX_HNSW_EF_CONSTRUCTION = int(os.getenv("VECTOR_INDEX_HNSW_EF_CONSTRUCTION", "80"))
+# Raised to the candidate count when a search asks for more
+VECTOR_INDEX_HNSW_EF_SEARCH = int(os.getenv("VECTOR_INDEX_HNSW_EF_SEARCH", "64"))
+VECTOR_INDEX_IVF_NPROBE = int(os.getenv("VECTOR_INDEX_IVF_NPROBE", "16"))
+# Retrain an IVF index once the corpus has grown this many times over
+VECTOR_INDEX_IVF_REBUILD_GROWTH = float(os.getenv("VECTOR_INDEX_IVF_REBUILD_GROWTH", "4"))
+# Index builds running at once, across all users
+VECTOR_INDEX_BUILD_WORKERS = int(os.getenv("VECTOR_INDEX_BUILD_WORKERS", "1"))
+
+PRECISIONS = ("float32", "float16", "int8")
+ANN_TYPES = ("hnsw", "ivf")
+
+# ContextMemory's embedding width
+FULL_DIMENSIONS = 1536
+
+# int8 codes cover +-INT8_CLIP_SIGMAS standard deviations of a unit vector's
+# components (1/sqrt(d) each); anything beyond that is clipped
+INT8_CLIP_SIGMAS = 8.0
+
+# Rows a build encodes and adds at a time, and the backlog it clears while
+# holding the store's lock before switching over
+BUILD_CHUNK_ROWS = 8192
+BUILD_SWITCH_ROWS = 256
+
+_build_slots = threading.BoundedSemaphore(max(VECTOR_INDEX_BUILD_WORKERS, 1))
+
+
+def compact_index_enabled() -> bool:
+    return EMBEDDING_INDEX_PRECISION != "float32" or 0 < EMBEDDING_INDEX_DIMENSIONS < FULL_DIMENSIONS
+
+
+def _unit_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class NumpyFlatIndex:
+    """Exact inner-product scan over a NumPy matrix, with the faiss.Index calls the store uses."""
+
+    def __init__(self, d: int, rows: Optional[np.ndarray] = None):
+        self.d = d
+        self._rows = rows if rows is not None else np.empty((0, d), dtype=np.float32)
+        self.ntotal = len(self._rows) if rows is not None else 0
+
+    def sa_code_size(self) -> int:
+        return 4 * self.d
+
+    def reconstruct(self, i: int) -> np.ndarray:
+        return self._rows[i].copy()
+
+    def reconstruct_n(self, i0: int, ni: int) -> np.ndarray:
+        return self._rows[i0:i0 + ni].copy()
+
+    def add(self, x: np.ndarray) -> None:
+        needed = self.ntotal + len(x)
+        if needed > len(self._rows):
+            # Grow geometrically so adding one row at a time stays cheap
+            grown = np.empty((max(needed, 2 * len(self._rows), 64), self.d), dtype=np.float32)
+            grown[:self.ntotal] = self._rows[:self.ntotal]
+            self._rows = grown
+        self._rows[self.ntotal:needed] = x
+        self.ntotal = needed
+
+    def search(self, x: np.ndarray, k: int, params=None):
+        scores = self._rows[:self.ntotal] @ x[0]
+        k = min(k, self.ntotal)
+        top = np.argpartition(-scores, k - 1)[:k] if k < self.ntotal else np.arange(self.ntotal)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return scores[top][None, :], top[None, :]
+
+    def write(self, path: str) -> None:
+        with open(path, "wb") as f:
+            np.save(f, self._rows[:self.ntotal])
+
+    @classmethod
+    def read(cls, path: str) -> "NumpyFlatIndex":
+        rows = np.load(path)
+        return cls(rows.shape[1], np.ascontiguousarray(rows, dtype=np.float32))
+
+
+# ═══════════════════════════════════════════════════════
+# VECTOR STORE
+# ═══════════════════════════════════════════════════════
+
+
+class CompactVectorStore:
+    """
+    FAISSVectorStore with truncated and/or quantized vectors, full-width
+    rescoring and a size-dependent index type. Same interface: add, search,
+    remove, save, load, count.
+    """
+
+    def __init__(
+        self,
+        dimension: int = FULL_DIMENSIONS,
+        precision: str = EMBEDDING_INDEX_PRECISION,
+        index_dimensions: int = EMBEDDING_INDEX_DIMENSIONS,
+        rescore_factor: int = EMBEDDING_INDEX_RESCORE_FACTOR,
+        adaptive: bool = VECTOR_INDEX_ADAPTIVE,
+        ann_threshold: int = VECTOR_INDEX_ANN_THRESHOLD,
+        ann: str = VECTOR_INDEX_ANN,
+    ):
+        if precision not in PRECISIONS:
+            raise ValueError(f"EMBEDDING_INDEX_PRECISION must be one of {', '.join(PRECISIONS)}, not {precision!r}")
+        if ann not in ANN_TYPES:
+            raise ValueError(f"VECTOR_INDEX_ANN must be one of {', '.join(ANN_TYPES)}, not {ann!r}")
+        self.dimension = dimension
+        self.precision = precision
+        self.index_dimensions = index_dimensions if 0 < index_dimensions < dimension else dimension
+        self.rescore_factor = max(rescore_factor, 1)
+        self.adaptive = adaptive
+        self.ann_threshold = ann_threshold
+        self.ann = ann
+        self._int8_scale = 127 / (INT8_CLIP_SIGMAS / np.sqrt(self.index_dimensions))
+
+        self.kind = "exact"
+        self.index = self._new_index("exact")
+        # Vectors the current index was built (for IVF: trained) with
+        self._built_rows = 0
+
+        self.id_map: Dict[int, int] = {}  # memory_id -> index position
+        self.reverse_map: Dict[int, int] = {}  # index position -> memory_id
+
+        # Full-width float16 rows of a compact index, for rescoring and
+        # rebuilds: saved rows are memory-mapped from the .rescore file, later
+        # ones are in memory. Other indexes hold the full vectors themselves.
+        self._saved_rows: Optional[np.ndarray] = None
+        self._saved_count = 0
+        self._pending_rows: List[np.ndarray] = []
+        self._rescore_path: Optional[str] = None
+
+        # Held by writers (add, save, switching to a rebuilt index); searches
+        # only take it to read rescore rows
+        self._lock = threading.RLock()
+        self._path: Optional[str] = None
+        self._building = False
+        self._build_done = threading.Event()
+        self._build_done.set()
+
+    @property
+    def format(self) -> str:
+        return f"{self.precision}-{self.index_dimensions}"
+
+    @property
+    def compact(self) -> bool:
+        """Whether the index holds truncated or quantized vectors rather than the full ones."""
+        return self.precision != "float32" or self.index_dimensions < self.dimension
+
+    @property
+    def rescoring(self) -> bool:
+        return self.compact and self.rescore_factor > 1
+
+    @property
+    def nbytes(self) -> int:
+        """Size of the in-memory codes (the part that scales with the corpus; HNSW adds its links)."""
+        index = self.index
+        if isinstance(index, faiss.IndexHNSW):
+            index = faiss.downcast_index(index.storage)
+        return index.sa_code_size() * self.index.ntotal
+
+    # ───────────────────────────────────────────────────
+    # Index types
+    # ───────────────────────────────────────────────────
+
+    def _quantizer_type(self) -> Optional[int]:
+        if self.precision == "float16":
+            return faiss.ScalarQuantizer.QT_fp16
+        if self.precision == "int8":
+            # Fixed scale (see _encode), so no training and codes never need re-encoding
+            return faiss.ScalarQuantizer.QT_8bit_direct_signed
+        return None
+
+    def _new_index(self, kind: str, rows: int = 0):
+        """An empty index of the given kind; IVF still needs training, for `rows` vectors."""
+        d, qtype, metric = self.index_dimensions, self._quantizer_type(), faiss.METRIC_INNER_PRODUCT
+        if kind == "hnsw":
+            index = (
+                faiss.IndexHNSWFlat(d, VECTOR_INDEX_HNSW_M, metric) if qtype is None
+                else faiss.IndexHNSWSQ(d, qtype, VECTOR_INDEX_HNSW_M, metric)
+            )
+            index.hnsw.efConstruction = VECTOR_INDEX_HNSW_EF_CONSTRUCTION
+            return index
+        if kind == "ivf":
+            # ~sqrt(n) lists, but no fewer than the 39 training points per list FAISS wants
+            lists = max(min(int(np.sqrt(rows)), rows // 39), 1)
+            # The faiss wrappers keep the coarse quantizer alive with the index
+            coarse = faiss.IndexFlatIP(d)
+            if qtype is not None:
+                return faiss.IndexIVFScalarQuantizer(coarse, d, lists, qtype, metric)
+            index = faiss.IndexIVFFlat(coarse, d, lists, metric)
+            if not self.compact:
+                # Rebuilds read the full vectors back with reconstruct
+                index.make_direct_map()
+            return index
+        if qtype is None:
+            return NumpyFlatIndex(d)
+        return faiss.IndexScalarQuantizer(d, qtype, metric)
+
+    def _target_kind(self, rows: int) -> str:
+        return self.ann if self.adaptive and rows >= self.ann_threshold else "exact"
+
+    def _needs_rebuild(self) -> bool:
+        rows = self.index.ntotal
+        if self._target_kind(rows) != self.kind:
+            return True
+        return self.kind == "ivf" and rows >= VECTOR_INDEX_IVF_REBUILD_GROWTH * max(self._built_rows, 1)
+
+    def _search_params(self, kind: str, candidates: int):
+        if kind == "hnsw":
+            return faiss.SearchParametersHNSW(efSearch=max(VECTOR_INDEX_HNSW_EF_SEARCH, candidates))
+        if kind == "ivf":
+            return faiss.SearchParametersIVF(nprobe=VECTOR_INDEX_IVF_NPROBE)
+        return None
+
+    # ───────────────────────────────────────────────────
+    # Vectors
+    # ───────────────────────────────────────────────────
+
+    def _encode(self, full: np.ndarray) -> np.ndarray:
+        """Unit-length full-width rows -> the rows the index stores."""
+        vectors = _unit_rows(full[:, :self.index_dimensions].astype(np.float32))
+        if self.precision == "int8":
+            return np.clip(np.rint(vectors * self._int8_scale), -128, 127).astype(np.float32)
+        return vectors
+
+    def _query(self, full: np.ndarray) -> np.ndarray:
+        # FAISS quantizes int8 queries like the stored rows, so they get the
+        # same scale (and the scores come out scaled twice)
+        return self._encode(full)
+
+    def _rescore_rows(self, positions: np.ndarray) -> np.ndarray:
+        if not self.compact:
+            return np.stack([self.index.reconstruct(int(position)) for position in positions])
+        rows = np.empty((len(positions), self.dimension), dtype=np.float32)
+        saved = positions < self._saved_count
+        if saved.any():
+            rows[saved] = self._saved_rows[positions[saved]]
+        for i in np.flatnonzero(~saved):
+            rows[i] = self._pending_rows[positions[i] - self._saved_count]
+        return rows
+
+    def _full_rows(self, start: int, stop: int) -> np.ndarray:
+        """Full-width rows for positions [start, stop), as float16 (float32 if not compact)."""
+        if not self.compact:
+            return self.index.reconstruct_n(start, stop - start)
+        parts = []
+        if start < self._saved_count:
+            parts.append(np.asarray(self._saved_rows[start:min(stop, self._saved_count)]))
+        if stop > self._saved_count:
+            parts.extend(self._pending_rows[max(start - self._saved_count, 0):stop - self._saved_count])
+        if not parts:
+            return np.empty((0, self.dimension), dtype=np.float16)
+        return np.vstack(parts)
+
+    # ───────────────────────────────────────────────────
+    # FAISSVectorStore interface
+    # ───────────────────────────────────────────────────
+
+    def add(self, memory_id: int, embedding: Sequence[float]) -> None:
+        with self._lock:
+            if memory_id in self.id_map:
+                return
+            full = _unit_rows(np.asarray([embedding], dtype=np.float32))
+            position = self.index.ntotal
+            self.index.add(self._encode(full))
+            if self.compact:
+                self._pending_rows.append(full[0].astype(np.float16))
+            self.id_map[memory_id] = position
+            self.reverse_map[position] = memory_id
+            self._schedule_rebuild()
+
+    def search(self, query_embedding: Sequence[float], k: int = 10) -> List[Dict]:
+        index, kind = self.index, self.kind
+        if index.ntotal == 0:
+            return []
+        full = _unit_rows(np.asarray([query_embedding], dtype=np.float32))
+        candidates = min(k * self.rescore_factor if self.rescoring else k, index.ntotal)
+        params = self._search_params(kind, candidates)
+        query = self._query(full)
+        scores, positions = index.search(query, candidates, params=params) if params else index.search(query, candidates)
+        scores, positions = scores[0], positions[0]
+
+        # -1: an approximate index found fewer than asked for
+        live = np.array([position in self.reverse_map for position in positions], dtype=bool)
+        scores, positions = scores[live], positions[live]
+        if self.rescoring and len(positions):
+            with self._lock:
+                rows = self._rescore_rows(positions)
+            scores = rows @ full[0]
+        elif self.precision == "int8":
+            scores = scores / self._int8_scale ** 2
+
+        order = np.argsort(-scores, kind="stable")[:k]
+        return [
+            {"memory_id": self.reverse_map[int(positions[i])], "score": float(scores[i])}
+            for i in order
+        ]
+
+    def remove(self, memory_id: int) -> None:
+        # Like FAISSVectorStore: the vector stays in the index but is never returned
+        position = self.id_map.pop(memory_id, None)
+        if position is not None:
+            self.reverse_map.pop(position, None)
+
+    @property
+    def count(self) -> int:
+        return len(self.id_map)
+
+    # ───────────────────────────────────────────────────
+    # Background rebuilds
+    # ───────────────────────────────────────────────────
+
+    def _schedule_rebuild(self) -> None:
+        if self._building or not self._needs_rebuild():
+            return
+        self._building = True
+        self._build_done.clear()
+        threading.Thread(target=self._rebuild, name="vector-index-build", daemon=True).start()
+
+    def wait_for_rebuild(self, timeout: Optional[float] = None) -> bool:
+        """Block until no rebuild is running; False on timeout."""
+        return self._build_done.wait(timeout)
+
+    def _rebuild(self) -> None:
+        with _build_slots:
+            started = time.perf_counter()
+            try:
+                with self._lock:
+                    rows = self.index.ntotal
+                kind = self._target_kind(rows)
+                index = self._new_index(kind, rows)
+                if kind == "ivf":
+                    # Train on an even sample of the corpus
+                    sample = np.linspace(0, rows - 1, min(rows, 256 * index.nlist)).astype(int)
+                    with self._lock:
+                        training = self._rescore_rows(sample)
+                    index.train(self._encode(training))
+
+                # Copy everything over, then what was added meanwhile; the
+                # last stretch under the lock so no add slips in before the switch
+                while True:
+                    with self._lock:
+                        behind = self.index.ntotal - index.ntotal
+                        if behind <= BUILD_SWITCH_ROWS:
+                            if behind:
+                                index.add(self._encode(self._full_rows(index.ntotal, self.index.ntotal)))
+                            previous = self.kind
+                            self.index, self.kind, self._built_rows = index, kind, rows
+                            path = self._path
+                            break
+                        chunk = self._full_rows(index.ntotal, index.ntotal + min(behind, BUILD_CHUNK_ROWS))
+                    index.add(self._encode(chunk))
+
+                if path:
+                    self.save(path)
+                logger.info(
+                    "Vector index rebuilt",
+                    extra={
+                        "event": "vector_index_build",
+                        "from": previous,
+                        "to": kind,
+                        "vectors": index.ntotal,
+                        "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                    },
+                )
+            except Exception as e:
+                logger.warning(f"Vector index rebuild failed: {e}")
+            finally:
+                self._building = False
+                self._build_done.set()
+
+    # ───────────────────────────────────────────────────
+    # Persistence
+    # ───────────────────────────────────────────────────
+
+    def index_files(self, path: str) -> Dict[str, str]:
+        """The files this store saves to and loads from, for a base path."""
+        base = f"{path}.{self.format}"
+        files = {"index": f"{base}.index", "map": f"{base}.map.json"}
+        if self.compact:
+            files["rescore"] = f"{base}.rescore"
+        return files
+
+    def _map_rescore_file(self, path: str, count: int) -> None:
+        self._saved_rows = (
+            np.memmap(path, dtype=np.float16, mode="r", shape=(count, self.dimension)) if count else None
+        )
+        self._saved_count = count
+        self._rescore_path = path
+
+    def save(self, path: str) -> None:
+        with self._lock:
+            self._save(path)
+
+    def _save(self, path: str) -> None:
+        paths = self.index_files(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._path = path
+        if self.compact:
+            self._save_rescore_rows(paths["rescore"])
+
+        if isinstance(self.index, NumpyFlatIndex):
+            self.index.write(f"{paths['index']}.tmp")
+        else:
+            faiss.write_index(self.index, f"{paths['index']}.tmp")
+        os.replace(f"{paths['index']}.tmp", paths["index"])
+        with open(f"{paths['map']}.tmp", "w") as f:
+            json.dump({
+                "format": self.format,
+                "kind": self.kind,
+                "rows": self.index.ntotal,
+                "built_rows": self._built_rows,
+                "id_map": {str(k): v for k, v in self.id_map.items()},
+            }, f)
+        os.replace(f"{paths['map']}.tmp", paths["map"])
+
+    def _save_rescore_rows(self, path: str) -> None:
+        # Rescore rows are appended when the file is still the one this store
+        # mapped; otherwise (new or rebuilt store, or another process wrote to
+        # it) a fresh file replaces it, which leaves other processes'
+        # mappings of the old one valid
+        row_bytes = 2 * self.dimension
+        if (
+            self._rescore_path == path
+            and os.path.exists(path)
+            and os.path.getsize(path) == self._saved_count * row_bytes
+        ):
+            with open(path, "ab") as f:
+                if self._pending_rows:
+                    f.write(np.stack(self._pending_rows).tobytes())
+        else:
+            tmp = f"{path}.tmp"
+            with open(tmp, "wb") as f:
+                if self._saved_count:
+                    f.write(np.asarray(self._saved_rows).tobytes())
+                if self._pending_rows:
+                    f.write(np.stack(self._pending_rows).tobytes())
+            os.replace(tmp, path)
+        self._pending_rows = []
+        self._map_rescore_file(path, self.index.ntotal)
+
+    def load(self, path: str) -> bool:
+        paths = self.index_files(path)
+        if os.path.exists(paths["map"]):
+            loaded = self._load_files(path, paths)
+        else:
+            loaded = self._import_faiss_store(path)
+        # Left empty, the store's next save would replace the user's index
+        # with only the vectors added from then on
+        return loaded or self._load_from_db(path)
+
+    def _load_files(self, path: str, paths: Dict[str, str]) -> bool:
+        try:
+            with open(paths["map"]) as f:
+                data = json.load(f)
+            kind = data.get("kind", "exact")
+            if kind == "exact" and self._quantizer_type() is None:
+                index = NumpyFlatIndex.read(paths["index"])
+            else:
+                index = faiss.read_index(paths["index"])
+            # A crash or a concurrent writer can leave the files out of step
+            if (
+                data["format"] != self.format
+                or data["rows"] != index.ntotal
+                or (self.compact and os.path.getsize(paths["rescore"]) != index.ntotal * 2 * self.dimension)
+            ):
+                logger.warning(f"Vector index {paths['index']} is inconsistent; rebuilding it")
+                return False
+            if not self.compact and isinstance(index, faiss.IndexIVF) and index.direct_map.no():
+                # Saved before float32 indexes stopped keeping rescore rows
+                index.make_direct_map()
+            with self._lock:
+                self.index, self.kind, self._built_rows = index, kind, data.get("built_rows", 0)
+                self.id_map = {int(k): v for k, v in data["id_map"].items()}
+                self.reverse_map = {v: k for k, v in self.id_map.items()}
+                self._pending_rows = []
+                if self.compact:
+                    self._map_rescore_file(paths["rescore"], index.ntotal)
+                self._path = path
+                # Settings may have changed since it was saved
+                self._schedule_rebuild()
+            return True
+        except Exception as e:
+            logger.warning(f"Could not load vector index {paths['index']}: {e}")
+            return False
+
+    def _load_from_db(self, path: str) -> bool:
+        """Index the conversation's stored embeddings and save them, as rebuild_index_from_db does."""
+        from contextmemory.db.models.memory import Memory as MemoryModel
+        from database import SessionLocal
+
+        # ContextMemory names index files conv_<conversation_id>
+        name = os.path.basename(path)
+        if not name.startswith("conv_") or not name[5:].isdigit():
+            return False
+        db = SessionLocal()
+        try:
+            rows = db.query(MemoryModel.id, MemoryModel.embedding).filter(
+                MemoryModel.conversation_id == int(name[5:]),
+                MemoryModel.is_active == True,
+                MemoryModel.embedding.isnot(None),
+            ).order_by(MemoryModel.id).all()
+        except Exception as e:
+            logger.warning(f"Could not rebuild vector index {path} from the database: {e}")
+            return False
+        finally:
+            db.close()
+        if not rows:
+            return False
+        for memory_id, embedding in rows:
+            self.add(memory_id, embedding)
+        self.save(path)
+        logger.info(f"Vector index {path} rebuilt from the database ({len(rows)} vectors)")
+        return True
+
+    def _import_faiss_store(self, path: str) -> bool:
+        """Take over the vectors of an index ContextMemory's own FAISSVectorStore saved."""
+        if not os.path.exists(f"{path}.faiss"):
+            return False
+        try:
+            index = faiss.read_index(f"{path}.faiss")
+            with open(f"{path}.map.json") as f:
+                id_map = {int(k): v for k, v in json.load(f)["id_map"].items()}
+            if index.d != self.dimension:
+                return False
+            vectors = index.reconstruct_n(0, index.ntotal)
+        except Exception as e:
+            logger.warning(f"Could not import vector index {path}.faiss: {e}")
+            return False
+        for memory_id, position in sorted(id_map.items(), key=lambda item: item[1]):
+            self.add(memory_id, vectors[position])
+        self._path = path
+        return True
+
+
+# ═══════════════════════════════════════════════════════
+# EMBEDDING ROWS
+# ═══════════════════════════════════════════════════════
+
+
+def compact_embedding(embedding: Sequence[float], precision: str = EMBEDDING_STORAGE_PRECISION) -> list:
+    """An embedding as stored in the memories table at the given precision."""
+    if precision == "float16":
+        # float16 carries ~3.3 significant digits; 4 keeps the JSON short without losing any
+        return [float(f"{x:.4g}") for x in embedding]
+    if precision == "int8":
+        vector = np.asarray(embedding, dtype=np.float32)
+        peak = float(np.abs(vector).max()) or 1.0
+        return np.rint(vector * (127 / peak)).astype(int).tolist()
+    return list(embedding)
+
+
+def _compact_new_row(mapper, connection, target) -> None:
+    if target.embedding is not None:
+        target.embedding = compact_embedding(target.embedding)
+
+
+def _compact_updated_row(mapper, connection, target) -> None:
+    from sqlalchemy import inspect
+
+    # Only when the embedding itself changed; reassigning it would rewrite the column
+    if inspect(target).attrs.embedding.history.has_changes():
+        _compact_new_row(mapper, connection, target)
+
+
+def install_compact_vectors() -> None:
+    """Use CompactVectorStore and/or compact embedding rows, as configured."""
+    if compact_index_enabled() or VECTOR_INDEX_ADAPTIVE:
+        from contextmemory.memory import vector_store
+
+        # get_vector_store and rebuild_index_from_db look the class up at call time
+        vector_store.FAISSVectorStore = CompactVectorStore
+        logger.info(
+            f"Vector indexes: {EMBEDDING_INDEX_PRECISION}, {EMBEDDING_INDEX_DIMENSIONS or FULL_DIMENSIONS} dims, "
+            + (f"{VECTOR_INDEX_ANN} from {VECTOR_INDEX_ANN_THRESHOLD} vectors" if VECTOR_INDEX_ADAPTIVE else "exact")
+        )
+
+    if EMBEDDING_STORAGE_PRECISION != "float32":
+        if EMBEDDING_STORAGE_PRECISION not in PRECISIONS:
+            raise ValueError(f"EMBEDDING_STORAGE_PRECISION must be one of {', '.join(PRECISIONS)}")
+        from sqlalchemy import event
+        from contextmemory.db.models.memory import Memory
+
+        if not event.contains(Memory, "before_insert", _compact_new_row):
+            event.listen(Memory, "before_insert", _compact_new_row)
+            event.listen(Memory, "before_update", _compact_updated_row)
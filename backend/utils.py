@@ -4,24 +4,31 @@ Utility Functions
 Helper functions for memory operations and conversation management.
 """
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, TYPE_CHECKING
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
-from contextmemory.db.models.conversation import Conversation
-from contextmemory.db.models.memory import Memory as MemoryModel
+if TYPE_CHECKING:
+    from contextmemory.db.models.memory import Memory as MemoryModel
 
 
 def ensure_conversation_exists(db: Session, conversation_id: int) -> int:
     """Create conversation if it doesn't exist."""
+    from contextmemory.db.models.conversation import Conversation
+
     existing = db.query(Conversation).filter(Conversation.id == conversation_id).first()
     if not existing:
         conv = Conversation(id=conversation_id)
         db.add(conv)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent request of the same user created it first
+            db.rollback()
     return conversation_id
 
 
-def get_memory_connections(mem: MemoryModel) -> List[Dict[str, Any]]:
+def get_memory_connections(mem: "MemoryModel") -> List[Dict[str, Any]]:
     """Extract connections from memory metadata."""
     connections = []
     if mem.memory_metadata and isinstance(mem.memory_metadata, dict):
@@ -37,7 +44,7 @@ def get_memory_connections(mem: MemoryModel) -> List[Dict[str, Any]]:
     return connections
 
 
-def build_id_mapping(memories: List[MemoryModel]) -> Dict[int, int]:
+def build_id_mapping(memories: List["MemoryModel"]) -> Dict[int, int]:
     """
     Build a mapping from global database IDs to per-user local IDs.
     
@@ -69,6 +76,8 @@ def get_local_id_for_memory(
     Returns:
         The local_id (position in the user's memory sequence)
     """
+    from contextmemory.db.models.memory import Memory as MemoryModel
+
     all_memories = db.query(MemoryModel).filter(
         MemoryModel.conversation_id == conversation_id,
         MemoryModel.is_active == True
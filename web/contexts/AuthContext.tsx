@@ -75,15 +75,21 @@ export function AuthProvider({ children }: { children: ReactNode }) {
     const initAuth = async () => {
       setIsLoading(true);
       try {
-        const currentUser = await api.getCurrentUser();
-        setUser(currentUser);
-        if (currentUser) {
-          const status = await api.getApiKeyStatus();
-          setApiKeyStatus(status);
-        }
+        // One round trip for user, key status, history and memories;
+        // null means signed out (no token, or a 401 that couldn't be refreshed)
+        const bootstrap = await api.getBootstrap();
+        setUser(bootstrap?.user ?? null);
+        setApiKeyStatus(bootstrap?.api_key_status ?? null);
       } catch {
-        setUser(null);
-        setApiKeyStatus(null);
+        // Bootstrap failed for another reason: keep the session and load
+        // the user and key status from their own endpoints
+        try {
+          const currentUser = await api.getCurrentUser();
+          setUser(currentUser);
+          setApiKeyStatus(currentUser ? await api.getApiKeyStatus() : null);
+        } catch {
+          setApiKeyStatus(null);
+        }
       } finally {
         setIsLoading(false);
       }
@@ -12,14 +12,25 @@ import type {
   ApiKeyStatus,
   ValidateApiKeyResponse,
   UsageInfo,
+  BootstrapResponse,
 } from "@/types/api";
 
 // Token storage keys
 const ACCESS_TOKEN_KEY = "access_token";
 const REFRESH_TOKEN_KEY = "refresh_token";
 
+// How long bootstrap data may be served in place of a fresh fetch
+const PRIMED_DATA_TTL_MS = 30_000;
+
 export class ContextMemoryAPI {
   private baseUrl: string;
+  // First history page and graph from /api/bootstrap, served once to the dashboard
+  private primedHistory: ChatHistoryResponse | null = null;
+  private primedMemories: MemoriesResponse | null = null;
+  private primedAt = 0;
+  // Refresh in flight, shared by concurrent 401s: the server rotates the
+  // refresh token on use, so a second request with the old one would fail
+  private refreshPromise: Promise<boolean> | null = null;
 
   constructor(baseUrl?: string) {
     if (baseUrl) {
@@ -53,11 +64,17 @@ export class ContextMemoryAPI {
   }
 
   private clearTokens(): void {
+    this.primedHistory = null;
+    this.primedMemories = null;
     if (typeof window === "undefined") return;
     localStorage.removeItem(ACCESS_TOKEN_KEY);
     localStorage.removeItem(REFRESH_TOKEN_KEY);
   }
 
+  private isPrimedFresh(): boolean {
+    return Date.now() - this.primedAt < PRIMED_DATA_TTL_MS;
+  }
+
   private getAuthHeaders(): HeadersInit {
     const token = this.getAccessToken();
     if (token) {
@@ -126,7 +143,16 @@ export class ContextMemoryAPI {
     }
   }
 
-  async refreshToken(): Promise<boolean> {
+  refreshToken(): Promise<boolean> {
+    if (!this.refreshPromise) {
+      this.refreshPromise = this.doRefreshToken().finally(() => {
+        this.refreshPromise = null;
+      });
+    }
+    return this.refreshPromise;
+  }
+
+  private async doRefreshToken(): Promise<boolean> {
     const refreshToken = this.getRefreshToken();
     if (!refreshToken) return false;
 
@@ -145,7 +171,8 @@ export class ContextMemoryAPI {
       }
 
       const tokenResponse: TokenResponse = await response.json();
-      localStorage.setItem(ACCESS_TOKEN_KEY, tokenResponse.access_token);
+      // Refresh tokens are rotated on every use
+      this.setTokens(tokenResponse.access_token, tokenResponse.refresh_token);
       return true;
     } catch {
       this.clearTokens();
@@ -182,6 +209,36 @@ export class ContextMemoryAPI {
     return response.json();
   }
 
+  async getBootstrap(): Promise<BootstrapResponse | null> {
+    const token = this.getAccessToken();
+    if (!token) return null;
+
+    let response = await fetch(`${this.baseUrl}/api/bootstrap`, {
+      headers: this.getAuthHeaders(),
+    });
+
+    if (response.status === 401 && (await this.refreshToken())) {
+      response = await fetch(`${this.baseUrl}/api/bootstrap`, {
+        headers: this.getAuthHeaders(),
+      });
+    }
+
+    if (response.status === 401) {
+      this.clearTokens();
+      return null;
+    }
+    if (!response.ok) {
+      // Not an auth failure: the session is still good, so let the caller fall back
+      throw new Error("Failed to load bootstrap data");
+    }
+
+    const data: BootstrapResponse = await response.json();
+    this.primedHistory = data.history;
+    this.primedMemories = data.memories;
+    this.primedAt = Date.now();
+    return data;
+  }
+
   async getUsage(): Promise<UsageInfo> {
     const response = await fetch(`${this.baseUrl}/api/auth/usage`, {
       headers: this.getAuthHeaders(),
@@ -291,6 +348,12 @@ export class ContextMemoryAPI {
   }
 
   async getChatHistory(limit = 100, offset = 0): Promise<ChatHistoryResponse> {
+    if (this.primedHistory && limit === 100 && offset === 0 && this.isPrimedFresh()) {
+      const history = this.primedHistory;
+      this.primedHistory = null;
+      return history;
+    }
+
     const response = await fetch(
       `${this.baseUrl}/api/chat/history?limit=${limit}&offset=${offset}`,
       {
@@ -313,6 +376,12 @@ export class ContextMemoryAPI {
   // ═══════════════════════════════════════════════════════
 
   async getMemories(): Promise<MemoriesResponse> {
+    if (this.primedMemories && this.isPrimedFresh()) {
+      const memories = this.primedMemories;
+      this.primedMemories = null;
+      return memories;
+    }
+
     const response = await fetch(`${this.baseUrl}/api/memories`, {
       headers: this.getAuthHeaders(),
     });
@@ -35,6 +35,7 @@ export interface AuthResponse {
 
 export interface TokenResponse {
   access_token: string;
+  refresh_token: string;
   token_type: string;
   expires_in: number;
 }
@@ -144,3 +145,12 @@ export interface ChatHistoryResponse {
   has_more: boolean;
 }
 
+
+// Bootstrap (single call on dashboard load)
+export interface BootstrapResponse {
+  user: User;
+  api_key_status: ApiKeyStatus;
+  history: ChatHistoryResponse;
+  memories: MemoriesResponse | null;
+  memories_version: string;
+}